@@ -0,0 +1,628 @@
+"""
+This module provides asyncio variants of the device interfaces, so that a
+single event loop can coordinate all instruments concurrently. The threaded
+interfaces of the other modules remain available; the parsing and decoding of
+the device messages is shared with them.
+
+Class listing
+-------------
+AsyncControlSocket, AsyncDataSocket, AsyncController :
+    asyncio interfaces to the capaNCDT DT6200 controller.
+AsyncSCPISocket, AsyncDataLogger :
+    asyncio interfaces to the Agilent data logger.
+AsyncSerialConnection, AsyncTable :
+    asyncio interfaces to grbl. Requires the package pyserial-asyncio.
+
+Function listing
+----------------
+scan :
+    Rasters a list of positions with overlapping movement, display update,
+    temperature readout and data acquisition.
+
+Notes
+-----
+`measurement.Measurement` runs on the threaded interfaces; `scan` is the
+asyncio counterpart of its scan mode 'step' and is not used by it.
+
+Example
+-------
+  >>> async def main():
+  >>>     async with AsyncController(['2011'], '192.168.254.173') as c, \
+  >>>                AsyncDataLogger('192.168.254.174') as data_logger:
+  >>>         data, T = await asyncio.gather(c.acquire(100), data_logger.get_data())
+  >>> asyncio.run(main())
+"""
+
+import time
+import asyncio
+import logging
+import numpy as np
+from .controller import (ControlSocket, DataSocket, ControllerCommands,
+                         ControllerError, PipelineError)
+from .sensor import SENSORS
+from .data_logger import DataLoggerError
+from .table import (SerialConnection, Table, MotionModel, TableError,
+                    NotConnectedError)
+from .reducer import MeanStd
+from .base import wire_trace
+from .helper import BraceMessage as __
+
+try:
+    import serial_asyncio
+except ImportError:
+    serial_asyncio = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncIOBase():
+    """
+    The base class for line based device I/O with asyncio streams.
+
+    Commands are serialized with a lock, so concurrent tasks can share a
+    connection. Override `_open_connection` to return the (reader, writer)
+    pair of the connection, `_encode` to format outgoing commands and
+    `get_answer` to parse the response.
+    """
+
+    def __init__(self, address, timeout=1):
+        self.address = address
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+        self._lock = None
+
+    async def _open_connection(self):
+        """Override this method to open the connection."""
+        raise NotImplementedError
+
+    def _encode(self, cmd):
+        """Override this method to encode the command `cmd`."""
+        return (cmd + "\n").encode('ascii')
+
+    async def connect(self):
+        """Opens the connection to the device."""
+        self._lock = asyncio.Lock()
+        self.reader, self.writer = await asyncio.wait_for(
+            self._open_connection(), self.timeout)
+        logger.debug(__("Connected to {}.", self.address))
+
+    async def _flush_input(self):
+        """
+        Discards the pending input. Returns False if the connection was
+        closed by the device.
+        """
+        while True:
+            try:
+                data = await asyncio.wait_for(self.reader.read(4096), 0.01)
+            except asyncio.TimeoutError:
+                return True
+            if not data:
+                return False
+
+    async def disconnect(self):
+        """Closes the connection to the device."""
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except OSError:
+            pass
+        logger.debug(__("Disconnected from {}.", self.address))
+
+    async def _readline(self, timeout=None):
+        """Returns the next line without line break."""
+        if timeout is None:
+            timeout = self.timeout
+        try:
+            line = await asyncio.wait_for(self.reader.readline(), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(
+                "Expected data to be received, but no data sent. " +
+                "Device still alive?")
+        if not line:
+            raise ConnectionError(
+                "Connection to {} closed unexpectedly.".format(self.address))
+        if wire_trace.enabled():
+            wire_trace.received(self, line)
+        return line.decode('ascii').strip("\r\n")
+
+    async def get_answer(self, timeout=None):
+        """
+        Override this method to implement the parsing of the response. The
+        default implementation returns the next line.
+        """
+        return await self._readline(timeout)
+
+    async def command(self, cmd, get_response=True, timeout=None):
+        """
+        Sends a command to the device and returns (optional) the response.
+        See `base.IOBase.command`.
+        """
+        async with self._lock:
+            data = self._encode(cmd)
+            if wire_trace.enabled():
+                wire_trace.sent(self, data)
+            self.writer.write(data)
+            await self.writer.drain()
+            if get_response:
+                return await self.get_answer(timeout)
+
+
+class AsyncControlSocket(AsyncIOBase):
+    """asyncio interface to the telnet port of the controller."""
+
+    def __init__(self, host, control_port=23, timeout=1):
+        super().__init__((host, control_port), timeout)
+
+    async def _open_connection(self):
+        return await asyncio.open_connection(*self.address)
+
+    async def connect(self):
+        try:
+            await super().connect()
+        except (OSError, asyncio.TimeoutError):
+            msg = __("Could not connect to {} on telnet port {}.", *self.address)
+            logger.error(msg)
+            raise ControllerError(msg)
+        await asyncio.sleep(0.1)
+        if not await self._flush_input():
+            await self.disconnect()
+            msg = __("Connection to {}:{} closed unexpectedly.", *self.address)
+            logger.error(msg)
+            raise ControllerError(msg)
+
+    def _encode(self, cmd):
+        for seq in "\r\n":
+            cmd = cmd.replace(seq, "")
+        return ("$" + cmd + "\r\n").encode('ascii')
+
+    async def get_answer(self, timeout=None):
+        return ControlSocket._parse_answer(await self._readline(timeout))
+
+    async def command(self, cmd, timeout=None):
+        response = await super().command(cmd, timeout=timeout)
+        return response[len(cmd) + 1:]
+
+    async def pipeline(self, cmds, timeout=None):
+        """
+        Sends several commands at once and returns their responses. See
+        `controller.ControlSocket.pipeline`.
+        """
+        cmds = list(cmds)
+        async with self._lock:
+            self.writer.write(b"".join(self._encode(cmd) for cmd in cmds))
+            await self.writer.drain()
+            responses = []
+            errors = []
+            for cmd in cmds:
+                try:
+                    responses.append((await self.get_answer(timeout))[len(cmd) + 1:])
+                except ControllerError as error:
+                    responses.append(None)
+                    errors.append((cmd, error))
+        if errors:
+            raise PipelineError(errors, responses)
+        return responses
+
+
+class AsyncDataSocket():
+    """
+    asyncio interface to the data port of the controller. The data packages
+    are decoded by a `controller.DataSocket`, see there for the details.
+    """
+
+    def __init__(self, host, data_port=10001, timeout=2, strict=False):
+        self.address = (host, data_port)
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+        self._decoder = DataSocket(host, data_port, timeout, strict=strict)
+
+    @property
+    def statistics(self):
+        return self._decoder.statistics
+
+    async def connect(self):
+        """Connects to the data port, which starts the data transmission."""
+        self._decoder._reset()
+        try:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(*self.address), self.timeout)
+        except (OSError, asyncio.TimeoutError):
+            msg = __("Could not connect to {} on data port {}.", *self.address)
+            logger.error(msg)
+            raise ControllerError(msg)
+        logger.debug(__("Connected to {} on data port {}.", *self.address))
+
+    async def disconnect(self):
+        """Closes the connection to the data port."""
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except OSError:
+            pass
+        logger.debug(__("Disconnected from {}:{}.", *self.address))
+
+    async def _read_package(self):
+        """Reads the next complete data package into the decoder."""
+        while True:
+            header = await asyncio.wait_for(self.reader.readexactly(32),
+                                            self.timeout)
+            _, nr_of_frames, bytes_per_frame, _ = \
+                self._decoder._parse_header(header)
+            payload = await asyncio.wait_for(
+                self.reader.readexactly(nr_of_frames * bytes_per_frame),
+                self.timeout)
+            if wire_trace.enabled():
+                wire_trace.received(self, header + payload)
+            if nr_of_frames:
+                break
+        self._decoder._buffer.write(header)
+        self._decoder._buffer.write(payload)
+
+    async def get_data(self, data_points, sensors, reducer=None):
+        """
+        Get measurement data from the controller. See
+        `controller.DataSocket.get_data`.
+        """
+        decoder = self._decoder
+        channels = decoder._channels(sensors)
+        if reducer is not None:
+            reducer.reset()
+        else:
+            data = np.zeros((data_points, len(channels)), decoder.dtype)
+        received_points = 0
+        while received_points < data_points:
+            if not decoder._frames_left:
+                await self._read_package()
+            frames = decoder._next_frames(data_points - received_points, channels)
+            n = len(frames)
+            if reducer is not None:
+                reducer.update(frames[:, channels])
+            else:
+                np.take(frames, channels, axis=1,
+                        out=data[received_points:received_points + n])
+            del frames
+            received_points += n
+        if reducer is not None:
+            return reducer
+        return data.T
+
+
+class AsyncController(ControllerCommands):
+    """
+    asyncio interface to the controller. Use as async context manager.
+    The configuration is cached as in `controller.Controller`.
+
+    Parameters
+    ----------
+    See `controller.Controller`.
+    """
+
+    def __init__(self, sensors, host, control_port=23, data_port=10001,
+                 strict=False):
+        self.sensors = [SENSORS[sensor] for sensor in sensors]
+        self.state = {}
+        self.control_socket = AsyncControlSocket(host, control_port)
+        self.data_socket = AsyncDataSocket(host, data_port, strict=strict)
+        self.statistics = {}
+        self._acquisition_lock = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.disconnect()
+
+    async def connect(self):
+        self._acquisition_lock = asyncio.Lock()
+        await self.control_socket.connect()
+        self.state.clear()
+
+    async def disconnect(self):
+        await self.control_socket.disconnect()
+
+    async def configure(self, sampling_time=None, mode=None):
+        """
+        Sets the sampling time and / or the trigger mode, if they change the
+        cached state. See `controller.Controller.configure`.
+        """
+        cmds, actual_time = self._configuration_commands(sampling_time, mode)
+        responses = await self.control_socket.pipeline(cmds)
+        return self._configured(cmds, responses, mode, actual_time)
+
+    async def trigger(self):
+        """Trigger a single measurement."""
+        await self.control_socket.command("GMD")
+
+    async def acquire(self, data_points=1, mode=None, sampling_time=None,
+                      reducer=None):
+        """
+        Acquires `data_points` frames of all sensors. See
+        `controller.Controller.acquire`. Concurrent acquisitions are run one
+        after another.
+        """
+        async with self._acquisition_lock:
+            if mode or sampling_time:
+                await self.configure(sampling_time, mode)
+            await self.data_socket.connect()
+            try:
+                self.data_socket._decoder.reset_statistics()
+                data = await self.data_socket.get_data(
+                    data_points, self.sensors, reducer)
+            finally:
+                self.statistics = dict(self.data_socket.statistics)
+                await self.data_socket.disconnect()
+        return self._result(data, reducer)
+
+
+class AsyncSCPISocket(AsyncIOBase):
+    """asyncio interface to the TCP SCPI socket of the data logger."""
+
+    def __init__(self, host, scpi_port=5025, timeout=1):
+        super().__init__((host, scpi_port), timeout)
+
+    async def _open_connection(self):
+        return await asyncio.open_connection(*self.address)
+
+    async def connect(self):
+        try:
+            await super().connect()
+        except (OSError, asyncio.TimeoutError):
+            msg = __("Could not connect to {} on SCPI port {}.", *self.address)
+            logger.error(msg)
+            raise DataLoggerError(msg)
+
+
+class AsyncDataLogger():
+    """
+    asyncio interface to the data logger. Use as async context manager.
+    See `data_logger.DataLogger`.
+    """
+
+    def __init__(self, host, scpi_port=5025):
+        self._scpi_socket = AsyncSCPISocket(host, scpi_port)
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.disconnect()
+
+    async def connect(self):
+        await self._scpi_socket.connect()
+
+    async def disconnect(self):
+        await self.reset_display()
+        await self._scpi_socket.disconnect()
+
+    async def configure(self, channel):
+        """Configures the monitoring of the temperature on `channel`."""
+        for cmd in ("*RST",
+                    "configure:temperature tc,k,(@{})".format(channel),
+                    "route:mon:chan (@{})".format(channel),
+                    "route:mon:stat on"):
+            await self._scpi_socket.command(cmd, get_response=False)
+
+    async def get_data(self):
+        """Queries and returns the current value of the monitored channel."""
+        return await self._scpi_socket.command("route:mon:data?")
+
+    async def display(self, text):
+        """Displays a custom text on the display."""
+        await self._scpi_socket.command("display:text '{}'".format(text),
+                                        get_response=False)
+
+    async def reset_display(self):
+        """Resets the display to the default."""
+        await self._scpi_socket.command("display:text:clear", get_response=False)
+
+
+class AsyncSerialConnection(AsyncIOBase):
+    """
+    asyncio interface to the serial port of the Arduino running grbl.
+    Requires the package pyserial-asyncio.
+    """
+
+    def __init__(self, serial_port, baud_rate=115200, timeout=1):
+        super().__init__((serial_port, baud_rate), timeout)
+
+    async def _open_connection(self):
+        if serial_asyncio is None:
+            raise TableError("AsyncSerialConnection requires pyserial-asyncio.")
+        return await serial_asyncio.open_serial_connection(
+            url=self.address[0], baudrate=self.address[1])
+
+    async def connect(self):
+        try:
+            await super().connect()
+        except (OSError, asyncio.TimeoutError) as error:
+            logger.error(error)
+            raise NotConnectedError
+        self.writer.write(b"\n\n")
+        await asyncio.sleep(self.timeout)
+        if not await self._flush_input():
+            await self.disconnect()
+            logger.error(__("Connection to {} closed unexpectedly.",
+                            self.address[0]))
+            raise NotConnectedError
+
+    def _encode(self, cmd):
+        for seq in "\r\n":
+            cmd = cmd.replace(seq, "")
+        if cmd not in ['?', 'r', '~', '!']:
+            cmd += "\n"
+        return cmd.encode('ascii')
+
+    async def get_answer(self, timeout=None):
+        """
+        Returns all parsed messages until the acknowledging 'ok' (or status
+        report) from grbl. See `table.SerialConnection.get_answer`.
+        """
+        messages = []
+        while True:
+            message = SerialConnection._parse(await self._readline(timeout))
+            messages.append(message)
+            if SerialConnection._is_final(message):
+                return messages
+
+
+class AsyncTable():
+    """
+    asyncio interface to the table. Use as async context manager.
+    See `table.Table`.
+    """
+
+    def __init__(self, serial_port, baud_rate=115200):
+        self.serial_connection = AsyncSerialConnection(serial_port, baud_rate)
+        self.settings = None
+        self._work_offset = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.disconnect()
+
+    async def connect(self):
+        await self.serial_connection.connect()
+        return (await self.get_status())[0]
+
+    async def disconnect(self):
+        await self.serial_connection.disconnect()
+        self._work_offset = None
+
+    async def get_settings(self, *n):
+        """Returns the grbl settings values with the id(s) `n`."""
+        if self.settings is None:
+            answer = await self.serial_connection.command("$$")
+            self.settings = {message.number: message.value for message in answer
+                             if message.key == 'setting'}
+        return [self.settings[i] for i in n]
+
+    async def motion_model(self):
+        """Returns the `table.MotionModel` for the current grbl settings."""
+        await self.get_settings(100, 110, 120)
+        return MotionModel.from_settings(self.settings)
+
+    async def get_status(self):
+        """Returns the tuple (status, position). See `table.Table.get_status`."""
+        answer = await self.serial_connection.command("?")
+        status = Table._parse_status(answer[0])
+        offset = Table._parse_work_offset(answer[0])
+        if offset is not None:
+            self._work_offset = offset
+        return status
+
+    async def work_offset(self):
+        """
+        Returns (x, y), the work coordinate offset in mm. See
+        `table.Table.work_offset`.
+        """
+        if self._work_offset is None:
+            self._work_offset = Table._parse_offsets(
+                await self.serial_connection.command("$#"))
+        return self._work_offset
+
+    async def move(self, x=None, y=None, mode='absolute', feed='max'):
+        """
+        Moves the table linearly to the desired coordinates and waits until
+        the movement is finished. See `table.Table.move`.
+        """
+        previous_position = (await self.get_status())[1]
+        if feed == 'max':
+            feed = min(await self.get_settings(110, 111))
+        model = await self.motion_model()
+        offset = (0., 0.)
+        if mode.lower() != 'relative':
+            offset = await self.work_offset()
+        target = Table._target(previous_position, x, y, mode, offset)
+        start = time.perf_counter()
+        await self.serial_connection.command(
+            Table._move_command(x, y, mode, feed))
+        await self.wait_idle(model.duration(previous_position, target, feed),
+                             start)
+        return previous_position
+
+    async def wait_idle(self, duration=None, start=None):
+        """
+        Waits until grbl is idle (or in check mode) and returns the position.
+        The status is not polled before shortly before the end of the motion
+        started at `start`, which is predicted to take `duration` seconds.
+        See `table.Table._wait_idle`.
+
+        Raises
+        ------
+        TimeoutError :
+            if grbl is not idle within `table.Table.idle_timeout` seconds
+            after the predicted end of the motion.
+        """
+        if start is None:
+            start = time.perf_counter()
+        deadline = None
+        if duration is not None:
+            deadline = start + 1.5 * duration + Table.idle_timeout
+            remaining = (start + duration - 0.01 - 0.05 * duration
+                         - time.perf_counter())
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+        while True:
+            status, position = await self.get_status()
+            if status.lower() in ("idle", "check"):
+                return position
+            if deadline is not None and time.perf_counter() > deadline:
+                msg = __("grbl is not idle {:.1f} s after the start of the "
+                         "motion (state {}).", time.perf_counter() - start,
+                         status)
+                logger.error(msg)
+                raise TimeoutError(msg)
+            await asyncio.sleep(Table.poll_interval)
+
+
+async def scan(controller, table, data_logger, positions, data_points,
+               reducer=MeanStd):
+    """
+    Rasters `positions` without any threads. At each position, the movement
+    runs concurrently with the display update, and the data acquisition runs
+    concurrently with the temperature readout.
+
+    Parameters
+    ----------
+    controller : AsyncController
+    table : AsyncTable
+    data_logger : AsyncDataLogger
+        The connected devices.
+    positions : list of tuples
+        The pairs (i_pos, (x, y)) as returned by
+        `measurement.Measurement._positions`.
+    data_points : int
+        The number of data points per position.
+    reducer : type, optional
+        The reducer class that is applied to the data at each position.
+
+    Returns
+    -------
+    z : 2D-array
+        The reduced data (sensors x positions x reducer result).
+    T, t : 1D-array
+        The temperature and the time of each position.
+    """
+    length = len(positions)
+    width = len(controller.sensors)
+    z = [None] * length
+    T = np.zeros(length)
+    t = np.zeros(length)
+    for i, (i_pos, (x, y)) in enumerate(positions):
+        counter = "{i: >{width:}}/{length:}".format(
+            i=i + 1, width=len(str(length)), length=length).rjust(13)
+        await asyncio.gather(table.move(x, y, 'absolute'),
+                             data_logger.display(counter))
+        t[i] = time.time()
+        z[i_pos], T[i_pos] = await asyncio.gather(
+            controller.acquire(data_points, reducer=reducer()),
+            data_logger.get_data())
+    return np.array(z).reshape(length, width, -1).transpose(1, 0, 2), T, t
@@ -2,9 +2,15 @@
 Base classes that implement general I/O functionality with devices.
 """
 
+import time
+import math
+import zlib
 import threading
 import queue
+import socket
 import logging
+import selectors
+import collections
 from functools import wraps
 from .helper import BraceMessage as __
 
@@ -17,7 +23,8 @@ logger = logging.getLogger(__name__)
 class ExceptionThread(threading.Thread):
     """
     A Thread class that queues Exceptions that are raised during the run of
-    its target function, and reraises them after joining.
+    its target function, and reraises them after joining. If `join` times
+    out, the thread is still alive and nothing is reraised.
     """
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -29,8 +36,10 @@ class ExceptionThread(threading.Thread):
         except BaseException as error:
             self.exception_queue.put(error)
 
-    def join(self):
-        super().join()
+    def join(self, timeout=None):
+        super().join(timeout)
+        if self.is_alive():
+            return
         try:
             exc = self.exception_queue.get_nowait()
         except queue.Empty:
@@ -39,6 +48,389 @@ class ExceptionThread(threading.Thread):
             raise exc
 
 
+class _Task():
+    """A task of a `WorkerPool`."""
+    __slots__ = ('target', 'args', 'done', 'exception')
+
+    def __init__(self, target, args):
+        self.target = target
+        self.args = args
+        self.done = threading.Event()
+        self.exception = None
+
+    def wait(self):
+        """Waits until the task is finished and reraises its exception."""
+        self.done.wait()
+        if self.exception is not None:
+            raise self.exception
+
+
+class WorkerPool():
+    """
+    Long-lived worker threads, one per key (e.g. per device), that run the
+    tasks of a loop instead of a new `ExceptionThread` per task.
+
+    The tasks of a key are run one after another in the order of
+    submission, so a worker per device serializes the access to the device.
+    Exceptions raised by a task are reraised in the submitting thread, like
+    by `ExceptionThread.join`. The workers are started on the first task of
+    their key and stopped by `shutdown` (or at the end of a with-block).
+
+    Example
+    -------
+      >>> with WorkerPool() as pool:
+      >>>     for position in positions:
+      >>>         pool.run(('table', table.move, position),
+      >>>                  ('data_logger', data_logger.display, str(position)))
+    """
+
+    def __init__(self):
+        self._queues = {}
+        self._threads = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+    def submit(self, key, target, *args):
+        """
+        Runs ``target(*args)`` on the worker of `key` and returns the task,
+        whose method ``wait`` waits for it and reraises its exception.
+        """
+        tasks = self._queues.get(key)
+        if tasks is None:
+            tasks = self._queues[key] = queue.SimpleQueue()
+            thread = threading.Thread(target=self._work, args=(tasks,),
+                                      name="WorkerPool.{}".format(key),
+                                      daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        task = _Task(target, args)
+        tasks.put(task)
+        return task
+
+    def run(self, *tasks):
+        """
+        Runs the `tasks`, tuples (key, target, args), concurrently and waits
+        until all of them are finished. The exception of the first failed
+        task is reraised.
+        """
+        self.wait_all([self.submit(key, target, *args)
+                       for key, target, args in tasks])
+
+    @staticmethod
+    def wait_all(tasks):
+        """
+        Waits until all `tasks` are finished, also if one of them fails. The
+        exceptions of all failed tasks are logged and the first one is
+        reraised.
+        """
+        for task in tasks:
+            task.done.wait()
+        failed = [task.exception for task in tasks if task.exception is not None]
+        for error in failed:
+            logger.error(__("Task failed: {!r}", error))
+        if failed:
+            raise failed[0]
+
+    def shutdown(self):
+        """Stops the workers after their pending tasks."""
+        for tasks in self._queues.values():
+            tasks.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._queues.clear()
+        self._threads.clear()
+
+    @staticmethod
+    def _work(tasks):
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            try:
+                task.target(*task.args)
+            except BaseException as error:
+                task.exception = error
+            finally:
+                task.done.set()
+
+
+class WireTrace():
+    """
+    The trace channel of the data exchanged with the devices.
+
+    The interfaces pass every chunk they send or receive to `sent` and
+    `received`, but only after checking `enabled`, so no message is built
+    on the hot path while the trace is off. The chunks are logged to
+    `logger` (``kapascan.wire``) at level DEBUG, summarized as length,
+    CRC-32 and the first `payload_limit` bytes. Set `payload_limit` to None
+    to log complete payloads.
+
+    For full captures at a high data rate, set `sink` to an object with the
+    methods ``sent(device, data)`` and ``received(device, data)``, e.g. a
+    `recording.Recorder`. The sink gets every payload unmodified and
+    independently of the log level.
+
+    Example
+    -------
+      >>> logging.getLogger('kapascan.wire').setLevel(logging.DEBUG)
+      >>> wire_trace.sink = Recorder('trace.rec')
+    """
+
+    def __init__(self, logger, payload_limit=32):
+        self.logger = logger
+        self.payload_limit = payload_limit
+        self.sink = None
+
+    def enabled(self):
+        """Returns True if the trace is logged or has a sink."""
+        return self.sink is not None or self.logger.isEnabledFor(logging.DEBUG)
+
+    def sent(self, device, data):
+        """Traces `data` sent by `device`."""
+        if self.sink is not None:
+            self.sink.sent(device, data)
+        self._log(device, "Sent", data)
+
+    def received(self, device, data):
+        """Traces `data` received by `device`."""
+        if self.sink is not None:
+            self.sink.received(device, data)
+        self._log(device, "Received", data)
+
+    def _log(self, device, direction, data):
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        if self.payload_limit is None:
+            self.logger.debug(__("{} {}: {!r}", device.__class__.__name__,
+                                 direction, bytes(data)))
+        else:
+            self.logger.debug(__(
+                "{} {} {} bytes (crc32 {:08x}): {!r}{}", device.__class__.__name__,
+                direction, len(data), zlib.crc32(data),
+                bytes(data[:self.payload_limit]),
+                "..." if len(data) > self.payload_limit else ""))
+
+
+wire_trace = WireTrace(logging.getLogger(__name__.rpartition('.')[0] + '.wire'))
+
+
+class MonitoredQueue(queue.Queue):
+    """
+    A queue that records its maximal depth (`high_water`) and optionally
+    drops items when it is full.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        The maximal number of items. 0 means unbounded.
+    policy : str {'block', 'drop_oldest', 'drop_newest'}, optional
+        What `put` does if the queue is full: Block until there is space,
+        drop the oldest item in the queue or drop the new item. Dropped items
+        are counted in `dropped`.
+
+    If `timed` is set with `set_timed`, the time each item waits in the queue
+    is accumulated in `wait_total` and `wait_max` (seconds) and counted in
+    `wait_count`.
+    """
+    policies = ('block', 'drop_oldest', 'drop_newest')
+
+    def __init__(self, maxsize=0, policy='block'):
+        if policy not in self.policies:
+            raise ValueError("Invalid queue policy: {}".format(policy))
+        super().__init__(maxsize)
+        self.policy = policy
+        self.high_water = 0
+        self.dropped = 0
+        self.timed = False
+        self._stamps = collections.deque()
+        self.wait_total = 0.
+        self.wait_max = 0.
+        self.wait_count = 0
+
+    def set_timed(self, timed=True):
+        """Switches the measurement of the waiting time on or off."""
+        with self.mutex:
+            now = time.perf_counter()
+            self._stamps = collections.deque([now] * self._qsize())
+            self.timed = timed
+
+    def _put(self, item):
+        super()._put(item)
+        self.high_water = max(self.high_water, self._qsize())
+        if self.timed:
+            self._stamps.append(time.perf_counter())
+
+    def _get(self):
+        item = super()._get()
+        if self.timed:
+            wait = time.perf_counter() - self._stamps.popleft()
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            self.wait_count += 1
+        return item
+
+    def put(self, item, block=True, timeout=None):
+        if self.policy == 'block' or self.maxsize <= 0:
+            return super().put(item, block, timeout)
+        with self.not_full:
+            if self._qsize() >= self.maxsize:
+                self.dropped += 1
+                if self.policy == 'drop_newest':
+                    return
+                self._get()
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def statistics(self):
+        """
+        Returns the current size, high-water mark and dropped items and, if
+        the queue is timed, the mean and maximal waiting time in seconds.
+        """
+        with self.mutex:
+            statistics = {'size': self._qsize(), 'maxsize': self.maxsize,
+                          'high_water': self.high_water, 'dropped': self.dropped}
+            if self.timed:
+                statistics['mean_wait'] = (self.wait_total / self.wait_count
+                                           if self.wait_count else 0.)
+                statistics['max_wait'] = self.wait_max
+            return statistics
+
+
+class Instrumentation():
+    """
+    Records the I/O statistics of an `IOBase` instance: the round-trip
+    latency of `command` per command verb, the timeouts per verb and the
+    number of items and bytes sent and received.
+
+    The latencies are sorted into a histogram with logarithmic bins
+    (`bins_per_octave` bins per factor of two), so the memory usage does not
+    grow with the number of commands. The percentiles of `snapshot` and
+    `summary` are the upper edges of the respective bins.
+
+    Example
+    -------
+      >>> instrumentation = table.serial_connection.instrument()
+      >>> table.move(10, 10)
+      >>> print(instrumentation.summary())
+    """
+    bins_per_octave = 8
+    percentiles = (50, 90, 99)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clears all records."""
+        with self._lock:
+            self.latencies = {}
+            self.timeouts = collections.Counter()
+        self.items_in = 0
+        self.items_out = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def record(self, verb, latency):
+        """Adds the round-trip time `latency` in seconds of a command `verb`."""
+        index = math.floor(math.log2(max(latency, 1e-9)) * self.bins_per_octave)
+        with self._lock:
+            entry = self.latencies.get(verb)
+            if entry is None:
+                entry = self.latencies[verb] = {
+                    'count': 0, 'total': 0., 'min': latency, 'max': latency,
+                    'bins': collections.Counter()}
+            entry['count'] += 1
+            entry['total'] += latency
+            entry['min'] = min(entry['min'], latency)
+            entry['max'] = max(entry['max'], latency)
+            entry['bins'][index] += 1
+
+    def timeout(self, verb):
+        """Counts a timeout of a command `verb`."""
+        with self._lock:
+            self.timeouts[verb] += 1
+
+    def received(self, data):
+        """Counts the received item `data`."""
+        self.items_in += 1
+        self.bytes_in += self._size(data)
+
+    def sent(self, cmd):
+        """Counts the sent command `cmd` (or list of commands)."""
+        self.items_out += 1
+        self.bytes_out += self._size(cmd)
+
+    @staticmethod
+    def _size(data):
+        if isinstance(data, (list, tuple)):
+            return sum(len(item) for item in data)
+        return len(data)
+
+    def _percentile(self, entry, q):
+        """Returns the upper edge of the bin of the `q`-th percentile."""
+        rank = q / 100 * entry['count']
+        cumulative = 0
+        for index in sorted(entry['bins']):
+            cumulative += entry['bins'][index]
+            if cumulative >= rank:
+                edge = 2 ** ((index + 1) / self.bins_per_octave)
+                return min(max(edge, entry['min']), entry['max'])
+        return entry['max']
+
+    def snapshot(self):
+        """
+        Returns the statistics as a dict.
+
+        Returns
+        -------
+        snapshot : dict
+            With the keys 'commands' (a dict with count, mean, min, max,
+            percentiles and timeouts in seconds per verb), 'items_in',
+            'items_out', 'bytes_in' and 'bytes_out'.
+        """
+        commands = {}
+        with self._lock:
+            verbs = set(self.latencies) | set(self.timeouts)
+            for verb in verbs:
+                entry = self.latencies.get(verb)
+                statistics = {'count': 0, 'timeouts': self.timeouts[verb]}
+                if entry is not None:
+                    statistics.update(
+                        count=entry['count'], total=entry['total'],
+                        mean=entry['total'] / entry['count'],
+                        min=entry['min'], max=entry['max'])
+                    for q in self.percentiles:
+                        statistics['p{}'.format(q)] = self._percentile(entry, q)
+                commands[verb] = statistics
+        return {'commands': commands,
+                'items_in': self.items_in, 'items_out': self.items_out,
+                'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out}
+
+    def summary(self):
+        """
+        Returns the latency statistics per verb as a NumPy structured array,
+        sorted by the total time spent, with the fields 'verb', 'count',
+        'timeouts', 'total', 'mean', 'min', 'p50', 'p90', 'p99' and 'max'.
+        """
+        import numpy as np
+        fields = ['total', 'mean', 'min'] + ['p{}'.format(q) for q in
+                                              self.percentiles] + ['max']
+        commands = self.snapshot()['commands']
+        dtype = ([('verb', 'U32'), ('count', 'i8'), ('timeouts', 'i8')] +
+                 [(field, 'f8') for field in fields])
+        rows = [(verb, stats['count'], stats['timeouts']) +
+                tuple(stats.get(field, np.nan) for field in fields)
+                for verb, stats in commands.items()]
+        summary = np.array(rows, dtype=dtype)
+        return summary[np.argsort(-np.nan_to_num(summary['total']),
+                                  kind='stable')]
+
+
 class IOBase():
     """
     The base class for all device related I/O.  Inherit from this class to get
@@ -52,20 +444,114 @@ class IOBase():
     `address` and `timeout` are stored as attributes and can be used by the
     other methods to connect to the device. `do_input` and `do_output` are
     Boolean flags that set if the class is used for input and / or output.
+
+    If the attribute `reactor` is set to a running `Reactor` before
+    connecting, no I/O threads are started. Instead, the I/O of the device is
+    multiplexed with other devices in the single thread of the reactor.
+
+    The I/O threads do not poll: `disconnect` wakes the output thread with a
+    sentinel on `out_queue` and the input thread via `_interrupt`, so the
+    threads are joined without waiting for any timeout. The queues can be
+    bounded with `limit_queues`; their depth is reported by
+    `queue_statistics`.
+
+    `instrument` switches on the recording of latencies, timeouts, bytes and
+    queue waiting times, see `Instrumentation`. Without it, the I/O is not
+    timed at all.
+
+    If the attribute `recorder` is set to a `recording.Recorder`, the raw
+    data of the connection is logged. If the attribute `replay` is set to a
+    `recording.Replay`, `connect` does not connect to the device but replays
+    a recorded session. Both require the class attribute `_transport`, the
+    name of the attribute that holds the socket or serial port.
     """
+    _wakeup = object()
+    _transport = None
+
     def __init__(self, address, timeout=1, do_input=True, do_output=True):
         self.address = address
         self.timeout = timeout
+        self.reactor = None
+        self.instrumentation = None
+        self.recorder = None
+        self.replay = None
+        self._raw_transport = None
+        self._substituted = False
         self.threads = []
         self._targets = []
         if do_input:
-            self.in_queue = queue.Queue()
+            self.in_queue = MonitoredQueue()
             self._targets.append(self._input)
         if do_output:
-            self.out_queue = queue.Queue()
+            self.out_queue = MonitoredQueue()
             self._targets.append(self._output)
         self._stop = threading.Event()
 
+    def limit_queues(self, maxsize, policy='block'):
+        """
+        Bounds the queues to `maxsize` items. If `in_queue` is full, incoming
+        data is handled according to `policy` (see `MonitoredQueue`). Adding
+        a command to a full `out_queue` always blocks. Must be called while
+        the device is disconnected.
+        """
+        if hasattr(self, 'in_queue'):
+            self.in_queue = MonitoredQueue(maxsize, policy)
+        if hasattr(self, 'out_queue'):
+            self.out_queue = MonitoredQueue(maxsize)
+        self._time_queues(self.instrumentation is not None)
+
+    def queue_statistics(self):
+        """
+        Returns a dict with the statistics (see `MonitoredQueue.statistics`)
+        of the queues.
+        """
+        return {name: getattr(self, name).statistics()
+                for name in ('in_queue', 'out_queue') if hasattr(self, name)}
+
+    def instrument(self, enable=True):
+        """
+        Switches the instrumentation of the I/O on or off.
+
+        Returns
+        -------
+        instrumentation : Instrumentation or None
+            The new instrumentation, which is also stored in attribute
+            `instrumentation`.
+        """
+        self.instrumentation = Instrumentation() if enable else None
+        self._time_queues(enable)
+        return self.instrumentation
+
+    def io_statistics(self):
+        """
+        Returns the snapshot of the instrumentation (see
+        `Instrumentation.snapshot`) together with the `queue_statistics`, or
+        None if the I/O is not instrumented.
+        """
+        if self.instrumentation is None:
+            return None
+        snapshot = self.instrumentation.snapshot()
+        snapshot['queues'] = self.queue_statistics()
+        return snapshot
+
+    def _time_queues(self, timed):
+        for name in ('in_queue', 'out_queue'):
+            if hasattr(self, name):
+                getattr(self, name).set_timed(timed)
+
+    def _verb(self, cmd):
+        """
+        Returns the verb of command `cmd` that the latencies are recorded
+        under. Defaults to the first word of the command, up to a '='. Lists
+        of commands are recorded under the verb of their first command.
+        """
+        if isinstance(cmd, (list, tuple)):
+            cmd = cmd[0] if cmd else ""
+        if not isinstance(cmd, str):
+            return type(cmd).__name__
+        words = cmd.split(None, 1)
+        return words[0].split("=", 1)[0] if words else ""
+
     def _open(self):
         """
         Override this method to implement the initialzsation of the connection,
@@ -94,6 +580,66 @@ class IOBase():
         """
         raise NotImplementedError
 
+    def _encode(self, cmd):
+        """
+        Override this method to return the bytes that are sent for `cmd`
+        (only used with a `Reactor`).
+        """
+        raise NotImplementedError
+
+    def _write_ready(self, data):
+        """
+        Override this method to write as much of `data` as possible to the
+        writable connection without blocking, and return the number of bytes
+        written (only used with a `Reactor`).
+        """
+        raise NotImplementedError
+
+    def _receive_ready(self):
+        """
+        Override this method to receive without blocking (only used with a
+        `Reactor`): Return the data if it is complete after reading at most
+        once from the readable connection. Return `None` otherwise. The
+        default implementation calls `_receive`, which suffices if `_receive`
+        reads only once.
+        """
+        return self._receive()
+
+    def _reset(self):
+        """
+        Override this method to reset the state of the parser for a new
+        connection. Called by `connect` instead of `_open` on a replay.
+        """
+
+    def _interrupt(self):
+        """
+        Override this method to wake up a `_receive` call that blocks in the
+        input thread, e.g. by shutting down the socket. Called by
+        `disconnect`. Without it, `disconnect` waits for the timeout of
+        `_receive`.
+        """
+
+    def _fileno(self):
+        """
+        Override this method to return the file descriptor of the connection.
+        Only needed for the use with a `Reactor`.
+        """
+        raise NotImplementedError
+
+    def _pending(self):
+        """
+        Override this method to return True if `_receive` has buffered data
+        that can be returned without reading from the connection.
+        """
+        return False
+
+    def _wants_input(self):
+        """
+        Override this method to return False while no data should be read
+        from the connection (only used with a `Reactor`).
+        """
+        return True
+
     def get_answer(self, timeout=None):
         """
         Override this method to implement the parsing of incomming data as
@@ -129,12 +675,15 @@ class IOBase():
 
     def _output(self):
         """The main ouput thread."""
-        while not self._stop.is_set():
-            try:
-                cmd = self.out_queue.get(timeout=self.timeout)
-            except queue.Empty:
+        while True:
+            cmd = self.out_queue.get()
+            if cmd is self._wakeup:
+                if self._stop.is_set():
+                    break
                 continue
             self._send(cmd)
+            if self.instrumentation is not None:
+                self.instrumentation.sent(cmd)
         while not self.out_queue.empty():
             self.out_queue.get_nowait()
             logger.debug(__("Clearing out_queue of {}", self.__class__.__name__))
@@ -143,18 +692,55 @@ class IOBase():
     def _input(self):
         """The main input thread."""
         while not self._stop.is_set():
-            data = self._receive()
-            if data is not None:
-                self.in_queue.put(data)
+            try:
+                data = self._receive()
+            except Exception:
+                if self._stop.is_set():
+                    break
+                raise
+            if data is not None and self.instrumentation is not None:
+                self.instrumentation.received(data)
+            while data is not None and not self._stop.is_set():
+                try:
+                    self.in_queue.put(data, timeout=self.timeout)
+                    break
+                except queue.Full:
+                    continue
         while not self.in_queue.empty():
             self.in_queue.get_nowait()
             logger.debug(__("Clearing in_queue of {}", self.__class__.__name__))
         logger.debug(__("{}'s in_queue clear.", self.__class__.__name__))
 
     def connect(self):
-        """Opens the connection to the device and starts all I/O threads."""
+        """
+        Opens the connection to the device and starts all I/O threads.
+
+        Raises
+        ------
+        ValueError :
+            If both a replay and a reactor are set. A replayed session has
+            no file descriptor that a reactor could select.
+        """
+        if self.replay is not None and self.reactor is not None:
+            raise ValueError("{}: A replay cannot be used with a reactor."
+                             .format(self.__class__.__name__))
         self._stop.clear()
-        self._open()
+        if self.replay is not None:
+            self._raw_transport = getattr(self, self._transport, None)
+            self._substituted = True
+            self._reset()
+            setattr(self, self._transport, self.replay.transport(
+                self.__class__.__name__, self.timeout))
+        else:
+            self._open()
+            if self.recorder is not None:
+                self._raw_transport = getattr(self, self._transport)
+                self._substituted = True
+                setattr(self, self._transport, self.recorder.transport(
+                    self._raw_transport, self.__class__.__name__))
+        if self.reactor is not None:
+            self.reactor.register(self)
+            return
         for target in self._targets:
             name = self.__class__.__name__ + "." + target.__name__
             thread = ExceptionThread(target=target, name=name)
@@ -165,11 +751,62 @@ class IOBase():
     def disconnect(self):
         """Disconnects from the device and stops all I/O threads."""
         self._stop.set()
-        for thread in self.threads:
+        if self.reactor is not None:
+            try:
+                self.reactor.unregister(self)
+            finally:
+                self._close()
+                self._restore_transport()
+            return
+        if self.threads and hasattr(self, 'out_queue'):
+            self._queue_wakeup()
+        # join the output thread before the connection is interrupted
+        for thread in sorted(self.threads, key=lambda t: t.name.endswith('._input')):
+            if thread.name.endswith('._input'):
+                self._interrupt()
+                while not self.in_queue.empty():
+                    self.in_queue.get_nowait()
             thread.join()
             logger.debug("Joined thread: {}".format(thread.name))
         self.threads.clear()
         self._close()
+        self._restore_transport()
+
+    def _queue_wakeup(self):
+        """
+        Queues the sentinel that stops the output thread. The commands queued
+        before it are still sent. If `out_queue` is full and the output
+        thread is dead (e.g. after an error) or does not make room within
+        `timeout`, the oldest commands are discarded instead of blocking.
+        """
+        output = next((thread for thread in self.threads
+                       if thread.name.endswith('._output')), None)
+        while True:
+            alive = output is not None and output.is_alive()
+            try:
+                self.out_queue.put(self._wakeup,
+                                   timeout=self.timeout if alive else 0)
+                return
+            except queue.Full:
+                try:
+                    cmd = self.out_queue.get_nowait()
+                except queue.Empty:
+                    continue
+                logger.debug(__("Discarded queued command {!r} of {}.",
+                                cmd, self.__class__.__name__))
+
+    def _restore_transport(self):
+        """Removes the transport of a recording or replay."""
+        if self._substituted:
+            setattr(self, self._transport, self._raw_transport)
+            self._raw_transport = None
+            self._substituted = False
+
+    def _put(self, cmd):
+        """Queues `cmd` for sending."""
+        self.out_queue.put(cmd)
+        if self.reactor is not None:
+            self.reactor.wake()
 
     def command(self, cmd, get_response=True, timeout=None):
         """
@@ -196,17 +833,287 @@ class IOBase():
             If now response is received within self.timeout seconds.
         """
         if not self._stop.is_set():
-            self.out_queue.put(cmd)
+            instrumentation = self.instrumentation
+            if instrumentation is not None:
+                start = time.perf_counter()
+            self._put(cmd)
             if get_response:
                 try:
                     answer = self.get_answer(timeout)
-                except queue.Empty:
+                except (queue.Empty, TimeoutError) as error:
+                    if instrumentation is not None:
+                        instrumentation.timeout(self._verb(cmd))
+                    if isinstance(error, TimeoutError):
+                        raise
                     raise TimeoutError(
                         "No response to command '{}'. ".format(cmd) +
                         "I/O threads and device still alive?")
+                if instrumentation is not None:
+                    instrumentation.record(self._verb(cmd),
+                                           time.perf_counter() - start)
                 return answer
 
 
+class Reactor():
+    """
+    Multiplexes the I/O of several `IOBase` instances in a single thread with
+    a selector, instead of two polling threads per device.
+
+    Devices are registered on `connect` if their attribute `reactor` is set.
+    Incoming data is read as soon as the file descriptor of a device is
+    readable and put into its `in_queue`, without blocking (see
+    `IOBase._receive_ready`), so a slow device does not stall the others. If
+    the `in_queue` of a device is full, the data is held back and the device
+    is not read until the queue has space again. Outgoing commands are
+    taken as soon as the reactor is woken up by `command` and encoded into
+    an output buffer per device, which is written whenever the file
+    descriptor is writable (see `IOBase._write_ready`). `command` and
+    `get_answer` work as with the threaded I/O.
+
+    An exception raised during the I/O of a device unregisters the device and
+    is reraised on its `disconnect`.
+
+    Example
+    -------
+      >>> with Reactor() as reactor:
+      >>>     controller.use_reactor(reactor)
+      >>>     table.use_reactor(reactor)
+      >>>     with controller, table:
+      >>>         ...
+    """
+
+    def __init__(self):
+        self._selector = None
+        self._devices = {}
+        self._fds = {}
+        self._masks = {}
+        self._held = {}
+        self._out = {}
+        self._errors = {}
+        self._removals = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = None
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """Starts the reactor thread."""
+        self._stop.clear()
+        self._selector = selectors.DefaultSelector()
+        self._wakeup = socket.socketpair()
+        for sock in self._wakeup:
+            sock.setblocking(False)
+        self._selector.register(self._wakeup[0], selectors.EVENT_READ, None)
+        self._thread = ExceptionThread(target=self._run, name="Reactor")
+        self._thread.start()
+        logger.debug("Started reactor.")
+
+    def stop(self):
+        """Stops the reactor thread. Returns as soon as the thread is joined."""
+        self._stop.set()
+        self.wake()
+        try:
+            self._thread.join()
+        finally:
+            self._selector.close()
+            for sock in self._wakeup:
+                sock.close()
+            logger.debug("Stopped reactor.")
+
+    def wake(self):
+        """Wakes up the reactor thread, e.g. to send queued commands."""
+        try:
+            self._wakeup[1].send(b"\0")
+        except BlockingIOError:
+            pass
+
+    def register(self, device):
+        """Starts handling the I/O of `device`."""
+        with self._lock:
+            self._devices[device] = None
+            self._errors.pop(device, None)
+        self.wake()
+        logger.debug(__("Registered {} with reactor.", device.__class__.__name__))
+
+    def unregister(self, device):
+        """
+        Stops handling the I/O of `device` and clears its queues. Returns as
+        soon as the reactor thread does not access `device` anymore. Reraises
+        an exception that occurred during the I/O of `device`.
+        """
+        removed = threading.Event()
+        with self._lock:
+            self._devices.pop(device, None)
+            error = self._errors.pop(device, None)
+            self._removals.append(removed)
+        self.wake()
+        if (self._thread is not threading.current_thread()
+                and self._thread.is_alive()):
+            removed.wait()
+        for name in ('in_queue', 'out_queue'):
+            io_queue = getattr(device, name, None)
+            while io_queue is not None and not io_queue.empty():
+                io_queue.get_nowait()
+        logger.debug(__("Unregistered {} from reactor.", device.__class__.__name__))
+        if error is not None:
+            raise error
+
+    def _update_selector(self):
+        """
+        Synchronizes the selector with the registered devices: A device is
+        selected for reading while it wants input and none of its data is
+        held back, and for writing while it has buffered output. Returns True
+        if the input of a device is paused.
+        """
+        paused = False
+        with self._lock:
+            devices = list(self._devices)
+            removals = self._removals[:]
+            self._removals.clear()
+        for held in (self._held, self._out):
+            for device in list(held):
+                if device not in devices:
+                    del held[device]
+        for device in list(self._fds):
+            if device not in devices:
+                self._selector.unregister(self._fds.pop(device))
+                del self._masks[device]
+        for removed in removals:
+            removed.set()
+        for device in devices:
+            mask = 0
+            if hasattr(device, 'in_queue'):
+                if device in self._held or not device._wants_input():
+                    paused = True
+                else:
+                    mask |= selectors.EVENT_READ
+            if self._out.get(device):
+                mask |= selectors.EVENT_WRITE
+            current = self._masks.get(device, 0)
+            if mask == current:
+                continue
+            if not mask:
+                self._selector.unregister(self._fds.pop(device))
+                del self._masks[device]
+            elif not current:
+                self._fds[device] = device._fileno()
+                self._selector.register(self._fds[device], mask, device)
+                self._masks[device] = mask
+            else:
+                self._selector.modify(self._fds[device], mask, device)
+                self._masks[device] = mask
+        return paused
+
+    def _fail(self, device, error):
+        """Unregisters `device` after `error` occurred during its I/O."""
+        logger.error(__("I/O error of {}: {!r}", device.__class__.__name__, error))
+        with self._lock:
+            if device in self._devices:
+                del self._devices[device]
+                self._errors[device] = error
+
+    def _input(self, device, readable):
+        """
+        Puts the data held back for `device` and then the data it receives
+        into its `in_queue`, as long as the queue has space. The connection
+        is only read if it is `readable`.
+        """
+        try:
+            held = self._held.get(device)
+            while held:
+                device.in_queue.put_nowait(held[0])
+                held.popleft()
+            self._held.pop(device, None)
+            if not (readable or device._pending()):
+                return
+            while True:
+                data = device._receive_ready()
+                if data is not None:
+                    if device.instrumentation is not None:
+                        device.instrumentation.received(data)
+                    try:
+                        device.in_queue.put_nowait(data)
+                    except queue.Full:
+                        self._held[device] = collections.deque([data])
+                        return
+                if not device._pending():
+                    return
+        except queue.Full:
+            pass
+        except Exception as error:
+            self._fail(device, error)
+
+    def _queue_output(self, device):
+        """
+        Moves the commands queued for `device` into its output buffer, which
+        is written as soon as the connection is writable.
+        """
+        out_queue = getattr(device, 'out_queue', None)
+        try:
+            while out_queue is not None and not out_queue.empty():
+                cmd = out_queue.get_nowait()
+                data = device._encode(cmd)
+                if wire_trace.enabled():
+                    wire_trace.sent(device, data)
+                self._out.setdefault(device, bytearray()).extend(data)
+                if device.instrumentation is not None:
+                    device.instrumentation.sent(cmd)
+        except Exception as error:
+            self._fail(device, error)
+
+    def _output(self, device):
+        """Writes the output buffer of `device` as far as possible."""
+        buffer = self._out.get(device)
+        if not buffer:
+            return
+        try:
+            written = device._write_ready(bytes(buffer))
+        except Exception as error:
+            self._fail(device, error)
+        else:
+            del buffer[:written]
+
+    def _run(self):
+        """The main loop of the reactor thread."""
+        while not self._stop.is_set():
+            paused = self._update_selector()
+            events = self._selector.select(timeout=0.01 if paused else None)
+            for key, mask in events:
+                device = key.data
+                if device is None:
+                    try:
+                        while self._wakeup[0].recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                if mask & selectors.EVENT_WRITE:
+                    self._output(device)
+                if mask & selectors.EVENT_READ:
+                    self._input(device, readable=True)
+            for device in list(self._held):
+                self._input(device, readable=False)
+            with self._lock:
+                devices = list(self._devices)
+            for device in devices:
+                self._queue_output(device)
+        for device in list(self._fds):
+            self._selector.unregister(self._fds.pop(device))
+        self._masks.clear()
+        self._out.clear()
+        with self._lock:
+            for removed in self._removals:
+                removed.set()
+            self._removals.clear()
+
+
 class NotConnectedError(Exception):
     """Raised if a method of a device is called that is not connected yet."""
 
@@ -252,6 +1159,56 @@ class Device():
     def __exit__(self, *args):
         self.disconnect()
 
+    def use_reactor(self, reactor):
+        """
+        Handles the I/O of all connections of the device with `reactor`
+        instead of separate I/O threads. Pass None to switch back to threads.
+        Must be called while the device is disconnected. Cannot be combined
+        with `use_replay`.
+        """
+        for value in vars(self).values():
+            if isinstance(value, IOBase):
+                value.reactor = reactor
+
+    def use_recorder(self, recorder):
+        """
+        Records the data of all connections of the device with `recorder`, a
+        `recording.Recorder`. Pass None to stop recording. Must be called
+        while the device is disconnected.
+        """
+        for value in vars(self).values():
+            if isinstance(value, IOBase):
+                value.recorder = recorder
+
+    def use_replay(self, replay):
+        """
+        Replays the sessions of all connections of the device from `replay`,
+        a `recording.Replay`, instead of connecting to the device. Pass None
+        to connect to the device again. Must be called while the device is
+        disconnected. Cannot be combined with `use_reactor`.
+        """
+        for value in vars(self).values():
+            if isinstance(value, IOBase):
+                value.replay = replay
+
+    def instrument(self, enable=True):
+        """
+        Switches the instrumentation (see `IOBase.instrument`) of all
+        connections of the device on or off.
+        """
+        for value in vars(self).values():
+            if isinstance(value, IOBase):
+                value.instrument(enable)
+
+    def io_statistics(self):
+        """
+        Returns a dict with the `IOBase.io_statistics` of every instrumented
+        connection of the device, keyed by the attribute name.
+        """
+        return {name: value.io_statistics()
+                for name, value in vars(self).items()
+                if isinstance(value, IOBase) and value.instrumentation is not None}
+
     def _connect(self):
         """Override this method to implement the connection to the device."""
         raise NotImplementedError
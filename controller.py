@@ -8,6 +8,8 @@ ControlSocket :
     An interface to the Telnet port of the controller.
 DataSocket :
     An interface to the data port of the controller.
+ControllerCommands :
+    The configuration commands and scaling shared by the controller interfaces.
 Controller :
     Main interface for the usage of the controller
 
@@ -29,19 +31,19 @@ Example
   >>>     data = controller.stop_acquisition()
 """
 
+import re
 import time
 import socket
 import struct
-import telnetlib
 import logging
 import queue
+from contextlib import contextmanager
 import numpy as np
 from .sensor import SENSORS
-from .base import IOBase, Device, on_connection
+from .base import IOBase, Device, on_connection, wire_trace
 from .helper import BraceMessage as __
 
 # TODO check all IO for exceptions that can be raised
-# TODO use frame counter
 # TODO use proper custom exceptions
 # TODO refactor errors (less)
 
@@ -51,6 +53,14 @@ class ControllerError(Exception):
     """Simple exception class used for all errors in this module."""
 
 
+class BackpressureError(ControllerError):
+    """Raised when the consumer of a data stream falls behind."""
+
+
+class MissedFramesError(ControllerError):
+    """Raised in strict mode if frames are missing in the data stream."""
+
+
 class UnknownCommandError(ControllerError):
     """Raise when an unknown command is sent to controller."""
 
@@ -59,6 +69,25 @@ class WrongParameterError(ControllerError):
     """Raise when a command with a wrong parameter is sent to the controller."""
 
 
+class PipelineError(ControllerError):
+    """
+    Raised when one or more commands of a pipeline are rejected.
+
+    Attributes
+    ----------
+    errors : list of tuples
+        The pairs (command, exception) of the rejected commands.
+    responses : list
+        The responses of all commands, None for rejected commands.
+    """
+
+    def __init__(self, errors, responses):
+        self.errors = errors
+        self.responses = responses
+        super().__init__("; ".join("Command '{}' failed: {}".format(cmd, error)
+                                   for cmd, error in errors))
+
+
 class ControlSocket(IOBase):
     """
     Interface to the telnet port of the controller.
@@ -83,59 +112,137 @@ class ControlSocket(IOBase):
       >>> print(control_socket.command("VER"))
       >>> control_socket.disconnect()
     """
+    _transport = 'socket'
 
     def __init__(self, host, control_port=23):
         super().__init__((host, control_port))
         self.socket = None
+        self._rx = bytearray()
 
     def _open(self):
-        self.socket = telnetlib.Telnet()
+        self._reset()
         try:
-            self.socket.open(*self.address, self.timeout)
+            self.socket = socket.create_connection(self.address, self.timeout)
         except OSError:
             msg = __("Could not connect to {} on telnet port {}.", *self.address)
             logger.error(msg)
             raise ControllerError(msg)
         else:
             logger.debug(__("Connected to {} on telnet port {}.", *self.address))
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         time.sleep(0.1)
+        self.socket.setblocking(False)
         try:
-            while self.socket.read_eager():
-                pass
-        except EOFError:
-            msg = __("Connection to {}:{} closed unexpectedly.", *self.address)
-            logger.error(msg)
-            raise ControllerError(msg)
+            while True:
+                if not self.socket.recv(4096):
+                    msg = __("Connection to {}:{} closed unexpectedly.",
+                             *self.address)
+                    logger.error(msg)
+                    raise ControllerError(msg)
+        except BlockingIOError:
+            pass
+        finally:
+            self.socket.settimeout(self.timeout)
 
     def _close(self):
         self.socket.close()
         logger.debug(__("Disconnected from {}:{}.", *self.address))
 
+    def _reset(self):
+        self._rx.clear()
+
+    def _interrupt(self):
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _fileno(self):
+        return self.socket.fileno()
+
+    def _pending(self):
+        return b"\n" in self._rx
+
+    def _encode(self, cmd):
+        """Returns the bytes of the command `cmd` or the list of commands `cmd`."""
+        if isinstance(cmd, str):
+            cmd = [cmd]
+        data = ""
+        for single_cmd in cmd:
+            for seq in "\r\n":
+                single_cmd = single_cmd.replace(seq, "")
+            data += "$" + single_cmd + "\r\n"
+        return data.encode('ascii')
+
     def _send(self, cmd):
-        for seq in "\r\n":
-            cmd = cmd.replace(seq, "")
-        cmd = "$" + cmd + "\r\n"
-        logger.debug(__("Sending: {!r}",  cmd))
-        self.socket.write(cmd.encode('ascii'))
+        """Sends the command `cmd` or, if `cmd` is a list, all commands at once."""
+        data = self._encode(cmd)
+        if wire_trace.enabled():
+            wire_trace.sent(self, data)
+        self.socket.sendall(data)
+
+    def _write_ready(self, data):
+        return self.socket.send(data)
 
     def _receive(self):
-        line = self.socket.read_until(b"\n", timeout=self.timeout).decode('ascii')
-        if line:
-            logger.debug(__("Received: {!r}", line))
-            line = line.strip("\r\n")
-            return line
-        else:
-            return None
+        return self._receive_line(wait=True)
+
+    def _receive_ready(self):
+        return self._receive_line(wait=False)
+
+    def _receive_line(self, wait):
+        """
+        Returns the next line received from the controller, or None. If not
+        `wait`, the socket is read at most once, so a partial line returns
+        None instead of blocking until the rest of it arrives.
+        """
+        end = self._rx.find(b"\n")
+        reads = 0
+        while end < 0:
+            if not wait and reads:
+                return None
+            reads += 1
+            try:
+                data = self.socket.recv(4096)
+            except socket.timeout:
+                return None
+            if not data:
+                if self._stop.is_set():
+                    return None
+                msg = __("Connection to {}:{} closed unexpectedly.", *self.address)
+                logger.error(msg)
+                raise ControllerError(msg)
+            if wire_trace.enabled():
+                wire_trace.received(self, data)
+            searched = len(self._rx)
+            self._rx += data
+            end = self._rx.find(b"\n", searched)
+        line = self._rx[:end + 1].decode('ascii')
+        del self._rx[:end + 1]
+        return line.strip("\r\n")
 
     def get_answer(self, timeout=None):
-        line = self._get_item(timeout)
+        return self._parse_answer(self._get_item(timeout))
+
+    @staticmethod
+    def _parse_answer(line):
+        """
+        Parses a response line of the controller and returns it without the
+        trailing "OK".
+
+        Raises
+        ------
+        UnknownCommandError, WrongParameterError, ControllerError :
+            If the controller rejects the command or the response is not
+            understood.
+        """
         #TODO strip error message from line for proper logging entry
         if "$UNKNOWN COMMAND" in line:
             logger.error(line)
-            raise ControllerError(line)
+            raise UnknownCommandError(line)
         if "$WRONG PARAMETER" in line:
             logger.error(line)
-            raise ControllerError(line)
+            raise WrongParameterError(line)
         if line.endswith("OK"):
             return line[:-2]
         else:
@@ -146,6 +253,63 @@ class ControlSocket(IOBase):
     def command(self, cmd):
         return super().command(cmd, get_response=True)[len(cmd) + 1:]
 
+    def _verb(self, cmd):
+        """Returns the command name, e.g. '$STI' for 'STI2'."""
+        if isinstance(cmd, (list, tuple)):
+            cmd = cmd[0] if cmd else ""
+        return "$" + re.match(r"[A-Z]*", cmd.upper()).group()
+
+    def pipeline(self, cmds, timeout=None):
+        """
+        Sends several commands at once and returns their responses.
+
+        All commands are written to the socket in a single call, without
+        waiting for the responses in between. The responses are matched to
+        the commands in order.
+
+        Parameters
+        ----------
+        cmds : list of str
+            The commands to be sent.
+        timeout: float, optional
+            The maximal time in seconds that is waited for each response.
+
+        Returns
+        -------
+        responses : list of str
+            The responses to the commands, as returned by ``command``.
+
+        Raises
+        ------
+        PipelineError :
+            If the controller rejects one or more commands. The responses of
+            all commands are received before it is raised.
+        """
+        cmds = list(cmds)
+        if not cmds or self._stop.is_set():
+            return []
+        instrumentation = self.instrumentation
+        start = time.perf_counter()
+        self._put(cmds)
+        responses = []
+        errors = []
+        for cmd in cmds:
+            try:
+                responses.append(self.get_answer(timeout)[len(cmd) + 1:])
+            except ControllerError as error:
+                responses.append(None)
+                errors.append((cmd, error))
+            except TimeoutError:
+                if instrumentation is not None:
+                    instrumentation.timeout(self._verb(cmd))
+                raise
+            if instrumentation is not None:
+                instrumentation.record(self._verb(cmd),
+                                       time.perf_counter() - start)
+        if errors:
+            raise PipelineError(errors, responses)
+        return responses
+
 
 class DataSocket(IOBase):
     """
@@ -157,6 +321,14 @@ class DataSocket(IOBase):
         The hosts IP address.
     data_port : int, optional
         The data port of the controller.
+    max_backlog : int, optional
+        The maximal number of received chunks that are queued for
+        ``get_data``. If the backlog is full, the socket is not read until the
+        consumer catches up (which is counted in attribute ``overruns``).
+        Defaults to None (unbounded).
+    strict : bool, optional
+        If True, raise a ``MissedFramesError`` if the frame counter reveals
+        missing frames. Otherwise, missing frames are only logged and counted.
 
     Example
     -------
@@ -182,6 +354,10 @@ class DataSocket(IOBase):
     When ``data_port`` is different from the standard port 10001, it can be
     retrieved via the control command "GDP"
 
+    The continuity of the frame counter is tracked across all data packages.
+    The attribute ``statistics`` holds the number of received frames, missing
+    frames, packages and bytes since the last call of ``reset_statistics``.
+
     Data Representation
     -------------------
     The controller sends data packages with the following structure:
@@ -204,12 +380,30 @@ class DataSocket(IOBase):
     ...               ...         ...
     ================ ============ =============================================
     """
+    _transport = '_socket'
+    header = struct.Struct('<iiiqihhi')
+    dtype = np.dtype(np.int32).newbyteorder('<')
 
-    def __init__(self, host, data_port=10001, timeout=2):
+    def __init__(self, host, data_port=10001, timeout=2, max_backlog=None,
+                 strict=False):
         super().__init__((host, data_port), timeout, do_input=True, do_output=False)
+        self.max_backlog = max_backlog
+        self.strict = strict
+        self.overruns = 0
+        self._backlog_full = False
+        self.statistics = {}
+        self.reset_statistics()
+        self._next_counter = None
         self._socket = None
+        self._buffer = ReceiveBuffer()
+        self._package_size = 0
+        self._frames_left = 0
+        self._frame_shape = (0, 0)
+        self._nr_of_channels = 0
+        self._skip_package = False
 
     def _open(self):
+        self._reset()
         self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._socket.settimeout(self.timeout)
         try:
@@ -225,15 +419,80 @@ class DataSocket(IOBase):
         self._socket.close()
         logger.debug(__("Disconnected from {}:{}.", *self.address))
 
+    def _reset(self):
+        """Resets the decoder to the beginning of a new data stream."""
+        self._buffer.clear()
+        self._package_size = 0
+        self._frames_left = 0
+        self._skip_package = False
+        self._next_counter = None
+
+    def _fileno(self):
+        return self._socket.fileno()
+
+    def _wants_input(self):
+        return self.max_backlog is None or self._wait_for_backlog(0)
+
     def _receive(self):
+        return self._receive_chunk(self.timeout)
+
+    def _receive_ready(self):
+        return self._receive_chunk(0)
+
+    def _receive_chunk(self, backlog_timeout):
+        """
+        Returns the next chunk received from the data port, or None. Waits up
+        to `backlog_timeout` seconds for space in a full backlog.
+        """
+        if (self.max_backlog is not None
+                and not self._wait_for_backlog(backlog_timeout)):
+            return None
         try:
             data = self._socket.recv(65536)
-            logger.debug(__("Received: {!r}", data))
-            return data
         except socket.timeout:
             return None
+        if not data:
+            if self._stop.is_set():
+                return None
+            msg = __("Connection to {}:{} closed unexpectedly.", *self.address)
+            logger.error(msg)
+            raise ControllerError(msg)
+        if wire_trace.enabled():
+            wire_trace.received(self, data)
+        return data
 
-    def get_data(self, data_points, sensors):
+    def _interrupt(self):
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        with self.in_queue.not_full:
+            self.in_queue.not_full.notify_all()
+
+    def _wait_for_backlog(self, timeout):
+        """
+        Waits up to `timeout` seconds until the backlog of ``in_queue`` is
+        below `max_backlog`. Returns False if the backlog is still full.
+        """
+        def has_space():
+            # not_full holds the mutex of in_queue, hence no qsize() here
+            return (len(self.in_queue.queue) < self.max_backlog
+                    or self._stop.is_set())
+
+        if not has_space():
+            if not self._backlog_full:
+                self._backlog_full = True
+                self.overruns += 1
+                logger.debug(__("Data backlog full ({} chunks).", self.max_backlog))
+            if not timeout:
+                return False
+            with self.in_queue.not_full:
+                if not self.in_queue.not_full.wait_for(has_space, timeout):
+                    return False
+        self._backlog_full = False
+        return True
+
+    def get_data(self, data_points, sensors, reducer=None, timeout=None):
         """
         Get measurement data from the controller.
 
@@ -243,20 +502,111 @@ class DataSocket(IOBase):
             The number of data points to be received.
         channels : list of ints
             A list of the channels to get the data from.
+        reducer : Reducer, optional
+            If given, the data is not stored, but fed block by block into the
+            reducer (see module ``reducer``), which is reset beforehand.
+        timeout : float, optional
+            The maximal time in seconds that is waited for the next chunk of
+            data. Defaults to None, which waits indefinitely.
 
         Returns
         -------
-        An n x m array where n = number of channels and m = number of data points.
+        An n x m array where n = number of channels and m = number of data
+        points, or `reducer` if a reducer is given.
 
         Raises
         ------
         DeviceError :
             If the number of requested channels is larger than the actual
             channel number.
+        TimeoutError :
+            If no data is received within `timeout` seconds. The frames of
+            the incomplete request are lost.
+        """
+        channels = self._channels(sensors)
+        logger.debug(__("Getting {} data points from channels {} ...",
+                        data_points, channels))
+        if reducer is not None:
+            reducer.reset()
+        else:
+            data = np.zeros((data_points, len(channels)), self.dtype)
+        received_points = 0
+        while received_points < data_points:
+            frames = self._next_frames(data_points - received_points, channels,
+                                       timeout)
+            n = len(frames)
+            if reducer is not None:
+                reducer.update(frames[:, channels])
+            else:
+                np.take(frames, channels, axis=1,
+                        out=data[received_points:received_points + n])
+            del frames
+            received_points += n
+        if reducer is not None:
+            return reducer
+        return data.T
+
+    @property
+    def frames_left(self):
+        """
+        The number of frames of the current data package that have been
+        received, but not yet returned by ``get_data``.
+        """
+        return self._frames_left
+
+    def flush(self):
+        """
+        Discards the data that the input thread has received so far. A data
+        package that is only partially received yet is discarded as a whole
+        as soon as it is complete.
+
+        Data that is still in the receive buffer of the operating system is
+        not discarded, so the next call of ``get_data`` may return some
+        frames measured before the call of this method: usually only those
+        of the last few milliseconds, but up to the size of the socket
+        buffer if the backlog (``max_backlog``) is full and the input thread
+        is paused.
+        """
+        discarded = 0
+        while True:
+            try:
+                self._buffer.write(self.in_queue.get_nowait())
+            except queue.Empty:
+                break
+        self._buffer.consume(self._package_size)
+        self._package_size = 0
+        self._frames_left = 0
+        self._skip_package = False
+        while len(self._buffer) >= 32:
+            _, nr_of_frames, bytes_per_frame, frame_counter = \
+                self._parse_header(self._buffer.peek(32))
+            size = 32 + bytes_per_frame * nr_of_frames
+            if len(self._buffer) < size:
+                break
+            self._track(frame_counter, nr_of_frames, size)
+            self._buffer.consume(size)
+            discarded += nr_of_frames
+        if len(self._buffer):
+            self._skip_package = True
+        logger.debug(__("Flushed data socket: discarded {} frames.", discarded))
+
+    def _channels(self, sensors):
+        """
+        Returns the list of demodulator channels of `sensors`.
+
+        Raises
+        ------
+        ControllerError :
+            If two sensors are connected to the same demodulator, or a
+            channel is negative.
         """
         channels = []
         for sensor in sensors:
             channel = sensor['channel']
+            if channel < 0:
+                msg = __("Invalid channel {} of sensor {}.", channel, sensor)
+                logger.error(msg)
+                raise ControllerError(msg)
             if channel not in channels:
                 channels.append(channel)
             else:
@@ -264,40 +614,94 @@ class DataSocket(IOBase):
                       " connected to the same demodulator."
                 logger.error(msg)
                 raise ControllerError(msg)
-        logger.debug(__("Getting {} data points from channels {} ...",
-                        data_points, channels))
-        data_stream = b''
-        dtype = np.dtype(np.int32).newbyteorder('<')
-        data = np.zeros((data_points, len(channels)), dtype)
-        received_points = 0
-        while received_points < data_points:
-            while len(data_stream) < 32:
-                data_stream += self.in_queue.get()
+        return channels
+
+    def _fill(self, size, timeout=None):
+        """
+        Blocks until at least `size` bytes are buffered, or raises a
+        TimeoutError if no data is received within `timeout` seconds.
+        """
+        while len(self._buffer) < size:
+            if timeout is None:
+                self._buffer.write(self.in_queue.get())
+            else:
+                self._buffer.write(self._get_item(timeout))
+
+    def _next_frames(self, max_frames, channels, timeout=None):
+        """
+        Returns the next block of at most `max_frames` unread frames of the
+        current data package as an array of shape (frames, channels in frame).
+        The array is a view into the receive buffer and has to be released
+        before the next call.
+
+        Raises
+        ------
+        ControllerError :
+            If `channels` contains a channel that is not in the frames.
+        """
+        while not self._frames_left:
+            self._buffer.consume(self._package_size)
+            self._package_size = 0
+            self._fill(32, timeout)
             nr_of_channels, nr_of_frames, bytes_per_frame, frame_counter = \
-                self._parse_header(data_stream)
-            # TODO frame counter check
-            # if received_points != frame_counter - 1:
-            #     print(received_points)
-            #     print(frame_counter)
-            #     raise DeviceError("Missed frames!")
-            payload_size = bytes_per_frame * nr_of_frames
-            if max(channels) + 1 > nr_of_channels:
-                msg = __("Device has only {} channels.", nr_of_channels)
-                logger.error(msg)
-                raise ControllerError(msg)
-            while len(data_stream) < 32 + payload_size:
-                data_stream += self.in_queue.get()
-            payload = data_stream[32:32 + payload_size]
-            for i in range(nr_of_frames):
-                if received_points < data_points:
-                    frame = payload[i * bytes_per_frame:
-                                    (i + 1) * bytes_per_frame]
-                    data[received_points] = np.frombuffer(frame, dtype)[channels]
-                    received_points += 1
-                else:
-                    break
-            data_stream = data_stream[32 + payload_size:]
-        return data.T
+                self._parse_header(self._buffer.peek(32))
+            package_size = 32 + bytes_per_frame * nr_of_frames
+            self._fill(package_size, timeout)
+            self._package_size = package_size
+            self._frame_shape = (nr_of_frames, bytes_per_frame // 4)
+            self._nr_of_channels = min(nr_of_channels, bytes_per_frame // 4)
+            self._track(frame_counter, nr_of_frames, self._package_size)
+            if self._skip_package:
+                self._skip_package = False
+            else:
+                self._frames_left = nr_of_frames
+        if max(channels) + 1 > self._nr_of_channels:
+            msg = __("Device has only {} channels.", self._nr_of_channels)
+            logger.error(msg)
+            raise ControllerError(msg)
+        nr_of_frames, width = self._frame_shape
+        first = nr_of_frames - self._frames_left
+        n = min(self._frames_left, max_frames)
+        frames = self._buffer.array(
+            self.dtype, offset=32 + first * width * 4, count=n * width)
+        self._frames_left -= n
+        return frames.reshape(n, width)
+
+    def reset_statistics(self):
+        """Resets the counters in attribute ``statistics``."""
+        self.statistics.update(frames=0, missing=0, packages=0, bytes=0)
+
+    def _track(self, frame_counter, nr_of_frames, package_size):
+        """
+        Updates the statistics with a received data package and checks the
+        continuity of the frame counter.
+
+        Raises
+        ------
+        MissedFramesError :
+            In strict mode, if frames are missing.
+        """
+        self.statistics['frames'] += nr_of_frames
+        self.statistics['packages'] += 1
+        self.statistics['bytes'] += package_size
+        expected = self._next_counter
+        self._next_counter = (frame_counter + nr_of_frames) & 0xffffffff
+        if expected is None:
+            return
+        missing = (frame_counter - expected) & 0xffffffff
+        if not missing:
+            return
+        if missing >= 0x80000000:
+            logger.warning(__("Frame counter jumped back from {} to {}.",
+                              expected, frame_counter))
+            return
+        self.statistics['missing'] += missing
+        msg = __("Missed {} frames (frame counter {}, expected {}).",
+                 missing, frame_counter, expected)
+        if self.strict:
+            logger.error(msg)
+            raise MissedFramesError(msg)
+        logger.warning(msg)
 
     def _parse_header(self, data_stream):
         """
@@ -305,7 +709,7 @@ class DataSocket(IOBase):
 
         Parameters
         ----------
-        data_stream : bytes
+        data_stream : bytes-like
             The data stream as returned by socket.recv(buffsize).
 
         Returns
@@ -313,16 +717,167 @@ class DataSocket(IOBase):
         nr_of_channels, nr_of_frames, bytes_per_frame, payload_size : int
             The values extracted from the header.
         """
-        header = struct.unpack('<iiiqihhi', data_stream[0:32])
+        header = self.header.unpack_from(data_stream)
         channel_field = header[3]
-        nr_of_channels = '{0:064b}'.format(channel_field).count('1')
+        nr_of_channels = bin(channel_field & 0xffffffffffffffff).count('1')
         nr_of_frames = header[6]
         bytes_per_frame = header[5]
         frame_counter = header[7]
         return nr_of_channels, nr_of_frames, bytes_per_frame, frame_counter
 
 
-class Controller(Device):
+class ReceiveBuffer():
+    """
+    A preallocated byte buffer for the data stream of the controller.
+
+    Incoming data is copied to the end of the buffer and read from the front
+    without any intermediate copies: Views on the buffered data are handed
+    out as memoryviews or numpy arrays. When the free space at the end of the
+    buffer is exhausted, the unread data is moved to the front. The buffer
+    grows if a single data package does not fit.
+
+    Parameters
+    ----------
+    size : int, optional
+        The initial size of the buffer in bytes.
+    """
+
+    def __init__(self, size=1 << 20):
+        self._data = bytearray(size)
+        self._view = memoryview(self._data)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def clear(self):
+        """Discards all buffered data."""
+        self._start = 0
+        self._end = 0
+
+    def write(self, data):
+        """Appends `data` to the end of the buffer."""
+        size = len(data)
+        if self._end + size > len(self._data):
+            unread = len(self)
+            if unread + size > len(self._data):
+                new_size = max(2 * len(self._data), unread + size)
+                logger.debug(__("Growing receive buffer to {} bytes.", new_size))
+                data_new = bytearray(new_size)
+                data_new[:unread] = self._view[self._start:self._end]
+                self._data = data_new
+                self._view = memoryview(self._data)
+            else:
+                self._view[:unread] = self._view[self._start:self._end]
+            self._start = 0
+            self._end = unread
+        self._view[self._end:self._end + size] = data
+        self._end += size
+
+    def peek(self, size):
+        """Returns a memoryview of the first `size` unread bytes."""
+        return self._view[self._start:self._start + size]
+
+    def array(self, dtype, offset, count):
+        """
+        Returns a numpy view of `count` items of type `dtype`, starting
+        `offset` bytes after the first unread byte.
+        """
+        return np.frombuffer(self._data, dtype, count, self._start + offset)
+
+    def consume(self, size):
+        """Marks the first `size` unread bytes as read."""
+        self._start += size
+        if self._start >= self._end:
+            self.clear()
+
+
+class ControllerCommands():
+    """
+    The configuration commands and the scaling of the data, shared by
+    `Controller` and `aio.AsyncController`. Requires the attributes
+    `sensors` (the sensor definitions of module ``sensor``) and `state` (the
+    cached configuration, see `Controller`).
+    """
+
+    def _sampling_time_command(self, sampling_time):
+        """Returns the command that sets `sampling_time` (in ms)."""
+        return "STI{}".format(int(sampling_time * 1000))
+
+    def _actual_sampling_time(self, cmd, response):
+        """
+        Extracts the actual sampling time from the `response` to the sampling
+        time command `cmd`.
+        """
+        sampling_time = int(cmd[3:])
+        actual_time = int(response.strip(","))
+        if actual_time != sampling_time:
+            logger.warning(__("Requested sampling time: {} ms; Set sampling time: {} ms", actual_time / 1000, sampling_time / 1000))
+        self.state['sampling_time'] = (cmd, actual_time)
+        return actual_time
+
+    def _trigger_mode_command(self, mode):
+        """Returns the command that sets the trigger `mode`."""
+        trg_nr = {"continuous": 0, "rising_edge": 1,
+                  "high_level": 2, "gate_rising_edge": 3}
+        return "TRG{}".format(trg_nr[mode])
+
+    def _configuration_commands(self, sampling_time, mode):
+        """
+        Returns the commands that change the cached configuration to
+        `sampling_time` and `mode`, and the actual sampling time if it is
+        cached.
+        """
+        cmds = []
+        actual_time = None
+        if sampling_time:
+            sti_cmd = self._sampling_time_command(sampling_time)
+            cached = self.state.get('sampling_time')
+            if cached and cached[0] == sti_cmd:
+                actual_time = cached[1]
+            else:
+                self.state.pop('sampling_time', None)
+                cmds.append(sti_cmd)
+        if mode and self.state.get('trigger_mode') != mode:
+            self.state.pop('trigger_mode', None)
+            cmds.append(self._trigger_mode_command(mode))
+        return cmds, actual_time
+
+    def _configured(self, cmds, responses, mode, actual_time=None):
+        """
+        Updates the cached configuration with the `responses` to the
+        configuration commands `cmds` and returns the actual sampling time.
+        """
+        for cmd, response in zip(cmds, responses):
+            if cmd.startswith("STI"):
+                actual_time = self._actual_sampling_time(cmd, response)
+            else:
+                self.state['trigger_mode'] = mode
+        return actual_time
+
+    def scale_factors(self):
+        """
+        Returns the factors per sensor that scale raw values to the measuring
+        range of the sensor.
+        """
+        return np.array([sensor['range'] / 0xffffff for sensor in self.sensors])
+
+    def scale(self, data):
+        """Scales the acquired data to the measuring range of the sensor."""
+        scaled_data = np.zeros_like(data, dtype=np.float64)
+        for i, (sensor, channel_data) in enumerate(zip(self.sensors, data)):
+           scaled_data[i] = channel_data / 0xffffff * sensor['range']
+        return scaled_data
+
+    def _result(self, data, reducer, scale=True):
+        """Returns the scaled data or result of the reducer."""
+        if reducer is None:
+            return self.scale(data) if scale else data
+        return reducer.result(self.scale_factors() if scale else 1)
+
+
+class Controller(ControllerCommands, Device):
     """
     Main interface for the usage of the controller.
 
@@ -337,6 +892,20 @@ class Controller(Device):
         The telnet port of the controller.
     data_port : int, optional
         The data port of the controller.
+    strict : bool, optional
+        If True, raise a ``MissedFramesError`` if frames are missing in the
+        data stream.
+
+    Attributes
+    ----------
+    statistics : dict
+        The number of received frames, missing frames, packages and bytes of
+        the last acquisition.
+    state : dict
+        The cached configuration of the controller, with the (optional) keys
+        'sampling_time', 'trigger_mode' and 'data_port'. Configuration
+        commands are only sent if they change the cached state. The cache is
+        cleared on every connect and by ``invalidate``.
 
     Example
     -------
@@ -346,18 +915,52 @@ class Controller(Device):
       >>>         data_points=100, mode="continuous", sampling_time=50)
     """
 
-    def __init__(self, sensors, host, control_port=23, data_port=10001):
+    def __init__(self, sensors, host, control_port=23, data_port=10001,
+                 strict=False):
         self.sensors = [SENSORS[sensor] for sensor in sensors]
         self.control_socket = ControlSocket(host, control_port)
-        self.data_socket = DataSocket(host, data_port)
+        self.data_socket = DataSocket(host, data_port, strict=strict)
         self.status_response = None
+        self.statistics = {}
+        self.state = {}
+        self._data_connected = False
 
     def _connect(self):
         self.control_socket.connect()
+        self.refresh()
 
     def _disconnect(self):
         self.control_socket.disconnect()
 
+    def invalidate(self):
+        """
+        Clears the cached configuration of the controller, e.g. after it has
+        been changed by another client. The next configuration commands are
+        sent in any case.
+        """
+        self.state.clear()
+        logger.debug("Invalidated controller state.")
+
+    @on_connection
+    def refresh(self):
+        """
+        Invalidates the cached configuration and queries the data port of the
+        controller ("GDP"). The sampling time and the trigger mode cannot be
+        read back and are hence sent again on their next use. If the
+        controller does not answer "GDP", the cache is left empty and the
+        configured data port is kept.
+        """
+        self.invalidate()
+        try:
+            data_port = int(self.control_socket.command("GDP").strip(","))
+        except (ControllerError, ValueError, TimeoutError) as error:
+            logger.warning(__("Could not query data port: {}", error))
+            return
+        self.state['data_port'] = data_port
+        if data_port != self.data_socket.address[1]:
+            logger.info(__("Using data port {}.", data_port))
+            self.data_socket.address = (self.data_socket.address[0], data_port)
+
     @on_connection
     def set_sampling_time(self, sampling_time):
         """
@@ -374,12 +977,13 @@ class Controller(Device):
         actual_time : float
             The actual sampling time.
         """
-        sampling_time = int(sampling_time * 1000)
-        response = self.control_socket.command("STI{}".format(sampling_time))
-        actual_time = int(response.strip(","))
-        if actual_time != sampling_time:
-            logger.warning(__("Requested sampling time: {} ms; Set sampling time: {} ms", actual_time / 1000, sampling_time / 1000))
-        return actual_time
+        cmd = self._sampling_time_command(sampling_time)
+        cached = self.state.get('sampling_time')
+        if cached and cached[0] == cmd:
+            return cached[1]
+        self.state.pop('sampling_time', None)
+        response = self.control_socket.command(cmd)
+        return self._actual_sampling_time(cmd, response)
 
     @on_connection
     def set_trigger_mode(self, mode):
@@ -391,27 +995,141 @@ class Controller(Device):
         mode : str {'continuous', 'rising_edge', 'high_level', 'gate_rising_edge'}
             See manual for an explanation of the modes.
         """
-        trg_nr = {"continuous": 0, "rising_edge": 1,
-                  "high_level": 2, "gate_rising_edge": 3}
-        self.control_socket.command("TRG{}".format(trg_nr[mode]))
+        cmd = self._trigger_mode_command(mode)
+        if self.state.get('trigger_mode') == mode:
+            return
+        self.state.pop('trigger_mode', None)
+        self.control_socket.command(cmd)
+        self.state['trigger_mode'] = mode
+
+    @on_connection
+    def configure(self, sampling_time=None, mode=None):
+        """
+        Sets the sampling time and / or the trigger mode. The commands are
+        pipelined, i.e. sent at once, so the configuration costs a single
+        round trip to the controller. Settings that do not change the cached
+        state are not sent at all.
+
+        Parameters
+        ----------
+        sampling_time : float, optional
+            The desired sampling time in ms.
+        mode : str {'continuous', 'rising_edge', 'high_level', 'gate_rising_edge'}
+            The trigger mode.
+
+        Returns
+        -------
+        actual_time : float
+            The actual sampling time, if `sampling_time` is given.
+
+        Raises
+        ------
+        PipelineError :
+            If the controller rejects one of the commands.
+        """
+        cmds, actual_time = self._configuration_commands(sampling_time, mode)
+        responses = self.control_socket.pipeline(cmds)
+        return self._configured(cmds, responses, mode, actual_time)
 
     @on_connection
     def trigger(self):
         """ Trigger a single measurement."""
         self.control_socket.command("GMD")
 
-    def scale(self, data):
-        """Scales the acquired data to the measuring range of the sensor."""
-        scaled_data = np.zeros_like(data, dtype=np.float64)
-        for i, (sensor, channel_data) in enumerate(zip(self.sensors, data)):
-           scaled_data[i] = channel_data / 0xffffff * sensor['range']
-        return scaled_data
+    @contextmanager
+    def data_connection(self):
+        """
+        A context manager that keeps the data socket connected. Within the
+        context, ``acquire`` reuses the open connection instead of connecting
+        to the data port on every call.
 
-    def acquire(self, data_points=1, mode=None, sampling_time=None):
+        Example
+        -------
+          >>> with controller.data_connection():
+          >>>     for position in positions:
+          >>>         ...
+          >>>         data = controller.acquire(data_points=100)
+        """
+        self.data_socket.connect()
+        self._data_connected = True
+        try:
+            yield
+        finally:
+            self._data_connected = False
+            self.data_socket.disconnect()
+
+    def stream(self, chunk_frames=1000, max_backlog=64, on_backpressure='warn'):
+        """
+        A generator that continuously yields the scaled data of all channels
+        in blocks of `chunk_frames` frames, until it is closed.
+
+        The amount of received, but not yet consumed data is bounded by
+        `max_backlog` chunks of the data socket. If the consumer falls behind,
+        the data socket stops reading, the socket buffer of the operating
+        system fills up and the controller eventually drops frames. This
+        backpressure is reported according to `on_backpressure`.
+
+        Parameters
+        ----------
+        chunk_frames : int, optional
+            The number of frames per yielded block.
+        max_backlog : int, optional
+            The maximal number of received chunks (of up to 64 KiB each) that
+            are queued.
+        on_backpressure : str {'warn', 'raise'}, optional
+            Log a warning or raise a ``BackpressureError`` if the consumer
+            falls behind.
+
+        Yields
+        ------
+        data : array
+            An n x `chunk_frames` array where n = number of sensors.
+
+        Example
+        -------
+          >>> with controller:
+          >>>     for data in controller.stream(chunk_frames=4000):
+          >>>         drift.append(data.mean(1))
+        """
+        if on_backpressure not in ('warn', 'raise'):
+            raise ValueError("Invalid backpressure mode: {}".format(on_backpressure))
+        previous_max_backlog = self.data_socket.max_backlog
+        self.data_socket.max_backlog = max_backlog
+        connect = not self._data_connected
+        if connect:
+            self.data_socket.connect()
+        self.data_socket.reset_statistics()
+        self.statistics = self.data_socket.statistics
+        try:
+            overruns = self.data_socket.overruns
+            while True:
+                data = self.data_socket.get_data(chunk_frames, self.sensors)
+                if self.data_socket.overruns != overruns:
+                    msg = __("Stream consumer falls behind: Data backlog was "
+                             "full {} time(s).",
+                             self.data_socket.overruns - overruns)
+                    overruns = self.data_socket.overruns
+                    if on_backpressure == 'raise':
+                        logger.error(msg)
+                        raise BackpressureError(msg)
+                    logger.warning(msg)
+                yield self.scale(data)
+        finally:
+            if connect:
+                self.data_socket.disconnect()
+            self.data_socket.max_backlog = previous_max_backlog
+
+    def acquire(self, data_points=1, mode=None, sampling_time=None, fresh=True,
+                reducer=None, timeout=None, scale=True):
         """
         Starts the actual data acquisition by connecting to the data socket. All
         channels are measured simultaneously.
 
+        Within a ``data_connection`` context, the open data connection is used
+        and the data that has been received since the last acquisition is
+        discarded (unless `fresh` is False, see ``DataSocket.flush``), so
+        that mainly the frames measured after the call are returned.
+
         Parameters
         ----------
         data_points : int, optional
@@ -423,14 +1141,39 @@ class Controller(Device):
         sampling_time : float
             The desired sampling time in ms. The controller automatically
             chooses the closest possible sampling time.
+        fresh : bool, optional
+            Only used within a ``data_connection`` context. If True, discard
+            the frames that have been received before this call.
+        reducer : Reducer, optional
+            A reducer from module ``reducer`` that is applied block by block
+            while the data is received. The scaled result of the reducer is
+            returned instead of the data.
+        timeout : float, optional
+            The maximal time in seconds that is waited for the next chunk of
+            data, see ``DataSocket.get_data``. Defaults to None, which waits
+            indefinitely.
+        scale : bool, optional
+            If False, the raw data (or result of the reducer, with the scale
+            factors 1) is returned, which can be scaled later with ``scale``.
         """
-        if mode:
-            self.set_trigger_mode(mode)
-        if sampling_time:
-            self.set_sampling_time(sampling_time)
+        if mode or sampling_time:
+            self.configure(sampling_time, mode)
+        if self._data_connected:
+            if fresh:
+                self.data_socket.flush()
+            self.data_socket.reset_statistics()
+            try:
+                data = self.data_socket.get_data(
+                    data_points, self.sensors, reducer, timeout)
+            finally:
+                self.statistics = dict(self.data_socket.statistics)
+            return self._result(data, reducer, scale)
         try:
             self.data_socket.connect()
-            data = self.data_socket.get_data(data_points, self.sensors)
-            return self.scale(data)
+            self.data_socket.reset_statistics()
+            data = self.data_socket.get_data(data_points, self.sensors,
+                                             reducer, timeout)
+            return self._result(data, reducer, scale)
         finally:
+            self.statistics = dict(self.data_socket.statistics)
             self.data_socket.disconnect()
@@ -32,7 +32,7 @@ Example
 
 import socket
 import logging
-from .base import IOBase, Device, on_connection
+from .base import IOBase, Device, on_connection, wire_trace
 from .helper import BraceMessage as __
 
 
@@ -56,6 +56,8 @@ class SCPISocket(IOBase):
     timeout : int, optional
         The time in seconds after which the socket stops trying to connect.
     """
+    _transport = 'socket'
+
     def __init__(self, host, scpi_port=5025):
         super().__init__((host, scpi_port))
         self.socket = None
@@ -77,26 +79,48 @@ class SCPISocket(IOBase):
         self.socket.close()
         logger.debug(__("Disconnected from {}:{}.", *self.address))
 
+    def _fileno(self):
+        return self.socket.fileno()
+
+    def _encode(self, cmd):
+        return (cmd + "\n").encode('ascii')
+
     def _send(self, cmd):
-        cmd += "\n"
-        logger.debug(__("Sending: {!r}", cmd))
-        cmd = cmd.encode('ascii')
+        cmd = self._encode(cmd)
+        if wire_trace.enabled():
+            wire_trace.sent(self, cmd)
         sent_bytes = 0
         while sent_bytes < len(cmd):
-            sent = self.socket.send(cmd[sent_bytes:])
-            if sent == 0:
-                msg = __("{}:{}: SCPI socket broken.", *self.address)
-                logger.error(msg)
-                raise DataLoggerError(msg)
-            sent_bytes += sent
+            sent_bytes += self._write_ready(cmd[sent_bytes:])
+
+    def _write_ready(self, data):
+        sent = self.socket.send(data)
+        if sent == 0:
+            msg = __("{}:{}: SCPI socket broken.", *self.address)
+            logger.error(msg)
+            raise DataLoggerError(msg)
+        return sent
 
     def _receive(self):
         try:
-            data = self.socket.recv(65536).decode('ascii')
-            logger.debug(__("Received: {!r}", data))
-            return data
+            data = self.socket.recv(65536)
         except socket.timeout:
             return None
+        if not data:
+            if self._stop.is_set():
+                return None
+            msg = __("{}:{}: SCPI socket closed unexpectedly.", *self.address)
+            logger.error(msg)
+            raise DataLoggerError(msg)
+        if wire_trace.enabled():
+            wire_trace.received(self, data)
+        return data.decode('ascii')
+
+    def _interrupt(self):
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
 
 
 class DataLogger(Device):
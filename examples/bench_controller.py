@@ -0,0 +1,39 @@
+"""
+Benchmarks the throughput and latency of the controller interface against the
+local controller simulator.
+"""
+from timeit import default_timer as timer
+from kapascan.controller import Controller
+from kapascan.simulator import ControllerSimulator
+
+sensors = ['2011', '2012']
+sampling_time = 0.016
+data_points = 200000
+repeat = 50
+
+with ControllerSimulator(channels=4, sampling_time=sampling_time) as sim:
+    c = Controller(sensors, sim.host, sim.control_port, sim.data_port)
+    with c:
+        c.set_trigger_mode('continuous')
+        c.set_sampling_time(sampling_time)
+
+        start = timer()
+        c.acquire(data_points)
+        duration = timer() - start
+        print("Throughput: {} frames in {:.3f} s: {:.0f} frames/s "
+              "(nominal {:.0f} frames/s), {} frames missing".format(
+                  data_points, duration, data_points / duration,
+                  1000 / sampling_time, c.statistics['missing']))
+
+        start = timer()
+        for _ in range(repeat):
+            c.acquire(10)
+        print("Latency acquire(10), new connection: {:.2f} ms".format(
+            (timer() - start) / repeat * 1000))
+
+        with c.data_connection():
+            start = timer()
+            for _ in range(repeat):
+                c.acquire(10)
+            print("Latency acquire(10), open connection: {:.2f} ms".format(
+                (timer() - start) / repeat * 1000))
@@ -0,0 +1,64 @@
+"""
+Benchmarks the frame decoder of the data socket.
+
+The data packages are either synthesized or read from a file with a raw
+recording of the data port (pass the file name as first argument).
+"""
+import sys
+import struct
+from timeit import default_timer as timer
+import numpy as np
+from kapascan.controller import DataSocket
+from kapascan.sensor import SENSORS
+from kapascan.simulator import make_package
+
+sensors = [SENSORS['2011'], SENSORS['2012']]
+channels = 4
+frames_per_package = 64
+packages = 2000
+chunk_size = 65536
+repeat = 5
+
+
+def synthesize():
+    """Returns a data stream of `packages` packages of random frames."""
+    stream = bytearray()
+    for i in range(packages):
+        frames = np.random.randint(0, 0xffffff, (frames_per_package, channels))
+        stream += make_package(i * frames_per_package, frames, item=i)
+    return bytes(stream)
+
+
+def frames_in(stream):
+    """Counts the frames of all complete packages in `stream`."""
+    frames = 0
+    offset = 0
+    while offset + 32 <= len(stream):
+        bytes_per_frame, nr_of_frames = struct.unpack_from('<hh', stream, offset + 24)
+        size = 32 + bytes_per_frame * nr_of_frames
+        if offset + size > len(stream):
+            break
+        frames += nr_of_frames
+        offset += size
+    return frames
+
+
+if len(sys.argv) > 1:
+    with open(sys.argv[1], 'rb') as file:
+        stream = file.read()
+else:
+    stream = synthesize()
+data_points = frames_in(stream)
+chunks = [stream[i:i + chunk_size] for i in range(0, len(stream), chunk_size)]
+
+best = float('inf')
+for _ in range(repeat):
+    data_socket = DataSocket('localhost')
+    for chunk in chunks:
+        data_socket.in_queue.put(chunk)
+    start = timer()
+    data = data_socket.get_data(data_points, sensors)
+    best = min(best, timer() - start)
+
+print("{} frames ({:.1f} MB) in {:.4f} s: {:.0f} frames/s".format(
+    data_points, len(stream) / 1e6, best, data_points / best))
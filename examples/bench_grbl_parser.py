@@ -0,0 +1,78 @@
+"""
+Benchmarks the parser of the grbl responses against the previous parser,
+which matched the regular expressions of all message types in turn.
+
+The lines are either synthesized or taken from the received data of the
+SerialConnection sessions in a recording (pass the file name of a log
+written by `kapascan.recording.Recorder` as first argument).
+"""
+import re
+import sys
+from timeit import default_timer as timer
+from kapascan.table import SerialConnection
+from kapascan.recording import read_log, OPEN, RX
+
+repeat = 5
+
+regex = {'ok': r"ok",
+         'error': r"error:(\d+)",
+         'welcome_message': r"Grbl (\d+\.\d+[a-z]) \['\$' for help]",
+         'alarm': r"ALARM:(\d)",
+         'setting': r"\$(\d+)=(.+)",
+         'startup_lines': r"\$N(0|1)=(.*)",
+         'message': r"\[([A-Z0-9]{2,3}:.+)\]",
+         'startup_execution': r">(.*):(ok|error:\d+)",
+         'status': r"<([A-Za-z0-9:]{3,5})\|(MPos|WPos):([0-9.,-]+)(|\|.*)>",
+         'empty': r"^$",
+         }
+regex = {key: re.compile(pattern) for key, pattern in regex.items()}
+
+
+def regex_parse(line):
+    """The previous parser, including the conversion of a status report."""
+    for key, pattern in regex.items():
+        match = pattern.match(line)
+        if match:
+            groups = match.groups()
+            if key == 'status':
+                groups = (groups[0], tuple(float(p) for p in groups[2].split(",")))
+            return key, groups
+    raise ConnectionError(line)
+
+
+def synthesize():
+    """Returns the transcript of a session with a few hundred moves."""
+    lines = ["Grbl 1.1f ['$' for help]", "[MSG:'$H'|'$X' to unlock]"]
+    lines += ["${}={:.3f}".format(n, 1.5 * n) for n in range(34)] + ["ok"]
+    for i in range(500):
+        lines += ["ok"]
+        lines += ["<Run|MPos:{:.3f},{:.3f},0.000|Bf:14,127|FS:350,0>".format(
+            i * 0.1 + j * 0.01, i * 0.05) for j in range(5)]
+        lines += ["<Idle|MPos:{:.3f},{:.3f},0.000|Bf:15,128|FS:0,0|WCO:0.000,0.000,0.000>"
+                  .format(i * 0.1 + 0.05, i * 0.05)]
+    return lines
+
+
+def transcript(path):
+    """Returns the lines received by the serial connections in `path`."""
+    sessions = set()
+    data = bytearray()
+    for _, session, kind, payload in read_log(path):
+        if kind == OPEN and payload == b'SerialConnection':
+            sessions.add(session)
+        elif kind == RX and session in sessions:
+            data += payload
+    return data.decode('ascii').splitlines()
+
+
+lines = transcript(sys.argv[1]) if len(sys.argv) > 1 else synthesize()
+for name, parse in (('regex', regex_parse),
+                    ('dispatch', SerialConnection._parse)):
+    best = float('inf')
+    for _ in range(repeat):
+        start = timer()
+        for line in lines:
+            parse(line)
+        best = min(best, timer() - start)
+    print("{:8s}: {} lines in {:.4f} s, {:.2f} us/line".format(
+        name, len(lines), best, best / len(lines) * 1e6))
@@ -0,0 +1,29 @@
+"""
+Measures the time to import the modules of the package, each in a fresh
+interpreter, and lists the heavy dependencies each import loads.
+"""
+import sys
+import subprocess
+import statistics
+
+modules = ['base', 'table', 'data_logger', 'measurement', 'controller']
+heavy = ['numpy', 'serial', 'csv']
+repeat = 10
+
+code = """
+import sys, time
+start = time.perf_counter()
+import kapascan.{}
+print(time.perf_counter() - start)
+print(' '.join(name for name in {!r} if name in sys.modules))
+"""
+
+for module in modules:
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code.format(module, heavy)],
+                                stdout=subprocess.PIPE, check=True,
+                                universal_newlines=True).stdout.split('\n')
+        times.append(float(output[0]))
+    print("kapascan.{:<12} {:6.1f} ms  loads: {}".format(
+        module, 1e3 * statistics.median(times), output[1] or '-'))
@@ -0,0 +1,40 @@
+"""
+Records a scan and re-runs it offline from the recording, as a benchmark of
+the parsers and the scan loop without the devices.
+
+Pass 'record' as first argument to record the scan, otherwise the recording
+is replayed as fast as possible.
+"""
+import sys
+from timeit import default_timer as timer
+from kapascan.measurement import Measurement
+from kapascan.recording import Recorder, Replay
+
+host_controller = '192.168.254.173'
+serial_port = '/dev/ttyACM0'
+host_logger = '192.168.254.174'
+settings = {
+    'sensors': ['1739'],
+    'sampling_time': 0.256,
+    'data_points': 100,
+    'extent': ((4, 6, 0.5), (4, 5, 0.5))
+    }
+path = 'scan.rec'
+
+m = Measurement(host_controller, serial_port, host_logger, settings)
+
+if sys.argv[1:] == ['record']:
+    with Recorder(path) as recorder:
+        m.use_recorder(recorder)
+        start = timer()
+        with m:
+            m.scan()
+        print("Recorded scan in {:.3f} s.".format(timer() - start))
+else:
+    replay = Replay(path)
+    m.use_replay(replay)
+    start = timer()
+    with m:
+        m.scan()
+    print("Replayed scan in {:.3f} s, {} mismatches.".format(
+        timer() - start, replay.mismatches))
@@ -0,0 +1,37 @@
+"""
+Measures the per-position overhead of the task dispatch of the scan loop:
+four new ExceptionThreads per position (the previous loop) against the
+long-lived workers of a WorkerPool, with tasks that do nothing.
+"""
+from timeit import default_timer as timer
+from kapascan.base import ExceptionThread, WorkerPool
+
+positions = 10000
+
+
+def task(*args):
+    pass
+
+
+def with_threads():
+    for _ in range(positions):
+        for names in (('move', 'display'), ('get_z', 'get_T')):
+            threads = [ExceptionThread(target=task, name=name) for name in names]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+
+def with_pool():
+    with WorkerPool() as workers:
+        for _ in range(positions):
+            workers.run(('table', task, ()), ('data_logger', task, ()))
+            workers.run(('controller', task, ()), ('data_logger', task, ()))
+
+
+for loop in (with_threads, with_pool):
+    start = timer()
+    loop()
+    print("{:<13} {:6.1f} us per position".format(
+        loop.__name__, (timer() - start) / positions * 1e6))
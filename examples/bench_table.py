@@ -0,0 +1,38 @@
+"""
+Benchmarks the motion strategies of `Table` against the grbl simulator:
+move by move with status polling, move by move with the status monitor and
+streaming of the whole path. Needs a system with pseudo-terminals (Linux).
+"""
+from timeit import default_timer as timer
+from kapascan.simulator import GrblSimulator
+from kapascan.table import Table
+
+# a 5 x 5 raster with 0.5 mm pitch
+path = [(x * 0.5, y * 0.5) for y in range(5) for x in range(5)]
+
+
+def move_by_move(table):
+    for x, y in path:
+        table.move(x, y)
+
+
+def with_monitor(table):
+    with table.status_monitor(interval=0.02):
+        move_by_move(table)
+
+
+def streamed(table):
+    table.move_path(path)
+
+
+with GrblSimulator(locked=False) as grbl:
+    table = Table(grbl.port)
+    with table:
+        for strategy in (move_by_move, with_monitor, streamed):
+            table.move(0, 0)
+            requests, lines = grbl.status_requests, grbl.lines
+            start = timer()
+            strategy(table)
+            print("{:<14} {:6.3f} s  {:4d} status requests  {:3d} lines".format(
+                strategy.__name__, timer() - start,
+                grbl.status_requests - requests, grbl.lines - lines))
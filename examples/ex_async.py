@@ -0,0 +1,21 @@
+import asyncio
+from kapascan.aio import AsyncController, AsyncDataLogger
+from kapascan.reducer import MeanStd
+
+sensors = ['1739']
+host_controller = '192.168.254.173'
+host_logger = '192.168.254.174'
+channel = 101
+
+
+async def main():
+    async with AsyncController(sensors, host_controller) as c, \
+               AsyncDataLogger(host_logger) as data_logger:
+        await data_logger.configure(channel)
+        await c.configure(sampling_time=0.256, mode='continuous')
+        z, T = await asyncio.gather(c.acquire(1000, reducer=MeanStd()),
+                                    data_logger.get_data())
+    print(z)
+    print(T)
+
+asyncio.run(main())
@@ -0,0 +1,20 @@
+from pprint import pprint
+from kapascan.measurement import Measurement
+
+host_controller = '192.168.254.173'
+serial_port = '/dev/ttyACM0'
+host_logger = '192.168.254.174'
+settings = {
+    'sensors': ['1739'],
+    'sampling_time': 0.256,
+    'data_points': 100,
+    'extent': ((4, 6, 0.5), (4, 5, 0.5))
+    }
+
+m = Measurement(host_controller, serial_port, host_logger, settings)
+m.instrument()
+
+with m:
+    m.scan()
+
+pprint(m.io_statistics())
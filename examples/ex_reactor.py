@@ -0,0 +1,22 @@
+from kapascan.base import Reactor
+from kapascan.controller import Controller
+from kapascan.data_logger import DataLogger
+
+sensors = ['1739']
+host_controller = '192.168.254.173'
+host_logger = '192.168.254.174'
+channel = 101
+
+c = Controller(sensors, host_controller)
+data_logger = DataLogger(host_logger)
+
+with Reactor() as reactor:
+    c.use_reactor(reactor)
+    data_logger.use_reactor(reactor)
+    with c, data_logger:
+        data_logger.configure(channel)
+        data = c.acquire(100, 'continuous', 0.256)
+        T = data_logger.get_data()
+
+print(data)
+print(T)
@@ -0,0 +1,15 @@
+from kapascan.controller import Controller
+
+sensors = ['1739']
+host = '192.168.254.173'
+
+data_points = 100000
+sampling_times = [0.256, 0.128, 0.064, 0.032, 0.016]
+
+c = Controller(sensors, host)
+with c:
+    for sampling_time in sampling_times:
+        c.acquire(data_points, 'continuous', sampling_time)
+        print("{:6.3f} ms: {frames} frames received, {missing} frames missing, "
+              "{packages} packages, {bytes} bytes".format(sampling_time,
+                                                          **c.statistics))
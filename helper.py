@@ -2,6 +2,8 @@
 Miscellaneous functions.
 """
 import pprint
+import threading
+import importlib
 
 class BraceMessage(object):
     def __init__(self, obj, *args, pretty=False, **kwargs):
@@ -39,6 +41,42 @@ class cached_property(object):
         return attr
 
 
+class LazyModule():
+    """
+    Proxy of the module `name`, which is imported on first attribute access.
+
+    Used for heavy dependencies (numpy, pyserial) and for the device modules,
+    so importing the package stays fast for scripts that never touch them.
+
+    Parameters
+    ----------
+    name : str
+        The name of the module, relative names are resolved against
+        `package`.
+    package : str, optional
+        The package of a relative module name.
+    """
+    def __init__(self, name, package=None):
+        self._name = name
+        self._package = package
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name,
+                                                           self._package)
+            module = self._module
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return "<lazy module {!r} ({})>".format(self._name, state)
+
+
 def query_yes_no(question, default="yes"):
     """
     Asks a yes/no question via input() and returns the answer.
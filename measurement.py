@@ -22,19 +22,23 @@ import itertools
 from timeit import default_timer as timer
 import time
 import datetime
+import math
 import logging
 import collections
-import numpy as np
 from pprint import pformat as pretty
-from . import controller
-from . import table
-from . import data_logger
-from .base import ExceptionThread
-from .helper import BraceMessage as __
+from .base import ExceptionThread, WorkerPool
+from .helper import BraceMessage as __, LazyModule
 
 
 logger = logging.getLogger(__name__)
 
+# The device modules and numpy are imported when a `Measurement` is created.
+np = LazyModule('numpy')
+controller = LazyModule('.controller', __package__)
+table = LazyModule('.table', __package__)
+data_logger = LazyModule('.data_logger', __package__)
+reducer = LazyModule('.reducer', __package__)
+
 
 class MeasurementError(Exception):
     """Simple exception class used for all errors in this module."""
@@ -78,6 +82,21 @@ class Measurement():
         `change_direction` : bool, optional
             Changes the primary scanning direction after each line. Defaults to
             True.
+        `settle_time` : float, optional
+            The dwell time in seconds at each measuring position before the
+            data is acquired, in scan mode 'program'. Defaults to 0.02 s.
+        `step_settle_time` : float, optional
+            The dwell time in seconds at each measuring position before the
+            data is acquired, in scan mode 'step'. Defaults to 0, i.e. no
+            dwell.
+        `synchronous_stages` : tuple of str, optional
+            The stages of scan mode 'step' out of 'display' and 'store' that
+            have to be finished before the table moves to the next position. Defaults to (), i.e. they overlap
+            with the next move.
+        `fly_feed` : float, optional
+            The feed rate in mm/min along the lines in scan mode 'fly'.
+            Defaults to None, the feed rate at which `data_points` frames
+            are measured per grid step (limited to the maximal feed rate).
 
     Example
     -------
@@ -95,7 +114,11 @@ class Measurement():
             'data_points': 50,
             'mode': 'absolute',
             'direction': ('x', 'y'),
-            'change_direction': True
+            'change_direction': True,
+            'settle_time': 0.02,
+            'step_settle_time': 0,
+            'fly_feed': None,
+            'synchronous_stages': ()
             }
         for key in settings:
             if key not in default_settings.keys() | {'extent'}:
@@ -109,6 +132,8 @@ class Measurement():
         self._table = table.Table(serial_port)
         self._data_logger = data_logger.DataLogger(host_data_logger)
         self.history = collections.deque([], 100)
+        self.noise = None
+        self.stage_timings = {}
 
     def connect(self):
         """
@@ -126,6 +151,42 @@ class Measurement():
         self._table._get_settings()
         self._table.check_resolution(self.settings['extent'])
 
+    def instrument(self, enable=True):
+        """
+        Switches the I/O instrumentation of all devices on or off, see
+        `base.Instrumentation`.
+        """
+        for device in self._devices().values():
+            device.instrument(enable)
+
+    def use_recorder(self, recorder):
+        """
+        Records the data exchanged with all devices with `recorder`, see
+        `recording.Recorder`.
+        """
+        for device in self._devices().values():
+            device.use_recorder(recorder)
+
+    def use_replay(self, replay):
+        """
+        Replays the data of all devices from `replay` instead of connecting
+        to them, see `recording.Replay`.
+        """
+        for device in self._devices().values():
+            device.use_replay(replay)
+
+    def io_statistics(self):
+        """
+        Returns the I/O statistics (see `base.Device.io_statistics`) of all
+        devices, keyed by 'controller', 'table' and 'data_logger'.
+        """
+        return {name: device.io_statistics()
+                for name, device in self._devices().items()}
+
+    def _devices(self):
+        return {'controller': self._controller, 'table': self._table,
+                'data_logger': self._data_logger}
+
     def disconnect(self, *args):
         """Disconnects from all devices."""
         self._table.disconnect()
@@ -181,9 +242,9 @@ class Measurement():
         corners = [(x[i], y[j]) for i, j in itertools.product((0, -1), repeat=2)]
         with self._table.check_gcode_mode():
             try:
-                for x, y in corners:
-                    self._table.move(x, y, 'absolute')
+                self._table.move_path(corners, 'absolute')
             except table.GrblAlarm as error:
+                x, y = corners[error.index or 0]
                 msg = __("Error during dry-run: Motion target (X {}, Y {}) " +
                          "exceeds machine travel (X: 0.0 - {}, Y: 0.0 - {}).",
                          x, y, *self._table.max_travel)
@@ -196,70 +257,389 @@ class Measurement():
                 logger.warn(error)
                 raise error
 
-    def scan(self):
+    stages = ('move', 'settle', 'acquire', 'temperature', 'display', 'store')
+
+    def scan(self, mode='step', store=None):
         """
         Rasters the measuring area. Halts at every measuring position and
         acquires a certain amount of data points (setting `data_points`). The
         mean of this data sample is used as the data value at this position.
         Additionally, the temperature is measured at every measuring position.
 
+        Parameters
+        ----------
+        mode : str {'step', 'program', 'fly'}, optional
+            In mode 'step', the table is moved to each position and the data
+            is acquired when it is idle, which costs round trips to grbl and
+            the controller at each position. The scan runs as a pipeline of
+            the stages 'move', 'settle' (if the setting `step_settle_time` is
+            set), 'acquire' (reduced to mean and standard deviation while
+            the frames are received) and 'temperature' (measured during the
+            acquisition), which are critical, and 'display' and 'store',
+            which run on worker threads while the table moves to the next
+            position (unless they are listed in the setting
+            `synchronous_stages`). The durations of
+            the stages are kept in attribute `stage_timings`, see
+            `stage_statistics`. In mode 'program', the whole
+            scan is compiled into a single G-code program (see `program`),
+            which is streamed to grbl. At each position, grbl toggles its
+            coolant output (M8 / M9), which is wired to the trigger input of
+            the controller (trigger mode 'rising_edge'), so the host only
+            collects the triggered frames. The temperature is measured when
+            the data of a position is complete. In mode 'fly', each line is
+            moved at the constant feed `fly_feed` while the controller
+            measures continuously. The frames are mapped to positions by
+            interpolating the status reports of grbl at the frame times
+            (derived from the sampling time) and are binned onto the grid:
+            All frames within half a grid step of a position are reduced to
+            its value. The temperature is measured once per line. Defaults
+            to 'step'.
+        store : callable, optional
+            Called with the index, the position (x, y), the values, their
+            standard deviations and the temperature of each position as soon
+            as they are available, e.g. to persist the data while scanning.
+
         Returns
         -------
         x, y : 1D-array
             The vectors spanning the measuring area
         z, T : 2D-array
             The acquired data values at the respective coordinates
+        t : 1D-array
+            The time (seconds since the epoch) at which each position was
+            measured, in scan order, i.e. not reshaped like `z`.
+
+        The standard deviation of the data sample at each position is stored
+        in attribute `noise` (with the same shape as `z`).
 
         Raises
         ------
         MeasurementError :
 
         """
+        if mode not in ('step', 'program', 'fly'):
+            raise MeasurementError("Invalid scan mode: {}".format(mode))
         self.check_movement()
-        self._controller.set_sampling_time(self.settings['sampling_time'])
-        self._controller.set_trigger_mode('continuous')
 
         x, y = self._vectors()
         positions = self._positions(x, y)
         length = len(positions)
         width = len(self.settings['sensors'])
         z = np.zeros((width, length))
+        dz = np.zeros((width, length))
         T = np.zeros(length)
         t = np.zeros(length)
-        threads = []
 
-        self.move(*positions[1][1], mode='absolute', history=True)
         logger.info("Started scan.")
         logger.info(__("Scanning {} positions ...", length))
-        for i, (i_pos, position) in _log_progress(list(enumerate(positions))):
-            # --- Positioning and Display---
-            threads.append(ExceptionThread(
-                target=self._move_thread, name='move', args=(*position,)))
-            threads.append(ExceptionThread(
-                target=self._display_thread, name='display', args=(i, length)))
-            for thread in threads:
-                thread.start()
-            for thread in threads:
-                thread.join()
-            threads.clear()
-            # --- Measurements ---
-            t[i] = time.time()
-            threads.append(ExceptionThread(
-                target=self._get_z_thread, name='get_z', args=(z, i_pos)))
-            threads.append(ExceptionThread(
-                target=self._get_T_thread, name='get_T', args=(T, i_pos)))
-            for thread in threads:
-                thread.start()
-            for thread in threads:
-                thread.join()
-            threads.clear()
+        if mode == 'program':
+            self._scan_program(positions, z, dz, T, t, store)
+        elif mode == 'fly':
+            self._scan_fly(x, y, positions, z, dz, T, t, store)
+        else:
+            self._scan_step(positions, z, dz, T, t, store)
         self.move_back()
 
         z = z.reshape(width, len(x), len(y)).transpose(0, 2, 1)
+        self.noise = dz.reshape(width, len(x), len(y)).transpose(0, 2, 1)
         T = T.reshape((len(x), len(y))).transpose()
         logger.info("Finished scan.")
         return x, y, z, T, t
 
+    def _scan_step(self, positions, z, dz, T, t, store=None):
+        """
+        Scans position by position, see `scan`. The critical stages run in
+        this thread, the other stages of a position on the workers of a
+        `WorkerPool`. They are finished before the stages of the next
+        position are started, so they lag by one position at most.
+        """
+        synchronous = set(self.settings['synchronous_stages'])
+        if not synchronous <= set(self.stages):
+            raise MeasurementError("Unknown scan stage(s): {}".format(
+                ", ".join(sorted(synchronous - set(self.stages)))))
+        self._controller.configure(self.settings['sampling_time'], 'continuous')
+        length = len(positions)
+        self.stage_timings = {stage: [] for stage in self.stages}
+        deferred = []
+
+        self.move(*positions[1][1], mode='absolute', history=True)
+        with self._controller.data_connection(), WorkerPool() as workers:
+
+            def run(worker, stage, target, *args):
+                task = workers.submit(worker, self._timed, stage, target, *args)
+                if stage in synchronous:
+                    task.wait()
+                else:
+                    deferred.append(task)
+                return task
+
+            for i, (i_pos, position) in _log_progress(list(enumerate(positions))):
+                # --- Critical stages ---
+                self._timed('move', self._move_thread, *position)
+                if self.settings['step_settle_time']:
+                    self._timed('settle', time.sleep,
+                                self.settings['step_settle_time'])
+                t[i] = time.time()
+                # --- Stages of the previous position ---
+                try:
+                    WorkerPool.wait_all(deferred)
+                finally:
+                    deferred.clear()
+                measured = workers.submit('data_logger', self._timed,
+                                          'temperature', self._get_T_thread,
+                                          T, i_pos)
+                z[:, i_pos], dz[:, i_pos] = self._timed(
+                    'acquire', self._controller.acquire,
+                    self.settings['data_points'],
+                    reducer=reducer.MeanStd()).T
+                measured.wait()
+                # --- Deferred stages ---
+                run('data_logger', 'display', self._display_thread, i, length)
+                if store is not None:
+                    run('store', 'store', store, i_pos, position,
+                        z[:, i_pos], dz[:, i_pos], T[i_pos])
+            WorkerPool.wait_all(deferred)
+        logger.info(__("Stage timings:\n", self.stage_statistics(), pretty=True))
+
+    def _timed(self, stage, target, *args, **kwargs):
+        """Runs ``target(*args, **kwargs)`` and records its duration as `stage`."""
+        start = time.perf_counter()
+        try:
+            return target(*args, **kwargs)
+        finally:
+            self.stage_timings[stage].append(time.perf_counter() - start)
+
+    def stage_statistics(self):
+        """
+        Returns the statistics of the stage durations of the last scan in
+        mode 'step'.
+
+        Returns
+        -------
+        statistics : dict
+            The number of runs and the total, mean and maximal duration in
+            seconds, keyed by stage.
+        """
+        statistics = {}
+        for stage, durations in self.stage_timings.items():
+            if durations:
+                statistics[stage] = {'count': len(durations),
+                                     'total': sum(durations),
+                                     'mean': sum(durations) / len(durations),
+                                     'max': max(durations)}
+        return statistics
+
+    def _scan_program(self, positions, z, dz, T, t, store=None):
+        """
+        Scans with a precompiled G-code program, see `scan`. The trigger
+        mode of the controller is restored afterwards.
+        """
+        previous_mode = self._controller.state.get('trigger_mode', 'continuous')
+        self._controller.configure(self.settings['sampling_time'], 'rising_edge')
+        try:
+            self._run_program(positions, z, dz, T, t, store)
+        finally:
+            self._controller.configure(mode=previous_mode)
+
+    def _run_program(self, positions, z, dz, T, t, store=None):
+        """Streams the scan program and acquires the triggered data."""
+        data_points = self.settings['data_points']
+        length = len(positions)
+        program = self.program([position for _, position in positions])
+        timeouts = [10 + duration for duration in self._stop_durations(
+            [position for _, position in positions])]
+
+        self.move(*positions[0][1], mode='absolute', history=True)
+        with self._controller.data_connection():
+            streamer = ExceptionThread(target=self._table.stream,
+                                       name='stream', args=(program,))
+            streamer.start()
+            try:
+                for i, (i_pos, position) in _log_progress(list(enumerate(positions))):
+                    try:
+                        z[:, i_pos], dz[:, i_pos] = self._controller.acquire(
+                            data_points, fresh=False, reducer=reducer.MeanStd(),
+                            timeout=timeouts[i]).T
+                    except TimeoutError:
+                        if not streamer.is_alive():
+                            streamer.join()
+                        msg = __("No trigger at position {} within {:.1f} s.",
+                                 position, timeouts[i])
+                        logger.error(msg)
+                        raise MeasurementError(msg)
+                    t[i] = time.time()
+                    self._get_T_thread(T, i_pos)
+                    self._display_thread(i, length)
+                    if store is not None:
+                        store(i_pos, position, z[:, i_pos], dz[:, i_pos], T[i_pos])
+            except BaseException:
+                logger.warning("Aborting the scan program.")
+                self._table.cancel_stream()
+                try:
+                    streamer.join(timeout=1)
+                except (table.TableError, ConnectionError, TimeoutError):
+                    pass
+                self._table.reset()
+                if streamer.is_alive():
+                    logger.warning("Streaming thread still running.")
+                raise
+            streamer.join()
+
+    def _scan_fly(self, x, y, positions, z, dz, T, t, store=None):
+        """Scans line by line in continuous motion, see `scan`."""
+        axis = 0 if self.settings['direction'][0][-1] in 'xX' else 1
+        grid = (x, y)[axis]
+        if len(grid) < 2:
+            raise MeasurementError(
+                "Scan mode 'fly' needs at least two positions per line.")
+        sampling_time = self._controller.configure(
+            self.settings['sampling_time'], 'continuous') / 1e6
+        feed = self._fly_feed(grid, sampling_time)
+        lines = [positions[k:k + len(grid)]
+                 for k in range(0, len(positions), len(grid))]
+        model = self._table.motion_model
+        clock_offset = time.time() - time.perf_counter()
+
+        start, _ = self._run_up(lines[0], axis, feed)
+        self.move(*start, mode='absolute', history=True)
+        with self._controller.data_connection(), \
+                self._table.status_monitor(interval=0.01) as monitor:
+            for i, line in _log_progress(list(enumerate(lines)), name='Line'):
+                start, end = self._run_up(line, axis, feed)
+                self._table.move(*start, mode='absolute')
+                n = int(math.ceil(
+                    (model.duration(start, end, feed) + 0.1) / sampling_time))
+                with monitor.recording() as reports:
+                    self._controller.data_socket.flush()
+                    since = time.perf_counter()
+                    self._table.move(*end, mode='absolute', feed=feed,
+                                     wait=False)
+                    acked = time.perf_counter()
+                    data = self._controller.acquire(n, fresh=False, timeout=10)
+                    last = time.perf_counter()
+                    monitor.wait_idle(
+                        since=since, after=acked,
+                        timeout=model.duration(start, end, feed) +
+                        self._table.idle_timeout)
+                if self._controller.statistics['missing']:
+                    logger.warning(__("Missed frames on line {}, the positions "
+                                      "of its data points are shifted.", i))
+                frame_times = last - sampling_time * (
+                    self._controller.data_socket.frames_left + n - 1 - np.arange(n))
+                coordinates = np.interp(
+                    frame_times, [report.time for report in reports],
+                    [report.position[axis] for report in reports])
+                self._bin_line(line, i * len(grid), axis, coordinates,
+                               frame_times + clock_offset, data, z, dz, t)
+                T[[i_pos for i_pos, _ in line]] = self._data_logger.get_data()
+                self._display_thread(i, len(lines))
+                if store is not None:
+                    for i_pos, position in line:
+                        store(i_pos, position, z[:, i_pos], dz[:, i_pos],
+                              T[i_pos])
+
+    def _fly_feed(self, grid, sampling_time):
+        """Returns the feed rate in mm/min of the lines in scan mode 'fly'."""
+        max_feed = min(self._table.max_feed)
+        feed = self.settings['fly_feed']
+        if feed is None:
+            step = np.min(np.abs(np.diff(grid)))
+            feed = 60 * step / (self.settings['data_points'] * sampling_time)
+        if feed > max_feed:
+            logger.warning(__("Feed rate {:.1f} mm/min limited to {} mm/min.",
+                              feed, max_feed))
+            feed = max_feed
+        return feed
+
+    def _run_up(self, line, axis, feed):
+        """
+        Returns the start and end point of a line in scan mode 'fly',
+        extended by the distance needed to accelerate to `feed`, within the
+        machine travel.
+        """
+        start, end = list(line[0][1]), list(line[-1][1])
+        sign = 1 if end[axis] > start[axis] else -1
+        run_up = (feed / 60) ** 2 / (2 * self._table.settings[120 + axis])
+        travel = self._table.max_travel[axis]
+        start[axis] = min(max(start[axis] - sign * run_up, 0), travel)
+        end[axis] = min(max(end[axis] + sign * run_up, 0), travel)
+        return tuple(start), tuple(end)
+
+    def _bin_line(self, line, first, axis, coordinates, frame_times, data,
+                  z, dz, t):
+        """
+        Reduces the frames of a line to the values at its positions: All
+        frames within half a grid step of a position are averaged. `first` is
+        the index of the first position of the line in scan order.
+        """
+        grid = np.array([position[axis] for _, position in line])
+        order = np.argsort(grid)
+        sorted_grid = grid[order]
+        half_steps = np.diff(sorted_grid) / 2
+        edges = np.concatenate((
+            [sorted_grid[0] - half_steps[0]], sorted_grid[:-1] + half_steps,
+            [sorted_grid[-1] + half_steps[-1]]))
+        bins = np.digitize(coordinates, edges) - 1
+        valid = (bins >= 0) & (bins < len(grid))
+        bins = bins[valid]
+        counts = np.bincount(bins, minlength=len(grid))
+        if not counts.all():
+            logger.warning(__("No data at {} position(s) of a line.",
+                              np.count_nonzero(counts == 0)))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for channel, values in enumerate(data[:, valid]):
+                sums = np.bincount(bins, values, len(grid))
+                squares = np.bincount(bins, values ** 2, len(grid))
+                mean = sums / counts
+                z[channel, [line[k][0] for k in order]] = mean
+                dz[channel, [line[k][0] for k in order]] = np.sqrt(
+                    np.maximum(squares / counts - mean ** 2, 0))
+            times = np.bincount(bins, frame_times[valid], len(grid)) / counts
+        t[first + order] = times
+
+    def program(self, positions):
+        """
+        Compiles the G-code program of a scan in mode 'program'.
+
+        At each position, grbl dwells for `settle_time` and then toggles the
+        coolant output (M8 / M9) `data_points` times. The rising edges
+        trigger the measurements of the controller.
+
+        Parameters
+        ----------
+        positions : sequence of 2-tuples
+            The absolute coordinates (x, y) in mm of the measuring positions.
+
+        Returns
+        -------
+        blocks : list of str
+            The G-code blocks of the program.
+        """
+        dwell = self.settings['settle_time']
+        pulses = ["M8", "M9"] * self.settings['data_points']
+        blocks = ["G90 G1 F{}".format(min(self._table.max_feed)), "M9"]
+        for x, y in positions:
+            blocks.append("G1 X{} Y{}".format(x, y))
+            if dwell:
+                blocks.append("G4 P{}".format(dwell))
+            blocks.extend(pulses)
+        return blocks
+
+    def _stop_durations(self, positions):
+        """
+        Returns the predicted duration in seconds of the move to each
+        position and the dwell there.
+        """
+        model = self._table.motion_model
+        feed = min(self._table.max_feed)
+        durations = []
+        previous = positions[0]
+        for position in positions:
+            durations.append(model.duration(previous, position, feed) +
+                             self.settings['settle_time'])
+            previous = position
+        return durations
+
     def check_wipe(self):
         x_min_sample = self.settings['extent'][0][0]
         delta_x_sample = self.settings['extent'][0][1] - x_min_sample
@@ -275,10 +655,7 @@ class Measurement():
         ywipe = pos[1] - 26
         if ywipe < 0:
             ywipe = 0
-        self._table.move(y=ywipe)
-        self._table.move(x=0)
-        self._table.move(x=5)
-        self._table.move(*pos)
+        self._table.move_path([(None, ywipe), (0, None), (5, None), pos])
 
     def _vectors(self):
         """
@@ -299,11 +676,11 @@ class Measurement():
         for range_, offset in zip(self.settings['extent'], position):
             start, stop, step = range_
             if start == stop:
-                vec = np.array([start], dtype=np.float)
+                vec = np.array([start], dtype=float)
             elif step >= stop - start:
-                vec = np.array([start, stop], dtype=np.float)
+                vec = np.array([start, stop], dtype=float)
             else:
-                vec = np.arange(start, stop + step, step, dtype=np.float)
+                vec = np.arange(start, stop + step, step, dtype=float)
             vec += offset
             vectors.append(vec)
         return vectors
@@ -364,10 +741,6 @@ class Measurement():
         """The target function of the thread moving the table."""
         self.move(x, y, 'absolute')
 
-    def _get_z_thread(self, z, i_pos):
-        """The target function of the thread acquiring the z values."""
-        z[:, i_pos] = self._controller.acquire(self.settings['data_points']).mean(1)
-
     def _get_T_thread(self, T, i_pos):
         """The target function of the thread acquiring the temperature."""
         T[i_pos] = self._data_logger.get_data()
@@ -0,0 +1,410 @@
+"""
+This module records the raw bytes exchanged with the devices into a compact
+binary log and replays such a log through the unchanged parsers of the
+interfaces. Real scans can thus be re-run offline, e.g. as deterministic
+benchmarks of the parsing and of the scan loop.
+
+Class listing
+-------------
+ReplayError :
+    A simple exception class used for all errors in this module.
+Recorder :
+    Writes the log of a session.
+Replay :
+    Reads a log and provides the transports to replay it.
+
+Function listing
+----------------
+read_log :
+    Iterates over the records of a log.
+
+Notes
+-----
+Recording and replay work on the level of the transport of an `IOBase`
+instance (the socket of `ControlSocket`, `DataSocket` and `SCPISocket`, the
+serial port of `SerialConnection`). On `connect`, the transport is wrapped
+(recording) or replaced (replay), so `_receive` and `get_answer` see exactly
+the bytes (and chunks) of the recorded session.
+
+The log starts with the magic bytes ``KSREC\\x01``, followed by records of a
+15 byte header (monotonic time in seconds since the start of the recording,
+session number, kind, payload length) and the payload. Each connection of a
+device is a session, which is opened by an OPEN record with the class name
+of the interface as payload.
+
+Example
+-------
+  >>> with Recorder('scan.rec') as recorder:
+  >>>     measurement.use_recorder(recorder)
+  >>>     with measurement:
+  >>>         measurement.scan()
+  >>>
+  >>> measurement.use_replay(Replay('scan.rec'))
+  >>> with measurement:
+  >>>     measurement.scan()
+"""
+
+import time
+import socket
+import struct
+import logging
+import threading
+import collections
+from .helper import BraceMessage as __
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"KSREC\x01"
+RECORD = struct.Struct('<dHBI')
+OPEN, RX, TX, CLOSE = range(4)
+
+
+class ReplayError(Exception):
+    """Simple exception class used for all errors in this module."""
+
+
+def read_log(path):
+    """
+    Iterates over the records of the log `path`.
+
+    Yields
+    ------
+    timestamp : float
+        The time in seconds since the start of the recording.
+    session : int
+        The number of the session.
+    kind : int
+        One of OPEN, RX, TX or CLOSE.
+    payload : bytes
+        The name of the interface for OPEN, the data for RX and TX.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    if not data.startswith(MAGIC):
+        raise ReplayError("{} is not a recording.".format(path))
+    offset = len(MAGIC)
+    while offset + RECORD.size <= len(data):
+        timestamp, session, kind, length = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        payload = data[offset:offset + length]
+        if len(payload) < length:
+            logger.warning(__("Truncated record at the end of {}.", path))
+            return
+        offset += length
+        yield timestamp, session, kind, payload
+
+
+class Recorder():
+    """
+    Writes the bytes exchanged with the devices into the log `path`.
+
+    Pass the recorder to ``Device.use_recorder`` (or set the attribute
+    `recorder` of an `IOBase` instance) before connecting. All connections
+    may share one recorder.
+
+    A recorder can also be used as the sink of `base.wire_trace`, which
+    captures the traffic of all interfaces without reconnecting them. Each
+    interface is then logged as one session.
+
+    Parameters
+    ----------
+    path : str
+        The file name of the log.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+        self._lock = threading.Lock()
+        self._sessions = 0
+        self._traced = {}
+        self._start = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Closes the log."""
+        with self._lock:
+            self._file.close()
+
+    def write(self, session, kind, payload=b""):
+        """Appends a record to the log."""
+        with self._lock:
+            self._append(session, kind, payload)
+
+    def _append(self, session, kind, payload):
+        """Appends a record to the log. The lock must be held."""
+        header = RECORD.pack(time.monotonic() - self._start, session, kind,
+                             len(payload))
+        if not self._file.closed:
+            self._file.write(header + payload)
+
+    def transport(self, transport, name):
+        """
+        Opens a new session for the interface `name` and returns `transport`
+        wrapped by a recording proxy.
+        """
+        return _RecordingTransport(transport, self, self._open_session(name))
+
+    def sent(self, device, data):
+        """Logs `data` sent by the interface `device` (trace sink)."""
+        self.write(self._trace_session(device), TX, bytes(data))
+
+    def received(self, device, data):
+        """Logs `data` received by the interface `device` (trace sink)."""
+        self.write(self._trace_session(device), RX, bytes(data))
+
+    def _open_session(self, name):
+        with self._lock:
+            return self._new_session(name)
+
+    def _new_session(self, name):
+        """Opens a session for `name`. The lock must be held."""
+        session = self._sessions
+        self._sessions += 1
+        self._append(session, OPEN, name.encode('utf-8'))
+        return session
+
+    def _trace_session(self, device):
+        session = self._traced.get(device)
+        if session is None:
+            with self._lock:
+                session = self._traced.get(device)
+                if session is None:
+                    session = self._traced[device] = self._new_session(
+                        device.__class__.__name__)
+        return session
+
+
+class _RecordingTransport():
+    """Records the data read from and written to a socket or serial port."""
+
+    def __init__(self, transport, recorder, session):
+        self.transport = transport
+        self._recorder = recorder
+        self._session = session
+
+    def __getattr__(self, name):
+        return getattr(self.transport, name)
+
+    def recv(self, *args):
+        data = self.transport.recv(*args)
+        if data:
+            self._recorder.write(self._session, RX, data)
+        return data
+
+    def readline(self, *args):
+        data = self.transport.readline(*args)
+        if data:
+            self._recorder.write(self._session, RX, data)
+        return data
+
+    def read(self, *args):
+        data = self.transport.read(*args)
+        if data:
+            self._recorder.write(self._session, RX, data)
+        return data
+
+    def send(self, data, *args):
+        sent = self.transport.send(data, *args)
+        self._recorder.write(self._session, TX, bytes(data[:sent]))
+        return sent
+
+    def sendall(self, data, *args):
+        self.transport.sendall(data, *args)
+        self._recorder.write(self._session, TX, bytes(data))
+
+    def write(self, data):
+        written = self.transport.write(data)
+        self._recorder.write(self._session, TX, bytes(
+            data if written is None else data[:written]))
+        return written
+
+    def close(self):
+        self._recorder.write(self._session, CLOSE)
+        self.transport.close()
+
+
+class Replay():
+    """
+    Replays a log written by `Recorder`.
+
+    Pass the replay to ``Device.use_replay`` (or set the attribute `replay` of
+    an `IOBase` instance) before connecting. Each `connect` of an interface
+    replays the next recorded session of the same interface class. No
+    connections to the devices are made.
+
+    Parameters
+    ----------
+    path : str
+        The file name of the log.
+    speed : float, optional
+        The replay speed relative to the recording, e.g. 1 for the recorded
+        speed. Defaults to None, which replays as fast as possible.
+
+    Attributes
+    ----------
+    mismatches : int
+        The number of written commands that differ from the recording.
+
+    Notes
+    -----
+    Received data is released in the recorded order relative to the sent
+    commands: A chunk is not received before all commands that were sent
+    before it in the recording have been sent again. Hence a replay of the
+    same code path is deterministic, also at full speed.
+    """
+
+    def __init__(self, path, speed=None):
+        self.path = path
+        self.speed = speed
+        self.mismatches = 0
+        self._sessions = collections.defaultdict(collections.deque)
+        self._condition = threading.Condition()
+        self._tx_sent = 0
+        self._start = None
+        records = {}
+        tx_count = 0
+        for timestamp, session, kind, payload in read_log(path):
+            if kind == OPEN:
+                records[session] = []
+                self._sessions[payload.decode('utf-8')].append(records[session])
+            elif kind in (RX, TX) and session in records:
+                records[session].append((kind, timestamp, tx_count, payload))
+                tx_count += kind == TX
+        self._first = min((rec[0][1] for rec in records.values() if rec),
+                          default=0)
+
+    def transport(self, name, timeout):
+        """
+        Returns the transport that replays the next session of the
+        interface `name`.
+
+        Raises
+        ------
+        ReplayError :
+            If the log contains no further session of `name`.
+        """
+        try:
+            records = self._sessions[name].popleft()
+        except IndexError:
+            raise ReplayError("No further session of {} in {}.".format(
+                name, self.path))
+        with self._condition:
+            if self._start is None:
+                self._start = time.monotonic()
+        return _ReplayTransport(self, records, timeout)
+
+    def _due(self, timestamp):
+        """Returns the monotonic time a record is due at."""
+        if self.speed is None:
+            return self._start
+        return self._start + (timestamp - self._first) / self.speed
+
+    def _sent(self, expected, data):
+        """Counts a sent command and checks it against the recording."""
+        with self._condition:
+            self._tx_sent += 1
+            if expected != data:
+                self.mismatches += 1
+                logger.warning(__("Replay mismatch: sent {!r} instead of {!r}.",
+                                  data, expected))
+            self._condition.notify_all()
+
+
+class _ReplayTransport():
+    """Serves the recorded data of one session like a socket or serial port."""
+
+    def __init__(self, replay, records, timeout):
+        self._replay = replay
+        self._rx = collections.deque(
+            (timestamp, tx_before, payload)
+            for kind, timestamp, tx_before, payload in records if kind == RX)
+        self._tx = collections.deque(
+            payload for kind, _, _, payload in records if kind == TX)
+        self.timeout = timeout
+        self._closed = False
+
+    def _next(self, timeout):
+        """
+        Returns the next chunk as soon as it is due, or None if no chunk is
+        due within `timeout` seconds or the transport is closed.
+        """
+        replay = self._replay
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with replay._condition:
+            while not self._closed:
+                if self._rx:
+                    timestamp, tx_before, payload = self._rx[0]
+                    if replay._tx_sent >= tx_before:
+                        due = replay._due(timestamp)
+                        now = time.monotonic()
+                        if now >= due:
+                            self._rx.popleft()
+                            return payload
+                        wait = due - now
+                    else:
+                        wait = None
+                else:
+                    wait = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    wait = remaining if wait is None else min(wait, remaining)
+                replay._condition.wait(wait)
+        return b""
+
+    def recv(self, bufsize=None):
+        data = self._next(self.timeout)
+        if data is None:
+            raise socket.timeout("timed out")
+        return data
+
+    def readline(self, *args):
+        data = self._next(self.timeout)
+        return b"" if data is None else data
+
+    read = readline
+
+    @property
+    def in_waiting(self):
+        data = self._next(0)
+        if data:
+            self._rx.appendleft((0, 0, data))
+            return len(data)
+        return 0
+
+    def _write(self, data):
+        data = bytes(data)
+        self._replay._sent(self._tx.popleft() if self._tx else None, data)
+        return len(data)
+
+    def send(self, data, *args):
+        return self._write(data)
+
+    def sendall(self, data, *args):
+        self._write(data)
+
+    def write(self, data):
+        return self._write(data)
+
+    def fileno(self):
+        raise OSError("A replayed session has no file descriptor, "
+                      "it cannot be used with a reactor.")
+
+    def shutdown(self, *args):
+        self.close()
+
+    cancel_read = shutdown
+
+    def close(self):
+        with self._replay._condition:
+            self._closed = True
+            self._replay._condition.notify_all()
@@ -0,0 +1,230 @@
+"""
+This module provides accumulators that reduce the data stream of the
+controller block by block, while the frames are decoded. The full data sample
+is never materialized, so the memory usage only depends on the number of
+channels.
+
+Class listing
+-------------
+Reducer :
+    The base class of all reducers.
+Mean :
+    The mean of each channel.
+Variance, Std :
+    The variance / standard deviation of each channel (Welford's algorithm).
+MeanStd :
+    The mean and the standard deviation of each channel.
+MinMax :
+    The minimum and the maximum of each channel.
+BlockMedian :
+    The median of the medians of consecutive blocks of frames.
+
+Example
+-------
+  >>> with controller:
+  >>>     mean, std = controller.acquire(10000, reducer=MeanStd()).T
+"""
+
+import numpy as np
+
+
+class Reducer():
+    """
+    Base class for all reducers.
+
+    A reducer is fed with blocks of raw frames (an array of shape
+    (frames, channels)) via ``update``. Method ``result`` returns the reduced
+    data, scaled with the given factors per channel, as an array with the
+    channels as first axis. If no frames were fed (e.g. after a timeout),
+    the result is NaN.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Resets the reducer to its initial state."""
+        self.count = 0
+
+    def update(self, frames):
+        """
+        Override this method to accumulate the block `frames` of shape
+        (frames, channels). Call the base method to count the frames.
+        """
+        self.count += len(frames)
+
+    def result(self, factors):
+        """
+        Override this method to return the reduced data, scaled with
+        `factors`, an array with one factor per channel.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _nan(factors, *shape):
+        """Returns NaNs in place of the result, with `shape` per channel."""
+        return np.full(np.shape(factors) + shape, np.nan)
+
+
+class Mean(Reducer):
+    """The mean of each channel."""
+
+    def reset(self):
+        super().reset()
+        self._sum = 0
+
+    def update(self, frames):
+        super().update(frames)
+        self._sum = self._sum + frames.sum(0, dtype=np.int64)
+
+    def result(self, factors):
+        if not self.count:
+            return self._nan(factors)
+        return self._sum / self.count * factors
+
+
+class Variance(Reducer):
+    """
+    The variance of each channel.
+
+    The mean and the sum of squared deviations are accumulated with the
+    parallel variant of Welford's algorithm (Chan et al.), which combines the
+    statistics of each block with the previous ones in a numerically stable
+    way.
+
+    Parameters
+    ----------
+    ddof : int, optional
+        Delta degrees of freedom, see ``numpy.var``.
+    """
+
+    def __init__(self, ddof=0):
+        super().__init__()
+        self.ddof = ddof
+
+    def reset(self):
+        super().reset()
+        self._mean = 0.
+        self._m2 = 0.
+
+    def update(self, frames):
+        n_a = self.count
+        n_b = len(frames)
+        if not n_b:
+            return
+        super().update(frames)
+        mean_b = frames.mean(0)
+        m2_b = ((frames - mean_b) ** 2).sum(0)
+        delta = mean_b - self._mean
+        self._mean = self._mean + delta * n_b / self.count
+        self._m2 = self._m2 + m2_b + delta ** 2 * n_a * n_b / self.count
+
+    def variance(self):
+        """
+        Returns the unscaled variance, NaN if there are not more than `ddof`
+        frames.
+        """
+        if self.count <= self.ddof:
+            return np.full(np.shape(self._m2), np.nan)
+        return self._m2 / (self.count - self.ddof)
+
+    def result(self, factors):
+        if not self.count:
+            return self._nan(factors)
+        return self.variance() * factors ** 2
+
+
+class Std(Variance):
+    """The standard deviation of each channel."""
+
+    def result(self, factors):
+        if not self.count:
+            return self._nan(factors)
+        return np.sqrt(self.variance()) * factors
+
+
+class MeanStd(Variance):
+    """
+    The mean and the standard deviation of each channel. The result is an
+    array of shape (channels, 2).
+    """
+
+    def result(self, factors):
+        if not self.count:
+            return self._nan(factors, 2)
+        return np.stack([self._mean * factors,
+                         np.sqrt(self.variance()) * factors], axis=1)
+
+
+class MinMax(Reducer):
+    """
+    The minimum and the maximum of each channel. The result is an array of
+    shape (channels, 2).
+    """
+
+    def reset(self):
+        super().reset()
+        self._min = None
+        self._max = None
+
+    def update(self, frames):
+        if not len(frames):
+            return
+        super().update(frames)
+        if self._min is None:
+            self._min = frames.min(0)
+            self._max = frames.max(0)
+        else:
+            np.minimum(self._min, frames.min(0), out=self._min)
+            np.maximum(self._max, frames.max(0), out=self._max)
+
+    def result(self, factors):
+        if not self.count:
+            return self._nan(factors, 2)
+        return np.stack([self._min * factors, self._max * factors], axis=1)
+
+
+class BlockMedian(Reducer):
+    """
+    The median of the medians of consecutive blocks of `block_size` frames.
+    Frames of an incomplete last block are ignored, unless there is no
+    complete block at all. One median per block is stored.
+
+    Parameters
+    ----------
+    block_size : int, optional
+        The number of frames per block.
+    """
+
+    def __init__(self, block_size=100):
+        super().__init__()
+        self.block_size = block_size
+
+    def reset(self):
+        super().reset()
+        self._block = None
+        self._filled = 0
+        self._medians = []
+
+    def update(self, frames):
+        super().update(frames)
+        if self._block is None:
+            self._block = np.empty((self.block_size, frames.shape[1]),
+                                   frames.dtype)
+        while len(frames):
+            n = min(len(frames), self.block_size - self._filled)
+            self._block[self._filled:self._filled + n] = frames[:n]
+            self._filled += n
+            frames = frames[n:]
+            if self._filled == self.block_size:
+                self._medians.append(np.median(self._block, 0))
+                self._filled = 0
+
+    def result(self, factors):
+        if not self.count:
+            return self._nan(factors)
+        if self._medians:
+            medians = np.array(self._medians)
+        else:
+            medians = np.median(self._block[:self._filled], 0, keepdims=True)
+        return np.median(medians, 0) * factors
@@ -0,0 +1,995 @@
+"""
+This module provides local stand-ins for the devices of the setup, so that
+the interfaces can be benchmarked and tested without the hardware.
+
+Class listing
+-------------
+ControllerSimulator :
+    Simulates the control and the data port of the capaNCDT DT6200
+    controller.
+GrblSimulator :
+    Simulates grbl 1.1 on a pseudo-terminal.
+
+Notes
+-----
+The simulators run their servers in background threads and are meant to be
+used as context managers. The addresses to connect to are available as
+attributes once the simulator is started. `GrblSimulator` needs a POSIX
+system with pseudo-terminals (e.g. Linux).
+
+Example
+-------
+  >>> with ControllerSimulator(channels=2, sampling_time=0.064) as sim:
+  >>>     controller = Controller(['2011', '2012'], sim.host,
+  >>>                             sim.control_port, sim.data_port)
+  >>>     with controller:
+  >>>         data = controller.acquire(1000, mode='continuous')
+"""
+
+import os
+import re
+import math
+import time
+import socket
+import struct
+import random
+import select
+import logging
+import threading
+import collections
+import socketserver
+import numpy as np
+from .table import MotionModel
+from .helper import BraceMessage as __
+
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct('<4siiqihhi')
+
+
+def make_package(frame_counter, frames, item=0, serial_nr=0):
+    """
+    Builds a data package of the controller.
+
+    Parameters
+    ----------
+    frame_counter : int
+        The frame counter of the first frame.
+    frames : array
+        The frames as an integer array of shape (frames, channels).
+    item, serial_nr : int, optional
+        The item and serial number in the header.
+
+    Returns
+    -------
+    package : bytes
+    """
+    nr_of_frames, nr_of_channels = frames.shape
+    channel_field = sum(1 << (16 * channel) for channel in range(nr_of_channels))
+    header = HEADER.pack(b'MEAS', item, serial_nr, channel_field, 0,
+                         4 * nr_of_channels, nr_of_frames,
+                         (frame_counter + 0x80000000) % 0x100000000 - 0x80000000)
+    return header + frames.astype('<i4').tobytes()
+
+
+class _ControlHandler(socketserver.StreamRequestHandler):
+    """Answers the commands sent to the telnet port."""
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        simulator = self.server.simulator
+        while not simulator.stopped.is_set():
+            try:
+                line = self.rfile.readline()
+            except OSError:
+                break
+            if not line:
+                break
+            line = line.decode('ascii').strip()
+            if not line:
+                continue
+            response = simulator.answer(line)
+            try:
+                self.wfile.write((response + "\r\n").encode('ascii'))
+            except OSError:
+                break
+
+
+class _DataHandler(socketserver.BaseRequestHandler):
+    """Sends data packages on the data port."""
+
+    def handle(self):
+        simulator = self.server.simulator
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client = simulator.add_client()
+        try:
+            while not simulator.stopped.is_set():
+                package = client.get()
+                if package is None:
+                    break
+                self.request.sendall(package)
+        except OSError:
+            pass
+        finally:
+            simulator.remove_client(client)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _Client():
+    """The package queue of a connection to the data port."""
+
+    def __init__(self):
+        self.packages = []
+        self.condition = threading.Condition()
+        self.closed = False
+
+    def put(self, package):
+        with self.condition:
+            self.packages.append(package)
+            self.condition.notify()
+
+    def get(self):
+        with self.condition:
+            self.condition.wait_for(lambda: self.packages or self.closed)
+            if self.closed:
+                return None
+            package = b''.join(self.packages)
+            self.packages.clear()
+            return package
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+
+class ControllerSimulator():
+    """
+    Simulates the capaNCDT DT6200 controller on the local host.
+
+    The control port understands the commands $STI, $TRG, $GMD, $GDP and $VER.
+    The data port sends correctly formatted data packages: In trigger mode
+    'continuous' at the configured sampling time, in all other modes one frame
+    per $GMD command or call of ``trigger``.
+
+    Parameters
+    ----------
+    channels : int, optional
+        The number of channels.
+    sampling_time : float, optional
+        The initial sampling time in ms.
+    host : str, optional
+        The address the servers are bound to.
+    control_port, data_port : int, optional
+        The ports of the servers. Defaults to 0 (chosen by the OS).
+    package_interval : float, optional
+        The time in seconds between two data packages in continuous mode.
+    gap_probability : float, optional
+        The probability that a data package is dropped (the frame counter
+        is incremented anyway).
+    jitter : float, optional
+        The maximal random delay in seconds of each data package.
+    seed : int, optional
+        The seed of the random generators.
+
+    Attributes
+    ----------
+    sent_frames, dropped_frames : int
+        The number of frames sent / dropped by the gap injector.
+    """
+    trigger_modes = ('continuous', 'rising_edge', 'high_level', 'gate_rising_edge')
+
+    def __init__(self, channels=4, sampling_time=0.256, host='127.0.0.1',
+                 control_port=0, data_port=0, package_interval=0.001,
+                 gap_probability=0, jitter=0, seed=None):
+        self.channels = channels
+        self.sampling_time = sampling_time
+        self.host = host
+        self.control_port = control_port
+        self.data_port = data_port
+        self.package_interval = package_interval
+        self.gap_probability = gap_probability
+        self.jitter = jitter
+        self.trigger_mode = 'continuous'
+        self.frame_counter = 0
+        self.sent_frames = 0
+        self.dropped_frames = 0
+        self.stopped = threading.Event()
+        self._random = random.Random(seed)
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._clients = []
+        self._servers = []
+        self._threads = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """Starts the servers and the data generator."""
+        self.stopped.clear()
+        control_server = _Server((self.host, self.control_port), _ControlHandler)
+        data_server = _Server((self.host, self.data_port), _DataHandler)
+        self.control_port = control_server.server_address[1]
+        self.data_port = data_server.server_address[1]
+        for server in (control_server, data_server):
+            server.simulator = self
+            self._servers.append(server)
+            self._threads.append(threading.Thread(
+                target=server.serve_forever, kwargs={'poll_interval': 0.05},
+                name="ControllerSimulator.server", daemon=True))
+        self._threads.append(threading.Thread(
+            target=self._generate, name="ControllerSimulator.generator",
+            daemon=True))
+        for thread in self._threads:
+            thread.start()
+        logger.debug(__("Controller simulator listening on {}, ports {} / {}.",
+                        self.host, self.control_port, self.data_port))
+
+    def stop(self):
+        """Stops the servers and the data generator."""
+        self.stopped.set()
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        with self._lock:
+            for client in self._clients:
+                client.close()
+        for thread in self._threads:
+            thread.join()
+        self._servers.clear()
+        self._threads.clear()
+
+    def add_client(self):
+        """Registers a new connection to the data port."""
+        client = _Client()
+        with self._lock:
+            self._clients.append(client)
+        return client
+
+    def remove_client(self, client):
+        """Unregisters a connection to the data port."""
+        with self._lock:
+            self._clients.remove(client)
+
+    def answer(self, line):
+        """Returns the response of the controller to the command `line`."""
+        if not line.startswith('$'):
+            return "$UNKNOWN COMMAND"
+        cmd = line[1:]
+        if cmd.startswith('STI'):
+            try:
+                sampling_time = int(cmd[3:])
+            except ValueError:
+                return "$WRONG PARAMETER"
+            if sampling_time <= 0:
+                return "$WRONG PARAMETER"
+            self.sampling_time = sampling_time / 1000
+            return "${},{}OK".format(cmd, sampling_time)
+        if cmd.startswith('TRG'):
+            try:
+                self.trigger_mode = self.trigger_modes[int(cmd[3:])]
+            except (ValueError, IndexError):
+                return "$WRONG PARAMETER"
+            return "${}OK".format(cmd)
+        if cmd == 'GMD':
+            self.trigger()
+            return "$GMDOK"
+        if cmd == 'GDP':
+            return "$GDP,{}OK".format(self.data_port)
+        if cmd == 'VER':
+            return "$VER,DT6220 simulator 1.0OK"
+        return "$UNKNOWN COMMAND"
+
+    def trigger(self, frames=1):
+        """Sends `frames` frames immediately (trigger input / $GMD)."""
+        self._send(frames)
+
+    def _frames(self, n):
+        """Returns `n` frames of a noisy sine on every channel."""
+        counter = self.frame_counter + np.arange(n)
+        t = counter * self.sampling_time / 1000
+        signal = 0x7fffff + 0x100000 * np.sin(2 * np.pi * t)
+        noise = self._rng.normal(0, 0x1000, (n, self.channels))
+        return (signal[:, None] + noise).astype(np.int32)
+
+    def _send(self, n):
+        """Sends a package of `n` frames to all clients."""
+        with self._lock:
+            if self._random.random() < self.gap_probability:
+                self.dropped_frames += n
+                package = None
+            else:
+                self.sent_frames += n
+                package = make_package(self.frame_counter, self._frames(n))
+            self.frame_counter += n
+            if package is not None:
+                for client in self._clients:
+                    client.put(package)
+
+    def _generate(self):
+        """The data generator thread for trigger mode 'continuous'."""
+        last = time.perf_counter()
+        due = 0.
+        while not self.stopped.is_set():
+            delay = self.package_interval
+            if self.jitter:
+                delay += self._random.uniform(0, self.jitter)
+            time.sleep(delay)
+            now = time.perf_counter()
+            due += (now - last) * 1000 / self.sampling_time
+            last = now
+            if self.trigger_mode != 'continuous' or not self._clients:
+                due = 0.
+                continue
+            n = min(int(due), 0x7fff)
+            if n > 0:
+                self._send(n)
+                due -= n
+
+
+class _Block():
+    """
+    A block of the simulated grbl planner: a linear or arc move, or a dwell,
+    executed from `start` to `end` (`time.perf_counter` values).
+    """
+
+    def __init__(self, start, duration, origin, target, distance=0.,
+                 speed=math.inf, acceleration=math.inf, arc=None):
+        self.start = start
+        self.end = start + duration
+        self.origin = origin
+        self.target = target
+        self.distance = distance
+        self.speed = speed
+        self.acceleration = acceleration
+        self.arc = arc
+
+    def shift(self, delta):
+        """Delays the block by `delta` seconds (feed hold)."""
+        self.start += delta
+        self.end += delta
+
+    def _travelled(self, fraction):
+        """Returns the distance travelled after `fraction` of the duration."""
+        d, v, a = self.distance, self.speed, self.acceleration
+        total = MotionModel.profile(d, v, a)
+        t = fraction * total
+        ramp = v / a if d >= v ** 2 / a else total / 2
+        if t < ramp:
+            return 0.5 * a * t ** 2
+        if t > total - ramp:
+            return d - 0.5 * a * (total - t) ** 2
+        return 0.5 * a * ramp ** 2 + v * (t - ramp)
+
+    def position(self, now):
+        """Returns the position at time `now`."""
+        if now <= self.start or not self.distance:
+            return self.origin if now < self.end else self.target
+        if now >= self.end:
+            return self.target
+        s = self._travelled((now - self.start) / (self.end - self.start))
+        fraction = s / self.distance
+        z = self.origin[2] + fraction * (self.target[2] - self.origin[2])
+        if self.arc is None:
+            return tuple(o + fraction * (t - o) for o, t
+                         in zip(self.origin[:2], self.target[:2])) + (z,)
+        (cx, cy), radius, angle, travel = self.arc
+        angle += fraction * travel
+        return (cx + radius * math.cos(angle), cy + radius * math.sin(angle), z)
+
+
+class GrblSimulator():
+    """
+    Simulates grbl 1.1 (with the modified soft-reset 'r' of the setup) on a
+    pseudo-terminal, as a stand-in for the Arduino of the table.
+
+    Supported are the welcome banner, the realtime commands ``?``, ``!``,
+    ``~`` and ``r`` (or ctrl-x), the system commands ``$``, ``$$``, ``$n=x``,
+    ``$#`` (all offsets zero), ``$I``, ``$N``, ``$G``, ``$X``, ``$H`` and
+    ``$C``, and the G-code blocks G0, G1, G2, G3 (with R), G4, G17, G21, G54,
+    G90, G91, G94, M3, M5, M8 and M9 with the words X, Y, Z, F, R, P, S and N.
+    Moves are executed with the trapezoidal velocity profile of
+    `table.MotionModel` and the settings $100-$132. The planner holds `planner_blocks` blocks and the receive
+    buffer `rx_buffer_size` bytes; an ``ok`` is sent when a block enters the
+    planner. Errors and alarms are reported with the grbl codes, e.g. error:22
+    for a missing feed rate, error:9 in the alarm state, ALARM:2 for a move
+    beyond the travel with soft limits ($20) and ALARM:3 for a reset during
+    a move.
+
+    Parameters
+    ----------
+    settings : dict, optional
+        Settings overriding `defaults`, e.g. {110: 500.0}.
+    locked : bool, optional
+        If True and homing is enabled ($22), grbl starts in the alarm state
+        and needs ``$H`` or ``$X``, like after power-up. Defaults to True.
+    time_scale : float, optional
+        The factor applied to the duration of all moves and dwells.
+    baud_rate : int or None, optional
+        The simulated baud rate of the responses, None sends them without
+        delay.
+    planner_blocks, rx_buffer_size : int, optional
+        The sizes of the planner and the serial receive buffer of grbl.
+
+    Attributes
+    ----------
+    port : str
+        The path of the pseudo-terminal to connect to, e.g. '/dev/pts/3'.
+    lines, status_requests, overflows : int
+        The number of received lines, status requests and bytes dropped
+        because the receive buffer was full.
+    coolant : bool
+        The state of the coolant output (M8 / M9).
+    on_coolant : callable or None
+        Called with the new state of the coolant output when it changes.
+        Called with the lock of the simulator held, so it must not call
+        back into the simulator.
+
+    Example
+    -------
+      >>> with GrblSimulator() as grbl:
+      >>>     table = Table(grbl.port)
+      >>>     with table:
+      >>>         table.home()
+      >>>         table.move(3, 4)
+    """
+    version = '1.1f'
+    build_info = 'VER:1.1f.20170801:'
+    defaults = {0: 10, 1: 25, 2: 0, 3: 0, 4: 0, 5: 0, 6: 0, 10: 1,
+                11: 0.010, 12: 0.002, 13: 0, 20: 0, 21: 0, 22: 1, 23: 0,
+                24: 25.0, 25: 500.0, 26: 250, 27: 1.0, 30: 1000, 31: 0, 32: 0,
+                100: 1600.0, 101: 1600.0, 102: 1600.0,
+                110: 350.0, 111: 350.0, 112: 350.0,
+                120: 8.0, 121: 8.0, 122: 8.0,
+                130: 50.0, 131: 50.0, 132: 50.0}
+    word = re.compile(r"([A-Z])([-+]?(?:\d+\.?\d*|\.\d+))")
+    line_buffer_size = 80
+
+    def __init__(self, settings=None, locked=True, time_scale=1.,
+                 baud_rate=115200, planner_blocks=15, rx_buffer_size=128):
+        self.settings = dict(self.defaults)
+        self.settings.update(settings or {})
+        self.locked = locked
+        self.time_scale = time_scale
+        self.baud_rate = baud_rate
+        self.planner_blocks = planner_blocks
+        self.rx_buffer_size = rx_buffer_size
+        self.port = None
+        self.lines = 0
+        self.status_requests = 0
+        self.overflows = 0
+        self.coolant = False
+        self.on_coolant = None
+        self.stopped = threading.Event()
+        self._condition = threading.Condition()
+        self._master = self._slave = None
+        self._threads = []
+        self._initialize()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """Opens the pseudo-terminal and starts grbl."""
+        import tty
+        self.stopped.clear()
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._threads = [
+            threading.Thread(target=self._read, name="GrblSimulator.reader",
+                             daemon=True),
+            threading.Thread(target=self._execute_lines,
+                             name="GrblSimulator.executor", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        with self._condition:
+            self._alarm = self._alarm or (self.locked and self.settings[22])
+            self._banner()
+        logger.debug(__("grbl simulator listening on {}.", self.port))
+
+    def stop(self):
+        """Stops grbl and closes the pseudo-terminal."""
+        self.stopped.set()
+        with self._condition:
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+        os.close(self._master)
+        os.close(self._slave)
+
+    @property
+    def position(self):
+        """The current machine position."""
+        with self._condition:
+            return self._position(self._now())
+
+    @property
+    def state(self):
+        """The current machine state as in the status report."""
+        with self._condition:
+            return self._state(self._now())
+
+    def _initialize(self):
+        """Sets the state after power-up."""
+        self._blocks = collections.deque()
+        self._machine_position = (0., 0., 0.)
+        self._lines = collections.deque()
+        self._partial = bytearray()
+        self._rx_bytes = 0
+        self._alarm = False
+        self._reset_required = False
+        self._homing = False
+        self._check = False
+        self._hold = None
+        self._generation = 0
+        self._reset_modal()
+
+    def _reset_modal(self):
+        """Resets the modal state of the G-code parser."""
+        self._motion = 0
+        self._relative = False
+        self._feed = None
+        self._parser_position = None
+
+    @property
+    def _model(self):
+        settings = self.settings
+        return MotionModel(*[tuple(settings[n + axis] for axis in range(3))
+                             for n in (100, 110, 120)])
+
+    def _now(self):
+        return self._hold if self._hold is not None else time.perf_counter()
+
+    def _prune(self, now):
+        """Removes the finished blocks from the planner."""
+        while self._blocks and self._blocks[0].end <= now:
+            self._machine_position = self._blocks.popleft().target
+
+    def _pending(self):
+        """Returns the number of blocks in the planner."""
+        self._prune(self._now())
+        return len(self._blocks)
+
+    def _position(self, now):
+        self._prune(now)
+        if self._blocks:
+            return self._blocks[0].position(now)
+        return self._machine_position
+
+    def _state(self, now):
+        self._prune(now)
+        if self._alarm:
+            return 'Alarm'
+        if self._homing:
+            return 'Home'
+        if self._check:
+            return 'Check'
+        if self._hold is not None:
+            return 'Hold:0'
+        return 'Run' if self._blocks else 'Idle'
+
+    def _write(self, *lines):
+        """Sends `lines` to the host (lock held)."""
+        data = "".join(line + "\r\n" for line in lines).encode('ascii')
+        if self.baud_rate:
+            time.sleep(10 * len(data) / self.baud_rate)
+        try:
+            os.write(self._master, data)
+        except OSError as error:
+            logger.debug(__("grbl simulator could not write: {}", error))
+
+    def _banner(self):
+        self._write("", "Grbl {} ['$' for help]".format(self.version))
+        if self._alarm:
+            self._write("[MSG:'$H'|'$X' to unlock]")
+
+    def _read(self):
+        """The thread receiving the data of the host."""
+        while not self.stopped.is_set():
+            ready, _, _ = select.select([self._master], [], [], 0.05)
+            if not ready:
+                continue
+            try:
+                data = os.read(self._master, 1024)
+            except OSError:
+                break
+            with self._condition:
+                overflows = self.overflows
+                for byte in data:
+                    self._receive(byte)
+                if self.overflows > overflows:
+                    logger.warning(__("grbl simulator: receive buffer overflow, "
+                                      "{} bytes dropped.",
+                                      self.overflows - overflows))
+
+    def _receive(self, byte):
+        """Handles a received byte (lock held)."""
+        char = chr(byte)
+        if char == '?':
+            self.status_requests += 1
+            self._write(self._status_report())
+        elif char == '!':
+            if self._hold is None and self._state(self._now()) == 'Run':
+                self._hold = time.perf_counter()
+        elif char == '~':
+            if self._hold is not None:
+                delay = time.perf_counter() - self._hold
+                for block in self._blocks:
+                    block.shift(delay)
+                self._hold = None
+                self._condition.notify_all()
+        elif char in 'r\x18':
+            self._soft_reset()
+        elif self._rx_bytes >= self.rx_buffer_size - 1:
+            self.overflows += 1
+        else:
+            self._rx_bytes += 1
+            if char in '\r\n':
+                self._lines.append((self._partial.decode('ascii', 'replace'),
+                                    len(self._partial) + 1))
+                self._partial = bytearray()
+                self._condition.notify_all()
+            else:
+                self._partial.append(byte)
+
+    def _status_report(self):
+        now = self._now()
+        state = self._state(now)
+        position = self._position(now)
+        coordinates = 'MPos' if self.settings[10] & 1 else 'WPos'
+        report = "<{}|{}:{}".format(state, coordinates, ",".join(
+            "{:.3f}".format(p) for p in position))
+        if self.settings[10] & 2:
+            report += "|Bf:{},{}".format(
+                self.planner_blocks - len(self._blocks),
+                self.rx_buffer_size - 1 - self._rx_bytes)
+        feed = self._feed if state == 'Run' and self._feed else 0
+        return report + "|FS:{:g},0>".format(feed)
+
+    def _soft_reset(self):
+        """Executes a soft-reset (lock held)."""
+        now = self._now()
+        alarm = 6 if self._homing else 3 if self._state(now) == 'Run' else None
+        self._machine_position = self._position(now)
+        self._blocks.clear()
+        self._lines.clear()
+        self._partial = bytearray()
+        self._rx_bytes = 0
+        self._hold = None
+        self._homing = False
+        self._check = False
+        self._reset_required = False
+        self._reset_modal()
+        self._set_coolant(False)
+        self._generation += 1
+        self._condition.notify_all()
+        if alarm is not None:
+            self._alarm = True
+            self._write("ALARM:{}".format(alarm))
+        self._banner()
+
+    def _set_coolant(self, state):
+        if state != self.coolant:
+            self.coolant = state
+            if self.on_coolant is not None:
+                self.on_coolant(state)
+
+    def _wait(self, generation, predicate):
+        """
+        Waits (lock held) until `predicate` returns True. Returns False if
+        grbl is reset or stopped in the meantime.
+        """
+        while not predicate():
+            if self._generation != generation or self.stopped.is_set():
+                return False
+            timeout = 0.05
+            if self._blocks and self._hold is None:
+                timeout = min(timeout, max(0, self._blocks[0].end - self._now()))
+            self._condition.wait(timeout)
+        return self._generation == generation and not self.stopped.is_set()
+
+    def _synchronize(self, generation):
+        """Waits until the planner is empty."""
+        return self._wait(generation, lambda: not self._pending())
+
+    def _execute_lines(self):
+        """The thread executing the received lines."""
+        with self._condition:
+            while not self.stopped.is_set():
+                if not self._lines:
+                    self._condition.wait(0.05)
+                    continue
+                line, size = self._lines.popleft()
+                self._rx_bytes -= size
+                self.lines += 1
+                generation = self._generation
+                response = self._execute(line, generation)
+                if response is not None and self._generation == generation:
+                    self._write(*response)
+
+    def _execute(self, line, generation):
+        """
+        Executes a line and returns the response lines, or None if it was
+        aborted by a reset.
+        """
+        line = line.strip()
+        if len(line) > self.line_buffer_size:
+            return ["error:11"]
+        if line.startswith('$'):
+            return self._system_command(line[1:], generation)
+        line = re.sub(r"\(.*?\)|;.*$|\s", "", line).upper()
+        if not line:
+            return ["ok"]
+        if self._alarm or self._homing:
+            return ["error:9"]
+        try:
+            words = self._parse(line)
+        except ValueError as error:
+            return ["error:{}".format(error)]
+        error = self._gcode(words, generation)
+        if error is None:
+            return None
+        return ["ok"] if not error else ["error:{}".format(error)]
+
+    def _parse(self, line):
+        """
+        Returns the words of the G-code block `line` as a dict (G and M as
+        lists of ints).
+
+        Raises
+        ------
+        ValueError :
+            With the grbl error code as argument.
+        """
+        words = {'G': [], 'M': []}
+        position = 0
+        while position < len(line):
+            match = self.word.match(line, position)
+            if match is None:
+                raise ValueError(2 if line[position].isalpha() else 1)
+            letter, value = match.groups()
+            position = match.end()
+            if letter in 'GM':
+                if float(value) != int(float(value)):
+                    raise ValueError(20)
+                words[letter].append(int(float(value)))
+            elif letter in 'XYZFRPSN':
+                if letter in words:
+                    raise ValueError(25)
+                words[letter] = float(value)
+            else:
+                raise ValueError(20)
+        return words
+
+    def _gcode(self, words, generation):
+        """
+        Executes the G-code block `words`. Returns 0 on success, the error
+        code, or None if aborted by a reset or an alarm.
+        """
+        motions = [g for g in words['G'] if g in (0, 1, 2, 3)]
+        if len(motions) > 1:
+            return 21
+        if any(g not in (0, 1, 2, 3, 4, 17, 21, 54, 90, 91, 94)
+               for g in words['G']):
+            return 20
+        if any(m not in (3, 5, 8, 9) for m in words['M']):
+            return 20
+        if 4 in words['G'] and 'P' not in words:
+            return 28
+        if 'F' in words:
+            if words['F'] <= 0:
+                return 4
+            self._feed = words['F']
+        if 90 in words['G']:
+            self._relative = False
+        if 91 in words['G']:
+            self._relative = True
+        if motions:
+            self._motion = motions[0]
+        if 8 in words['M'] or 9 in words['M']:
+            if not self._check and not self._synchronize(generation):
+                return None
+            self._set_coolant(8 in words['M'])
+        if 4 in words['G'] and not self._check:
+            if not self._synchronize(generation):
+                return None
+            self._plan(_Block(time.perf_counter(),
+                              words['P'] * self.time_scale,
+                              self._machine_position,
+                              self._machine_position))
+            if not self._synchronize(generation):
+                return None
+        axes = [words.get(axis) for axis in 'XYZ']
+        if all(value is None for value in axes):
+            return 26 if motions and motions[0] in (2, 3) else 0
+        if self._parser_position is None:
+            self._parser_position = self._position(self._now())
+        origin = self._parser_position
+        target = tuple(
+            o if value is None else o + value if self._relative else value
+            for o, value in zip(origin, axes))
+        target = self._model.quantize(target)
+        if self._motion and self._feed is None:
+            return 22
+        arc = None
+        if self._motion in (2, 3):
+            if 'R' not in words:
+                return 35
+            arc = self._arc(origin, target, words['R'], self._motion == 2)
+            if arc is None:
+                return 33
+        if self.settings[20] and any(
+                not 0 <= position <= self.settings[130 + axis]
+                for axis, position in enumerate(target)):
+            self._alarm = True
+            self._reset_required = True
+            self._write("ALARM:2", "[MSG:Reset to continue]")
+            return None
+        self._parser_position = target
+        if self._check:
+            return 0
+        return 0 if self._move(origin, target, arc, generation) else None
+
+    def _arc(self, origin, target, r, clockwise):
+        """
+        Returns the center, radius, start angle and angular travel of an
+        arc in the xy-plane, or None if the radius is invalid.
+        """
+        x, y = target[0] - origin[0], target[1] - origin[1]
+        h = 4 * r ** 2 - x ** 2 - y ** 2
+        if h < 0 or not (x or y):
+            return None
+        h = -math.sqrt(h) / math.hypot(x, y)
+        if not clockwise:
+            h = -h
+        if r < 0:
+            h, r = -h, -r
+        i, j = 0.5 * (x - y * h), 0.5 * (y + x * h)
+        center = (origin[0] + i, origin[1] + j)
+        start = math.atan2(-j, -i)
+        travel = math.atan2(y - j, x - i) - start
+        if clockwise and travel >= 0:
+            travel -= 2 * math.pi
+        elif not clockwise and travel <= 0:
+            travel += 2 * math.pi
+        return center, r, start, travel
+
+    def _move(self, origin, target, arc, generation, feed=None):
+        """Plans a move, waiting for a free block in the planner."""
+        model = self._model
+        if arc is None:
+            delta = [t - o for o, t in zip(origin, target)]
+            distance = math.hypot(*delta)
+            if not distance:
+                return True
+            speed, acceleration = model.limits([d / distance for d in delta])
+            if feed is None:
+                feed = self._feed if self._motion else math.inf
+            speed = min(speed, feed / 60)
+        else:
+            distance = abs(arc[1] * arc[3])
+            speed = min(min(model.max_rate) / 60, self._feed / 60)
+            acceleration = min(model.acceleration)
+        if not self._wait(generation,
+                          lambda: self._pending() < self.planner_blocks):
+            return False
+        duration = MotionModel.profile(distance, speed, acceleration)
+        self._plan(_Block(time.perf_counter(), duration * self.time_scale,
+                          origin, target, distance, speed, acceleration, arc))
+        return True
+
+    def _plan(self, block):
+        """Appends `block` to the planner, after the last planned block."""
+        now = self._now()
+        self._prune(now)
+        if self._blocks:
+            block.shift(self._blocks[-1].end - block.start)
+        elif self._hold is not None:
+            block.shift(now - block.start)
+        self._blocks.append(block)
+        self._condition.notify_all()
+
+    def _home(self, generation):
+        """Executes the homing cycle: a move to the origin at the seek rate."""
+        if not self._synchronize(generation):
+            return False
+        self._homing = True
+        origin = self._machine_position
+        if not self._move(origin, (0., 0., 0.), None, generation,
+                          feed=self.settings[25]) \
+                or not self._synchronize(generation):
+            return False
+        self._homing = False
+        self._alarm = False
+        self._machine_position = (0., 0., 0.)
+        self._parser_position = None
+        return True
+
+    def _system_command(self, command, generation):
+        """Executes the system command '$`command`'."""
+        state = self._state(self._now())
+        busy = state in ('Run', 'Hold:0', 'Home')
+        if command == '':
+            return ["[HLP:$$ $# $G $I $N $x=val $Nx=line $J=line $SLP $C $X "
+                    "$H ~ ! ? ctrl-x]", "ok"]
+        if command in ('$', '#', 'I', 'N') or '=' in command or command == 'H':
+            if busy:
+                return ["error:8"]
+        if command == '$':
+            return ["${}={}".format(n, self._format_setting(n))
+                    for n in sorted(self.settings)] + ["ok"]
+        if command == 'I':
+            return ["[{}]".format(self.build_info),
+                    "[OPT:V,{},{}]".format(self.planner_blocks,
+                                           self.rx_buffer_size), "ok"]
+        if command == 'N':
+            return ["$N0=", "$N1=", "ok"]
+        if command == '#':
+            zero = "0.000,0.000,0.000"
+            return (["[G{}:{}]".format(n, zero) for n in range(54, 60)] +
+                    ["[G28:{}]".format(zero), "[G30:{}]".format(zero),
+                     "[G92:{}]".format(zero), "[TLO:0.000]",
+                     "[PRB:{}:0]".format(zero), "ok"])
+        if command == 'G':
+            return ["[GC:G{} G54 G17 G21 G{} G94 M5 M{} T0 F{:g} S0]".format(
+                self._motion, 91 if self._relative else 90,
+                8 if self.coolant else 9, self._feed or 0), "ok"]
+        if command == 'X':
+            if self._reset_required:
+                return ["error:9"]
+            if self._alarm:
+                self._alarm = False
+                return ["[MSG:Caution: Unlocked]", "ok"]
+            return ["ok"]
+        if command == 'H':
+            if not self.settings[22]:
+                return ["error:5"]
+            if self._reset_required or self._check:
+                return ["error:9"]
+            return ["ok"] if self._home(generation) else None
+        if command == 'C':
+            if busy or self._alarm:
+                return ["error:8"]
+            if self._check:
+                self._write("[MSG:Disabled]", "ok")
+                self._soft_reset()
+                return None
+            self._check = True
+            return ["[MSG:Enabled]", "ok"]
+        match = re.match(r"(\d+)=(.*)$", command)
+        if match is None:
+            return ["error:3"]
+        n, value = int(match.group(1)), match.group(2)
+        if n not in self.settings:
+            return ["error:3"]
+        try:
+            value = float(value)
+        except ValueError:
+            return ["error:2"]
+        if value < 0:
+            return ["error:4"]
+        self.settings[n] = value if isinstance(self.defaults[n], float) \
+            else int(value)
+        return ["ok"]
+
+    def _format_setting(self, n):
+        value = self.settings[n]
+        if isinstance(self.defaults[n], float):
+            return "{:.3f}".format(value)
+        return "{:d}".format(int(value))
@@ -15,8 +15,17 @@ GrblError :
 GrblAlarm :
     An exception class mapping the grbl alarm codes to the corresponding error
     messages.
+Ok, Error, Alarm, Welcome, Setting, StartupLine, Message, StartupExecution,
+Status, Empty :
+    The typed records of the messages received from grbl.
 SerialConnection :
     An interface to the serial port of the Arduino running grbl.
+MotionModel :
+    Predicts the duration of moves from the grbl settings.
+StatusMonitor :
+    Polls the status of grbl in a background thread.
+SettingsCache :
+    Stores the grbl settings on disk.
 Table :
     Main interface for the control of the table.
 
@@ -87,18 +96,23 @@ $132=0.000
 
 import os
 import time
-import csv
 import re
+import json
+import math
 import logging
+import queue
+import threading
+import collections
 from contextlib import contextmanager
-import serial
-from .helper import query_yes_no, query_options
-from .base import IOBase, Device, on_connection
+from .helper import query_yes_no, query_options, LazyModule
+from .base import IOBase, Device, on_connection, wire_trace
 from .helper import BraceMessage as __
 
 
 logger = logging.getLogger(__name__)
 
+serial = LazyModule('serial')
+
 
 class TableError(Exception):
     """Simple exception class used for all errors in this module."""
@@ -124,6 +138,27 @@ class NotOnGridError(TableError):
     """Raised if scanning grid is not in accord with motor step size."""
 
 
+class _CodeTable():
+    """
+    Class attribute mapping grbl codes to messages, which is read from a file
+    in `error_codes` on first access.
+    """
+    error_dirname = os.path.join(os.path.dirname(__file__), 'error_codes')
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.table = None
+
+    def __get__(self, instance, owner):
+        if self.table is None:
+            import csv
+            path = os.path.join(self.error_dirname, self.filename)
+            with open(path, newline='') as file:
+                reader = csv.reader(file)
+                self.table = {int(row[0]): row[2] for row in reader}
+        return self.table
+
+
 class GrblError(TableError):
     """Mapping from grbl error codes to the corresponding error messages."""
 
@@ -131,10 +166,7 @@ class GrblError(TableError):
         self.i = int(i)
         super().__init__("Error {}: {}".format(i, self.error_message[self.i]))
 
-    error_dirname = os.path.join(os.path.dirname(__file__), 'error_codes')
-    with open(os.path.join(error_dirname, 'errors.csv'), newline='') as file:
-        reader = csv.reader(file)
-        error_message = {int(row[0]): row[2] for row in reader}
+    error_message = _CodeTable('errors.csv')
 
 
 class GrblAlarm(TableError):
@@ -144,10 +176,48 @@ class GrblAlarm(TableError):
         self.i = int(i)
         super().__init__("ALARM {}: {}".format(i, self.alarm_message[self.i]))
 
-    error_dirname = os.path.join(os.path.dirname(__file__), 'error_codes')
-    with open(os.path.join(error_dirname, 'alarms.csv'), newline='') as file:
-        reader = csv.reader(file)
-        alarm_message = {int(row[0]): row[2] for row in reader}
+    alarm_message = _CodeTable('alarms.csv')
+
+
+def _message(name, key, fields):
+    """Returns a record class for the grbl messages of type `key`."""
+    cls = collections.namedtuple(name, fields)
+    cls.key = key
+    cls.__repr__ = lambda self: "{}({})".format(name, ", ".join(
+        "{}={!r}".format(field, value) for field, value in zip(cls._fields, self)))
+    return cls
+
+
+Ok = _message('Ok', 'ok', '')
+Error = _message('Error', 'error', 'code')
+Alarm = _message('Alarm', 'alarm', 'code')
+Welcome = _message('Welcome', 'welcome_message', 'version')
+Setting = _message('Setting', 'setting', 'number value')
+StartupLine = _message('StartupLine', 'startup_lines', 'number line')
+Message = _message('Message', 'message', 'text')
+StartupExecution = _message('StartupExecution', 'startup_execution', 'line result')
+Status = _message('Status', 'status',
+                  'state coordinates position buffer feed fields')
+Empty = _message('Empty', 'empty', '')
+Status.__doc__ = """
+A status report of grbl.
+
+Attributes
+----------
+state : str
+    The machine state, e.g. 'Idle', 'Run' or 'Hold:0'.
+coordinates : str {'MPos', 'WPos'}
+    The coordinate system of `position`.
+position : tuple of floats
+    The position of all axes.
+buffer : 2-tuple of ints or None
+    The available blocks in the planner buffer and bytes in the receive
+    buffer (field 'Bf').
+feed : float or None
+    The current feed rate (field 'FS' or 'F').
+fields : dict
+    All other fields of the report as strings, e.g. {'WCO': '0,0,0'}.
+"""
 
 
 class SerialConnection(IOBase):
@@ -164,21 +234,24 @@ class SerialConnection(IOBase):
     timeout : int, optional
         The time in seconds that is waited when receiving input via readline()
         or readlines() methods.
+
+    Attributes
+    ----------
+    on_status : callable or None
+        If set, status reports are passed to this function (as the received
+        line) instead of being put into `in_queue`. Used by `StatusMonitor`.
     """
-    regex = {'ok': r"ok",
-             'error': r"error:(\d+)",
-             'welcome_message': r"Grbl (\d+\.\d+[a-z]) \['\$' for help]",
-             'alarm': r"ALARM:(\d)",
-             'setting': r"\$(\d+)=(.+)",
-             'startup_lines': r"\$N(0|1)=(.*)",
-             'message': r"\[([A-Z0-9]{2,3}:.+)\]",
-             'startup_execution': r">(.*):(ok|error:\d+)",
-             'status': r"<([A-Za-z0-9:]{3,5})\|(MPos|WPos):([0-9.,-]+)(|\|.*)>",
-             'empty': r"^$",
+    _transport = 'connection'
+    regex = {'error': re.compile(r"error:(\d+)$"),
+             'alarm': re.compile(r"ALARM:(\d+)$"),
+             'welcome_message': re.compile(r"Grbl (\d+\.\d+[a-z]) \['\$' for help]"),
+             'setting': re.compile(r"\$(\d+)=(.+)$"),
+             'startup_lines': re.compile(r"\$N(0|1)=(.*)$"),
+             'message': re.compile(r"\[([A-Z0-9]{2,3}:.+)\]$"),
+             'startup_execution': re.compile(r">(.*):(ok|error:\d+)$"),
+            'status': re.compile(r"<([^|>]+)((?:\|[A-Za-z]+:[^|>]*)+)>$"),
             }
-    for key, pattern in regex.items():
-        regex[key] = re.compile(pattern)
-
+    rx_buffer_size = 128
 
     def __init__(self, serial_port, baud_rate=115200):
         super().__init__((serial_port, baud_rate))
@@ -189,13 +262,22 @@ class SerialConnection(IOBase):
         self.connection.dtr = None
         self.connection.timeout = self.timeout
         self.connection.timeout = self.timeout
+        self.on_status = None
+        self._rx = bytearray()
+        self._status_expected = False
+        self._streaming = False
+        self._cancel = threading.Event()
 
     def _open(self):
         """
         Opens the serial connection. The serial port cannot be used by another
         application at the same time or strange things will happen.
         """
+        self._reset()
         if not self.threads:
+            # writes of the reactor must not block
+            self.connection.write_timeout = (0 if self.reactor is not None
+                                             else None)
             while True:
                 try:
                     self.connection.open()
@@ -214,38 +296,100 @@ class SerialConnection(IOBase):
         self.connection.close()
         logger.debug(__("Disconnected from {}.", self.address[0]))
 
-    def _send(self, cmd):
+    def _interrupt(self):
+        self.connection.cancel_read()
+
+    def _fileno(self):
+        return self.connection.fileno()
+
+    def _reset(self):
+        self._rx.clear()
+
+    def _pending(self):
+        return b"\n" in self._rx or self.connection.in_waiting > 0
+
+    @staticmethod
+    def _line(cmd):
+        """Returns `cmd` as sent to grbl, terminated unless it is realtime."""
         for seq in "\r\n":
             cmd = cmd.replace(seq, "")
         if cmd not in ['?', 'r', '~', '!']:
             cmd += "\n"
-        logger.debug(__("Sending: {!r}", cmd))
+        return cmd
+
+    def _encode(self, cmd):
+        return self._line(cmd).encode('ascii')
+
+    def _send(self, cmd):
+        data = self._encode(cmd)
+        if wire_trace.enabled():
+            wire_trace.sent(self, data)
         try:
-            self.connection.write(cmd.encode('ascii'))
+            self.connection.write(data)
         except serial.SerialTimeoutException:
-            msg = __("Timeout: Could not write '{}' to serial device.", cmd)
+            msg = __("Timeout: Could not write '{}' to serial device.",
+                     self._line(cmd))
             logger.error(msg)
             raise TableError(msg)
 
+    def _write_ready(self, data):
+        return self.connection.write(data)
+
     def _receive(self):
-        line = self.connection.readline().decode('ascii')
-        if line:
-            logger.debug(__("Received: {!r}", line))
-            line = line.strip("\r\n")
-            return line
+        data = self.connection.readline()
+        if data:
+            if wire_trace.enabled():
+                wire_trace.received(self, data)
+            return self._received_line(data)
         else:
             return None
 
+    def _receive_ready(self):
+        end = self._rx.find(b"\n")
+        if end < 0:
+            data = self.connection.read(self.connection.in_waiting)
+            if not data:
+                return None
+            if wire_trace.enabled():
+                wire_trace.received(self, data)
+            searched = len(self._rx)
+            self._rx += data
+            end = self._rx.find(b"\n", searched)
+            if end < 0:
+                return None
+        data = bytes(self._rx[:end + 1])
+        del self._rx[:end + 1]
+        return self._received_line(data)
+
+    def _received_line(self, data):
+        """
+        Returns the received line `data` as string, or None if it is a status
+        report that is passed to `on_status`.
+        """
+        line = data.decode('ascii').strip("\r\n")
+        if self.on_status is not None and line.startswith("<"):
+            self.on_status(line)
+            return None
+        return line
+
+    def command(self, cmd, get_response=True, timeout=None):
+        self._status_expected = self._line(cmd) == "?"
+        return super().command(cmd, get_response, timeout)
+
     def get_answer(self, timeout=None):
         """
         Overridden base method for the immediate parsing of the incoming
         messages.
 
+        Status reports are only taken as the answer to the command '?'. Other
+        commands skip them, e.g. a report that was requested by a
+        `StatusMonitor` and is received after it was stopped.
+
         Returns
         -------
-        messages : list of tuples
-            all consecutive messages (parsed) until the acknowledging 'ok' from
-            grbl.
+        messages : list of records
+            all consecutive messages (parsed, see `_parse`) until the
+            acknowledging 'ok' from grbl.
 
         Raises
         ------
@@ -260,26 +404,150 @@ class SerialConnection(IOBase):
         """
         messages = []
         while True:
-            line = self._get_item(timeout=timeout)
-            key, value = self._parse(line)
-            messages.append((key, value))
-            logger.debug(__("Parsed message: {} | {}", key, value))
-            if key == 'error':
-                error = GrblError(value[0])
-                logger.error(error)
-                raise GrblError(value[0])
-            if key == 'alarm':
-                error = GrblAlarm(value[0])
-                logger.critical(error)
-                raise error
-            if key in ['ok', 'status']:
+            message = self._parse(self._get_item(timeout=timeout))
+            if message.key == 'status' and not self._status_expected:
+                logger.debug("Skipped status report received after a command.")
+                continue
+            messages.append(message)
+            if self._is_final(message):
                 break
         return messages
 
-    def _parse(self, line):
+    def stream(self, blocks, timeout=60):
+        """
+        Sends G-code blocks with grbl's character-counting protocol.
+
+        Blocks are sent as long as the acknowledged characters fit into the
+        serial receive buffer of grbl (`rx_buffer_size`), without waiting
+        for the response to each block in between. Each 'ok' or 'error'
+        acknowledges the oldest unacknowledged block. This keeps the planner
+        buffer of grbl filled, so consecutive moves are blended instead of
+        decelerating to zero after each block.
+
+        Parameters
+        ----------
+        blocks : sequence of str
+            The G-code blocks to be sent.
+        timeout : float, optional
+            The maximal time in seconds that is waited for the
+            acknowledgement of a block. The acknowledgement is delayed until
+            the block fits into the planner buffer, i.e. while previous moves
+            are executed.
+
+        Returns
+        -------
+        responses : list of lists
+            The parsed messages (see `get_answer`) acknowledging each block.
+            Returns as soon as all blocks are acknowledged, not when the
+            moves are finished.
+
+        Raises
+        ------
+        GrblError :
+            if grbl rejects a block. No further blocks are sent. The index of
+            the block is stored in the attribute `index` of the error.
+        GrblAlarm :
+            if grbl reports an alarm. Its attribute `index` holds the index
+            of the oldest unacknowledged block.
+        TableError :
+            if a block does not fit into the receive buffer, or if the stream
+            is cancelled with `cancel_stream`.
+        """
+        blocks = list(blocks)
+        sizes = [len(self._line(block)) for block in blocks]
+        if any(size >= self.rx_buffer_size - 1 for size in sizes):
+            raise TableError("G-code block exceeds the receive buffer of grbl.")
+        responses = [None] * len(blocks)
+        pending = collections.deque()
+        in_flight = 0
+        messages = []
+        error = None
+        i = 0
+        self._cancel.clear()
+        self._streaming = True
+        try:
+            while pending or (i < len(blocks) and error is None):
+                while (i < len(blocks) and error is None
+                       and in_flight + sizes[i] < self.rx_buffer_size - 1):
+                    self._put(blocks[i])
+                    pending.append(i)
+                    in_flight += sizes[i]
+                    i += 1
+                item = self._get_item(timeout)
+                if self._cancel.is_set():
+                    msg = __("Streaming cancelled after {} of {} blocks.",
+                             i - len(pending), len(blocks))
+                    logger.warning(msg)
+                    raise TableError(msg)
+                message = self._parse(item)
+                if message.key == 'status':
+                    continue
+                messages.append(message)
+                if message.key == 'alarm':
+                    alarm = GrblAlarm(message.code)
+                    alarm.index = pending[0] if pending else None
+                    logger.critical(alarm)
+                    raise alarm
+                if message.key in ('ok', 'error'):
+                    index = pending.popleft()
+                    in_flight -= sizes[index]
+                    responses[index] = messages
+                    messages = []
+                    if message.key == 'error' and error is None:
+                        error = GrblError(message.code)
+                        error.index = index
+                        logger.error(__("{} in block {!r}.", error,
+                                        blocks[index]))
+        finally:
+            self._streaming = False
+        if error is not None:
+            raise error
+        return responses
+
+    def cancel_stream(self):
+        """
+        Makes a running `stream` raise a `TableError` as soon as possible,
+        instead of waiting for the acknowledgement of its pending blocks.
+        """
+        if not self._streaming:
+            return
+        self._cancel.set()
+        try:
+            self.in_queue.put_nowait("")
+        except queue.Full:
+            pass
+
+    @staticmethod
+    def _is_final(message):
+        """
+        Checks a parsed message. Returns True if the message concludes the
+        response to a command.
+
+        Raises
+        ------
+        GrblError :
+            if grbl reports an error
+        GrblAlarm :
+            if grbl reports an alarm.
+        """
+        if message.key == 'error':
+            error = GrblError(message.code)
+            logger.error(error)
+            raise error
+        if message.key == 'alarm':
+            error = GrblAlarm(message.code)
+            logger.critical(error)
+            raise error
+        return message.key in ['ok', 'status']
+
+    @classmethod
+    def _parse(cls, line):
         """
         Parses the received line.
 
+        The type of the message is determined by its first character, so at
+        most one pattern is matched per line.
+
         Parameters
         ----------
         line : str
@@ -287,30 +555,435 @@ class SerialConnection(IOBase):
 
         Returns
         -------
-        message : 2-tuple
-            The pared message. First element of the tuple specifies the type of
-            the message and can be one of the following strings:
+        message : record
+            The parsed message as one of the records `Ok`, `Error`, `Alarm`,
+            `Welcome`, `Setting`, `StartupLine`, `Message`,
+            `StartupExecution`, `Status` or `Empty`. Its type is also given
+            by its attribute `key`, one of the strings:
               'ok', 'error', 'welcome_message', 'alarm', 'setting',
               'startup_lines', 'message', 'startup_execution', 'status', 'empty'
-            The second element of the tuple holds a (possibly empty) list of
-            the according values to the message type.
 
         Raises
         ------
         ConnectionError :
             If the message received from grbl is not understood.
         """
-        message = None
-        for key, pattern in self.regex.items():
-            match = pattern.match(line)
-            if match:
-                groups = match.groups()
-                message = (key, groups)
-                break
-        if message is None:
-            raise ConnectionError(
-                "Unrecognized response from grbl: {}".format(line))
-        return message
+        try:
+            if line == "ok":
+                return cls._ok
+            if not line:
+                return cls._empty
+            first = line[0]
+            if first == "<":
+                return cls._parse_status_report(line)
+            if first == "e":
+                return Error(int(cls.regex['error'].match(line).group(1)))
+            if first == "$":
+                if line.startswith("$N"):
+                    number, text = cls.regex['startup_lines'].match(line).groups()
+                    return StartupLine(int(number), text)
+                number, value = cls.regex['setting'].match(line).groups()
+                try:
+                    value = float(value)
+                except ValueError:
+                    pass
+                return Setting(int(number), value)
+            if first == "[":
+                return Message(cls.regex['message'].match(line).group(1))
+            if first == "A":
+                return Alarm(int(cls.regex['alarm'].match(line).group(1)))
+            if first == "G":
+                return Welcome(cls.regex['welcome_message'].match(line).group(1))
+            if first == ">":
+                return StartupExecution(
+                    *cls.regex['startup_execution'].match(line).groups())
+        except (AttributeError, ValueError):
+            pass
+        raise ConnectionError(
+            "Unrecognized response from grbl: {}".format(line))
+
+    _ok = Ok()
+    _empty = Empty()
+
+    @classmethod
+    def _parse_status_report(cls, line):
+        """
+        Returns the `Status` record of the status report `line`.
+
+        The fields of a report are separated by '|' and may appear in any
+        order, so they are looked up by their key.
+        """
+        state, rest = cls.regex['status'].match(line).groups()
+        fields = dict(field.split(":", 1) for field in rest[1:].split("|"))
+        coordinates = 'MPos' if 'MPos' in fields else 'WPos'
+        if coordinates not in fields:
+            raise ValueError("No position in status report.")
+        position = tuple(map(float, fields.pop(coordinates).split(",")))
+        buffer = fields.pop('Bf', None)
+        if buffer is not None:
+            buffer = tuple(map(int, buffer.split(",")))
+        feed = fields.pop('FS', None) or fields.pop('F', None)
+        if feed is not None:
+            feed = float(feed.split(",")[0])
+        return tuple.__new__(Status, (
+            state, coordinates, position, buffer, feed, fields))
+
+
+class MotionModel():
+    """
+    Predicts the duration of moves with the trapezoidal velocity profile of
+    the grbl planner: Each move accelerates to the feed rate, cruises and
+    decelerates to zero (or reaches a triangular profile if it is too
+    short). The feed rate and the acceleration along the move are limited by
+    the per-axis limits, projected on the direction of the move.
+
+    Parameters
+    ----------
+    steps_per_mm : 2-tuple
+        The resolution of the x- and y-axis, grbl settings $100 and $101.
+    max_rate : 2-tuple
+        The maximal feed of the axes in mm/min, grbl settings $110 and $111.
+    acceleration : 2-tuple
+        The acceleration of the axes in mm/s^2, grbl settings $120 and $121.
+    """
+
+    def __init__(self, steps_per_mm, max_rate, acceleration):
+        self.steps_per_mm = steps_per_mm
+        self.max_rate = max_rate
+        self.acceleration = acceleration
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Returns the model for the dict of grbl settings `settings`."""
+        return cls(*[(settings[n], settings[n + 1]) for n in (100, 110, 120)])
+
+    def quantize(self, position):
+        """Returns `position` rounded to the step grid of the motors."""
+        return tuple(round(p * steps) / steps
+                     for p, steps in zip(position, self.steps_per_mm))
+
+    def limits(self, direction):
+        """
+        Returns the maximal speed in mm/s and the acceleration in mm/s^2
+        along the unit vector `direction`.
+        """
+        speed = acceleration = math.inf
+        for d, rate, acc in zip(direction, self.max_rate, self.acceleration):
+            if d:
+                speed = min(speed, rate / 60 / abs(d))
+                acceleration = min(acceleration, acc / abs(d))
+        return speed, acceleration
+
+    @staticmethod
+    def profile(distance, speed, acceleration):
+        """
+        Returns the duration in seconds of a move over `distance` (mm) from
+        rest to rest, with the maximal `speed` (mm/s) and `acceleration`
+        (mm/s^2).
+        """
+        if distance <= 0:
+            return 0.
+        if distance >= speed ** 2 / acceleration:
+            return distance / speed + speed / acceleration
+        return 2 * math.sqrt(distance / acceleration)
+
+    def duration(self, start, end, feed):
+        """
+        Returns the duration in seconds of a linear move.
+
+        Parameters
+        ----------
+        start, end : 2-tuple
+            The absolute coordinates in mm.
+        feed : float
+            The feed rate in mm/min.
+        """
+        start = self.quantize(start)
+        end = self.quantize(end)
+        delta = [b - a for a, b in zip(start, end)]
+        distance = math.hypot(*delta)
+        if not distance:
+            return 0.
+        speed, acceleration = self.limits([d / distance for d in delta])
+        return self.profile(distance, min(speed, feed / 60), acceleration)
+
+    def arc_duration(self, start, end, r, feed):
+        """
+        Returns the duration in seconds of an arc move with radius `r`. The
+        conservative limits of the slower axis are used along the whole arc.
+        """
+        chord = math.hypot(*[b - a for a, b in zip(start, end)])
+        if not chord:
+            return 0.
+        angle = 2 * math.asin(min(1., chord / (2 * abs(r))))
+        if r < 0:
+            angle = 2 * math.pi - angle
+        speed = min(min(self.max_rate) / 60, feed / 60)
+        return self.profile(abs(r) * angle, speed, min(self.acceleration))
+
+
+StatusSnapshot = collections.namedtuple('StatusSnapshot', 'status position time')
+
+
+class StatusMonitor():
+    """
+    Polls the status report of grbl in a background thread and keeps the
+    latest one.
+
+    While the monitor is running, status reports are routed past `in_queue`
+    of the serial connection (see `SerialConnection.on_status`), so they do
+    not interfere with the responses to other commands. The latest report
+    is available as `snapshot`, an immutable `StatusSnapshot` (status,
+    position, time) that is replaced as a whole, so it can be read without
+    locking.
+
+    Parameters
+    ----------
+    serial_connection : SerialConnection
+        The connected serial connection to grbl.
+    interval : float, optional
+        The polling interval in seconds.
+
+    Example
+    -------
+      >>> with table.status_monitor(interval=0.02) as monitor:
+      >>>     table.move(10, 10)
+      >>>     status, position, timestamp = monitor.snapshot
+    """
+
+    def __init__(self, serial_connection, interval=0.05):
+        self.serial_connection = serial_connection
+        self.interval = interval
+        self.snapshot = None
+        self.work_offset = None
+        self.history = None
+        self._busy_time = None
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts polling. Returns as soon as the first report is received."""
+        self._stop.clear()
+        self.serial_connection.on_status = self._update
+        self._thread = threading.Thread(target=self._run,
+                                        name="StatusMonitor", daemon=True)
+        self._thread.start()
+        self.refresh()
+
+    def stop(self):
+        """Stops polling."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.serial_connection.on_status = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.serial_connection._put("?")
+            self._stop.wait(self.interval)
+
+    def _update(self, line):
+        """Stores the status report `line` (called by the input thread)."""
+        try:
+            message = self.serial_connection._parse(line)
+            status, position = Table._parse_status(message)
+        except (ConnectionError, TableError) as error:
+            logger.error(__("Invalid status report {!r}: {}", line, error))
+            return
+        offset = Table._parse_work_offset(message)
+        if offset is not None:
+            self.work_offset = offset
+        self.snapshot = StatusSnapshot(status, position, time.perf_counter())
+        if status.lower() not in ("idle", "check"):
+            self._busy_time = self.snapshot.time
+        if self.history is not None:
+            # the time grbl sent the report: the reception time minus the
+            # time on the serial line (10 bits per byte)
+            self.history.append(self.snapshot._replace(time=(
+                self.snapshot.time -
+                10 * (len(line) + 2) / self.serial_connection.address[1])))
+        with self._condition:
+            self._condition.notify_all()
+
+    def wait(self, predicate=None, since=None, timeout=None):
+        """
+        Waits for a status report received after `since` (a
+        `time.perf_counter` value) for which `predicate(snapshot)` is True.
+
+        Returns
+        -------
+        snapshot : StatusSnapshot
+
+        Raises
+        ------
+        TimeoutError :
+            if no such report is received within `timeout` seconds.
+        """
+        def ready():
+            snapshot = self.snapshot
+            return (snapshot is not None
+                    and (since is None or snapshot.time > since)
+                    and (predicate is None or predicate(snapshot)))
+        with self._condition:
+            if not self._condition.wait_for(ready, timeout):
+                raise TimeoutError("No matching status report from grbl.")
+        return self.snapshot
+
+    def refresh(self, timeout=None):
+        """Requests a report immediately and returns it as soon as it is received."""
+        since = time.perf_counter()
+        self.serial_connection._put("?")
+        return self.wait(since=since, timeout=timeout or
+                         self.serial_connection.timeout)
+
+    def wait_idle(self, since=None, timeout=None, after=None):
+        """
+        Waits until grbl reports the state 'Idle' (or 'Check') in a report
+        received after `since`, and returns that report.
+
+        If `after` (a `time.perf_counter` value, e.g. the time a move was
+        acknowledged) is given, an idle report only counts if it is received
+        after `after`, or if grbl reported another state (i.e. the motion)
+        after `since` before. So a report from before the motion does not end
+        the wait.
+
+        Raises
+        ------
+        TimeoutError :
+            if grbl does not report idle within `timeout` seconds.
+        """
+        def idle(snapshot):
+            if snapshot.status.lower() not in ("idle", "check"):
+                return False
+            busy_time = self._busy_time
+            return (after is None or snapshot.time > after
+                    or (busy_time is not None
+                        and (since is None or busy_time > since)))
+        return self.wait(idle, since, timeout)
+
+    @contextmanager
+    def recording(self):
+        """
+        A context manager that records all reports received within the
+        context. Yields the list of the recorded `StatusSnapshot` instances.
+        Their time is the estimated time at which grbl sent the report, i.e.
+        the reception time minus the transfer time at the baud rate.
+
+        Example
+        -------
+          >>> with monitor.recording() as reports:
+          >>>     table.move(10, 0)
+          >>> times = [report.time for report in reports]
+        """
+        self.history = []
+        try:
+            yield self.history
+        finally:
+            self.history = None
+
+
+class SettingsCache():
+    """
+    An on-disk cache of the grbl settings and build info.
+
+    The entries are keyed by the serial port and the build info of grbl
+    (the response to ``$I``, which contains the version). The cache is a
+    JSON file; if it cannot be read or written, it is ignored. Entries older
+    than `max_age` are not used, so the settings are queried again.
+
+    The cache is not used unless it is passed to `Table`, e.g.
+    ``Table('COM3', settings_cache=SettingsCache())``.
+
+    Parameters
+    ----------
+    path : str, optional
+        The file name of the cache. Defaults to ``grbl_settings.json`` in the
+        directory ``kapascan`` of the user's cache directory
+        (``$XDG_CACHE_HOME`` or ``~/.cache``).
+    max_age : float or None, optional
+        The time in seconds an entry is valid. Defaults to 3600 s. None means
+        the entries never expire.
+
+    Notes
+    -----
+    The key is the build info instead of the version of the welcome message,
+    since grbl sends the welcome message only at a reset, which not every
+    connection triggers, and the build info also identifies the build date
+    and options. This costs one ``$I`` round trip per session instead of the
+    ``$$`` settings dump.
+
+    The key does not reveal settings that were changed without `Table` (e.g.
+    by another G-code sender, a reflash with the same build info or an
+    EEPROM reset). Such a change is served stale until the entry expires,
+    including the maximal travel and rates that limit the moves. Call
+    `Table.refresh_settings` after changing the settings elsewhere.
+    """
+
+    def __init__(self, path=None, max_age=3600):
+        if path is None:
+            cache_home = (os.environ.get('XDG_CACHE_HOME')
+                          or os.path.join(os.path.expanduser("~"), ".cache"))
+            path = os.path.join(cache_home, "kapascan", "grbl_settings.json")
+        self.path = path
+        self.max_age = max_age
+
+    @staticmethod
+    def key(serial_port, build_info):
+        """Returns the key of the entry of a grbl build on a serial port."""
+        return "|".join([serial_port] + list(build_info))
+
+    def _read(self):
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as error:
+            logger.warning(__("Ignoring settings cache {}: {}", self.path, error))
+            return {}
+
+    def _write(self, entries):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temporary = self.path + ".tmp"
+            with open(temporary, 'w') as file:
+                json.dump(entries, file, indent=1)
+            os.replace(temporary, self.path)
+        except OSError as error:
+            logger.warning(__("Could not write settings cache {}: {}",
+                              self.path, error))
+
+    def load(self, key):
+        """
+        Returns the cached settings of `key` as a dict, or None if there is
+        no entry or it is expired.
+        """
+        entry = self._read().get(key)
+        if entry is None:
+            return None
+        if (self.max_age is not None
+                and time.time() - entry.get('time', 0) > self.max_age):
+            logger.debug(__("Cached grbl settings of {} expired.", key))
+            return None
+        return {int(n): value for n, value in entry['settings'].items()}
+
+    def store(self, key, settings):
+        """Stores the dict `settings` under `key`."""
+        entries = self._read()
+        entries[key] = {'settings': settings, 'time': time.time()}
+        self._write(entries)
+
+    def invalidate(self, key):
+        """Removes the entry `key`."""
+        entries = self._read()
+        if entries.pop(key, None) is not None:
+            self._write(entries)
 
 
 class Table(Device):
@@ -324,6 +997,10 @@ class Table(Device):
         on Linux.
     baud_rate : int, optional
         The baud rate of the connection. As of grbl v1.1 this defaults to 115200.
+    settings_cache : SettingsCache, optional
+        The on-disk cache of the grbl settings, stored in attribute
+        `settings_cache`. Defaults to None, i.e. the settings are queried
+        from grbl in every session.
 
     Coordinate system
     -----------------
@@ -340,11 +1017,18 @@ class Table(Device):
     """
     g_code = {'relative': 'G91',
               'absolute': 'G90'}
+    poll_interval = 0.014
+    idle_timeout = 5.
 
-    def __init__(self, serial_port, baud_rate=115200):
+    def __init__(self, serial_port, baud_rate=115200, settings_cache=None):
         super().__init__()
         self.serial_connection = SerialConnection(serial_port, baud_rate)
         self.settings = None
+        self.settings_cache = settings_cache
+        self.build_info = None
+        self.check_mode = False
+        self.monitor = None
+        self._work_offset = None
 
     def _connect(self):
         self.serial_connection.connect()
@@ -371,7 +1055,47 @@ class Table(Device):
                     raise NotConnectedError
 
     def _disconnect(self):
+        self.stop_monitor()
         self.serial_connection.disconnect()
+        self.build_info = None
+        self._work_offset = None
+
+    @on_connection
+    def start_monitor(self, interval=0.05):
+        """
+        Starts a `StatusMonitor`. While it runs, `get_status` and `position`
+        return the latest report without a round trip, and waiting for the
+        end of a move does not poll.
+
+        Parameters
+        ----------
+        interval : float, optional
+            The polling interval in seconds.
+
+        Returns
+        -------
+        monitor : StatusMonitor
+            The monitor, also stored in attribute `monitor`.
+        """
+        self.stop_monitor()
+        self.monitor = StatusMonitor(self.serial_connection, interval)
+        self.monitor.start()
+        return self.monitor
+
+    def stop_monitor(self):
+        """Stops the `StatusMonitor`, if running."""
+        if self.monitor is not None:
+            self.monitor.stop()
+            self.monitor = None
+
+    @contextmanager
+    def status_monitor(self, interval=0.05):
+        """A context manager that runs a `StatusMonitor`."""
+        monitor = self.start_monitor(interval)
+        try:
+            yield monitor
+        finally:
+            self.stop_monitor()
 
     @on_connection
     def reset(self):
@@ -380,6 +1104,7 @@ class Table(Device):
         self.serial_connection.command("r", get_response=False)
         self.serial_connection.disconnect()
         self.serial_connection.connect()
+        self._work_offset = None
 
     @on_connection
     def unlock(self):
@@ -391,28 +1116,88 @@ class Table(Device):
         UnlockError :
             If unlock is not successful.
         """
-        key, value = self.serial_connection.command("$X")[0]
-        if key == 'message' and value[0] == 'MSG:Caution: Unlocked':
+        message = self.serial_connection.command("$X")[0]
+        if message.key == 'message' and message.text == 'MSG:Caution: Unlocked':
             logger.info("Unlocked manually.")
-        elif key == 'ok':
+        elif message.key == 'ok':
             pass
         else:
             logger.error("grbl unlock failed.", exc_info=True)
             raise UnlockError
 
     @on_connection
-    def _query_settings(self):
+    def _query_settings(self, cached=True):
         """
         Queries grbl for its settings values and stores them in a dict as an
         attribute.
+
+        If `cached` is True and attribute `settings_cache` is set, the build
+        info is queried (``$I``) and the settings are taken from the cache,
+        if present and not expired for this build and serial port. Otherwise
+        the settings are queried (``$$``) and stored in the cache. See
+        `SettingsCache` for settings changed outside of this class.
         """
+        key = None
+        if self.settings_cache is not None:
+            key = self._cache_key()
+            if cached:
+                settings = self.settings_cache.load(key)
+                if settings is not None:
+                    logger.debug("Using cached grbl settings.")
+                    self.settings = settings
+                    return
         logger.debug("Getting grbl settings.")
         answer = self.serial_connection.command("$$")
-        settings = {}
-        for key, value in answer:
-            if key == 'setting':
-                settings[int(value[0])] = float(value[1])
-        self.settings = settings
+        self.settings = {message.number: message.value for message in answer
+                         if message.key == 'setting'}
+        if key is not None:
+            self.settings_cache.store(key, self.settings)
+
+    @on_connection
+    def query_build_info(self):
+        """
+        Queries the build info of grbl (``$I``), e.g.
+        ['VER:1.1f.20170801:', 'OPT:V,15,128'], and stores it in attribute
+        `build_info`.
+        """
+        answer = self.serial_connection.command("$I")
+        self.build_info = [message.text for message in answer
+                           if message.key == 'message']
+        return self.build_info
+
+    def _cache_key(self):
+        if self.build_info is None:
+            self.query_build_info()
+        return self.settings_cache.key(self.serial_connection.address[0],
+                                       self.build_info)
+
+    @on_connection
+    def refresh_settings(self):
+        """Queries the settings from grbl, bypassing and updating the cache."""
+        self._query_settings(cached=False)
+
+    @on_connection
+    def set_setting(self, n, value):
+        """
+        Writes the grbl setting `n` (``$n=value``) and updates the stored
+        settings and the cache.
+        """
+        self.serial_connection.command("${}={}".format(n, value))
+        self._setting_written(n, value)
+
+    def _setting_written(self, n, value):
+        """Updates the stored settings after `value` was written to `$n`."""
+        if self.settings is None:
+            return
+        try:
+            self.settings[int(n)] = float(value)
+        except ValueError:
+            self.settings = None
+            if self.settings_cache is not None:
+                self.settings_cache.invalidate(self._cache_key())
+            return
+        if self.settings_cache is not None:
+            self.settings_cache.store(self._cache_key(), self.settings)
 
     def _get_settings(self, *n):
         """
@@ -453,6 +1238,12 @@ class Table(Device):
         """
         return self._get_settings(110, 111)
 
+    @property
+    def motion_model(self):
+        """Returns the `MotionModel` for the current grbl settings."""
+        self._get_settings(100, 110, 120)
+        return MotionModel.from_settings(self.settings)
+
     @property
     def position(self):
         """Returns a tuple with the current position. (x,y)"""
@@ -476,18 +1267,87 @@ class Table(Device):
         ------
         TableError :
             if no machine position (MPos) is present in grbl status report.
+
+        Notes
+        -----
+        If a `StatusMonitor` is running, its latest report is returned.
         """
-        key, value = self.serial_connection.command("?")[0]
-        if key == 'status':
-            status = value[0]
-            if value[1] == 'MPos':
-                position = value[2].split(",")[0:2]
-            else:
-                msg = "No machine position present in status report. Configure grbl!"
-                logging.error(msg)
-                raise TableError(msg)
-            position = tuple(float(p) for p in position)
-        return status, position
+        if self.monitor is not None:
+            return self.monitor.snapshot[:2]
+        message = self.serial_connection.command("?")[0]
+        status = self._parse_status(message)
+        offset = self._parse_work_offset(message)
+        if offset is not None:
+            self._work_offset = offset
+        return status
+
+    @staticmethod
+    def _parse_status(message):
+        """
+        Returns the tuple (status, position) of a parsed status report (a
+        `Status` record).
+
+        Raises
+        ------
+        TableError :
+            if no machine position (MPos) is present in grbl status report.
+        """
+        if message.key != 'status':
+            raise TableError("Not a status report: {!r}".format(message))
+        if message.coordinates != 'MPos':
+            msg = "No machine position present in status report. Configure grbl!"
+            logging.error(msg)
+            raise TableError(msg)
+        return message.state, message.position[:2]
+
+    @staticmethod
+    def _parse_work_offset(message):
+        """
+        Returns the work coordinate offset (x, y) of a status report (field
+        'WCO'), or None if the report does not contain it.
+        """
+        offset = message.fields.get('WCO')
+        if offset is None:
+            return None
+        return tuple(map(float, offset.split(",")[:2]))
+
+    @property
+    def work_offset(self):
+        """
+        Returns (x, y), the work coordinate offset in mm, i.e. the machine
+        position minus the work position.
+
+        grbl reports the offset (field 'WCO') only in some status reports,
+        but always in the first report after it changed. The latest reported
+        offset is used; if none was reported yet, it is queried with
+        `query_work_offset`.
+        """
+        if self.monitor is not None and self.monitor.work_offset is not None:
+            self._work_offset = self.monitor.work_offset
+        if self._work_offset is None:
+            self._work_offset = self.query_work_offset()
+        return self._work_offset
+
+    @on_connection
+    def query_work_offset(self):
+        """
+        Queries the coordinate offsets of grbl (``$#``) and returns the work
+        coordinate offset (x, y) of G54, the coordinate system used by this
+        class, plus the G92 offset.
+        """
+        return self._parse_offsets(self.serial_connection.command("$#"))
+
+    @staticmethod
+    def _parse_offsets(answer):
+        """
+        Returns the work coordinate offset (x, y) of G54 plus G92 from the
+        parsed answer to ``$#``.
+        """
+        offsets = dict(message.text.split(":", 1) for message in answer
+                       if message.key == 'message')
+        return tuple(
+            sum(float(offsets[name].split(",")[i]) for name in ('G54', 'G92'))
+            for i in range(2))
 
     @on_connection
     def home(self):
@@ -498,10 +1358,10 @@ class Table(Device):
         self.serial_connection.command("$H", timeout=30)
 
     @on_connection
-    def move(self, x=None, y=None, mode='absolute', feed='max'):
+    def move(self, x=None, y=None, mode='absolute', feed='max', wait=True):
         """
         Moves the table linearly to the desired coordinates.
-        Blocks until movement is finished.
+        Blocks until movement is finished, unless `wait` is False.
 
         Parameters
         ----------
@@ -516,32 +1376,185 @@ class Table(Device):
             The feed rate in mm/min. Defaults to the maximally allowed feed
             rate.
 
+        wait : bool, optional
+            If False, return as soon as grbl has accepted the move.
+
         Returns
         -------
         position : tuple of floats
             The machine position after the movement.
         """
         previous_position = self.position
+        if feed == 'max':
+            feed = min(self.max_feed)
+        target = None
+        if wait:
+            target = self._target(previous_position, x, y, mode,
+                                  self._move_offset(mode))
+        start = time.perf_counter()
+        self.serial_connection.command(self._move_command(x, y, mode, feed))
+        if not wait:
+            return previous_position
+        self._wait_idle(self.motion_model.duration(
+            previous_position, target, feed), start, time.perf_counter())
+        return previous_position
+
+    @on_connection
+    def move_path(self, path, mode='absolute', feed='max'):
+        """
+        Moves the table linearly along several points. The moves are streamed
+        to grbl (see `SerialConnection.stream`), so they are executed at
+        planner speed, without stopping at the intermediate points.
+        Blocks until the last movement is finished.
+
+        Parameters
+        ----------
+        path : sequence of 2-tuples
+            The coordinates (x, y) in mm of the points to move to. If a
+            coordinate is None, it is not moved.
+
+        mode : str {'relative', 'absolute'}, optional
+            Move in relative or absolute coordinates. Defaults to 'absolute'.
+
+        feed : float, optional
+            The feed rate in mm/min. Defaults to the maximally allowed feed
+            rate.
+
+        Returns
+        -------
+        position : tuple of floats
+            The machine position before the movement.
+        """
+        previous_position = self.position
+        if feed == 'max':
+            feed = min(self.max_feed)
+        offset = self._move_offset(mode)
+        start = time.perf_counter()
+        self.serial_connection.stream(
+            [self._move_command(x, y, mode, feed) for x, y in path])
+        model = self.motion_model
+        duration = 0.
+        position = previous_position
+        for x, y in path:
+            target = self._target(position, x, y, mode, offset)
+            duration += model.duration(position, target, feed)
+            position = target
+        self._wait_idle(duration, start, time.perf_counter())
+        return previous_position
+
+    @staticmethod
+    def _target(position, x, y, mode, offset=(0., 0.)):
+        """
+        Returns the machine position at the end of a move from the machine
+        `position`. In absolute mode, `x` and `y` are work coordinates, which
+        are converted with the work coordinate `offset`.
+        """
+        target = []
+        for p, value, o in zip(position, (x, y), offset):
+            if value is None:
+                target.append(p)
+            elif mode.lower() == 'relative':
+                target.append(p + value)
+            else:
+                target.append(value + o)
+        return tuple(target)
+
+    def _move_offset(self, mode):
+        """
+        Returns the work coordinate offset needed by `_target`. It must be
+        called before the move is sent, since grbl answers ``$#`` only when
+        idle.
+        """
+        if mode.lower() == 'relative':
+            return (0., 0.)
+        return self.work_offset
+
+    @on_connection
+    def stream(self, blocks, wait=True):
+        """
+        Streams G-code blocks to grbl (see `SerialConnection.stream`).
+
+        Parameters
+        ----------
+        blocks : sequence of str
+            The G-code blocks.
+        wait : bool, optional
+            If True, block until grbl is idle again.
+
+        Returns
+        -------
+        responses : list of lists
+            The parsed messages acknowledging each block.
+        """
+        start = time.perf_counter()
+        responses = self.serial_connection.stream(blocks)
+        if wait:
+            self._wait_idle(start=start, acked=time.perf_counter())
+        return responses
+
+    def cancel_stream(self):
+        """Cancels a running `stream`, see `SerialConnection.cancel_stream`."""
+        self.serial_connection.cancel_stream()
+
+    def _wait_idle(self, duration=None, start=None, acked=None):
+        """
+        Waits until grbl is idle (or in check mode) and returns the position.
+
+        If the predicted `duration` in seconds of the motion sent at `start`
+        (a `time.perf_counter` value, defaults to now) is given, the status
+        is not polled before shortly before the predicted end. If a
+        `StatusMonitor` is running, it waits for its first idle report after
+        `start` instead of polling; if the motion was acknowledged by grbl at
+        `acked`, an idle report from before the motion is not taken as its
+        end (see `StatusMonitor.wait_idle`).
+
+        Raises
+        ------
+        TimeoutError :
+            if grbl is not idle within `idle_timeout` seconds after the
+            predicted end of the motion (only if `duration` is given).
+        """
+        if start is None:
+            start = time.perf_counter()
+        deadline = None
+        if duration is not None:
+            deadline = start + 1.5 * duration + self.idle_timeout
+        if duration and not self.check_mode:
+            margin = 0.01 + 0.05 * duration
+            remaining = start + duration - margin - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+        if self.monitor is not None:
+            timeout = None
+            if deadline is not None:
+                timeout = max(deadline - time.perf_counter(), 0)
+            return self.monitor.wait_idle(since=start, timeout=timeout,
+                                          after=acked).position
+        while True:
+            status, position = self.get_status()
+            if status.lower() == "idle" or status.lower() == "check":
+                return position
+            if deadline is not None and time.perf_counter() > deadline:
+                msg = __("grbl is not idle {:.1f} s after the start of the "
+                         "motion (state {}).", time.perf_counter() - start,
+                         status)
+                logger.error(msg)
+                raise TimeoutError(msg)
+            time.sleep(self.poll_interval)
+
+    @classmethod
+    def _move_command(cls, x, y, mode, feed):
+        """Returns the G-code block of a linear move."""
         mode = mode.lower()
-        if mode not in self.g_code.keys():
+        if mode not in cls.g_code.keys():
             raise TableError("Invalid move mode.")
-        command = "G1 {} ".format(self.g_code[mode])
+        command = "G1 {} ".format(cls.g_code[mode])
         if x is not None:
             command += "X{} ".format(x)
         if y is not None:
             command += "Y{} ".format(y)
-        if feed == 'max':
-            feed = min(self.max_feed)
         command += "F{}".format(feed)
-        self.serial_connection.command(command)
-        while True:
-            status, position = self.get_status()
-            if status.lower() == "idle" or status.lower() == "check":
-                break
-            else:
-                # TODO: Auto optimize polling frequency based on step length
-                time.sleep(0.014)
-        return previous_position
+        return command
 
     @on_connection
     def arc_move(self, x, y, r, mode='absolute', feed='max'):
@@ -575,15 +1588,12 @@ class Table(Device):
         if feed == 'max':
             feed = min(self.max_feed)
         command = "G2 {} X{} Y{} R{} F{}".format(self.g_code[mode], x, y, r, feed)
+        start = self.position
+        target = self._target(start, x, y, mode, self._move_offset(mode))
+        sent = time.perf_counter()
         self.serial_connection.command(command)
-        while True:
-            status, position = self.get_status()
-            if status.lower() == "idle":
-                break
-            else:
-                # TODO: Auto optimize polling frequency based on step length
-                time.sleep(0.014)
-        return position
+        return self._wait_idle(self.motion_model.arc_duration(
+            start, target, r, feed), sent, time.perf_counter())
 
     @on_connection
     def interact(self):
@@ -612,6 +1622,9 @@ class Table(Device):
                 response = self.serial_connection.command(command)
                 for line in response:
                     print(line)
+                setting = SerialConnection.regex['setting'].match(command.strip())
+                if setting:
+                    self._setting_written(*setting.groups())
             except GrblError as error:
                 print(error)
             except GrblAlarm as error:
@@ -661,10 +1674,12 @@ class Table(Device):
         correspondingly, but it does not move the motors.
         """
         self.serial_connection.command("$C")
+        self.check_mode = True
         logger.debug("Enabled g-code-check-mode.")
         try:
             yield
         finally:
+            self.check_mode = False
             self.reset()
             self.serial_connection.command("$X")
             logger.debug("Disabled g-code-check-mode.")